@@ -0,0 +1,234 @@
+# abtest.py
+"""
+Variance-reduced A/B win-rate comparison.
+
+Compares the player win rate of two variants: a variant is a set of prototypes (stat tweaks), attack
+ranges and/or fixed teams. The comparison is built from units; a unit plays the same battle, meaning
+the same random teams and the same seed, under both variants:
+  - common random numbers (CRN, on by default): both variants see the same dice, so luck that decides
+    the battle either way cancels out of the difference;
+  - antithetic runs (--antithetic): each unit also replays its seed on the mirrored streams
+    (rng.AntitheticRandom: high rolls become low rolls), so lucky and unlucky halves offset each other.
+Every unit gives one difference sample; the report compares its variance with that of two independent
+runs of the same total size. The ESS gain is how many times more battles the independent estimate
+would need for the same precision.
+
+For RW.max_hp=1400 against stock, CRN measures an ESS gain of ~9x (~6x for TB.attack=350,400); swapping
+a team member changes far more of the battle (~1.4x for players 0 1 2 against 0 1 3). Antithetic runs add nothing on
+top of CRN, and without it they lose precision (~0.7x): both halves of a pair share the team draw,
+which outweighs the dice. Measure before relying on them for other variants.
+
+    python abtest.py --b-set RW.max_hp=1400 -n 5000
+    python abtest.py --a-player 0 1 2 --b-player 0 1 3 -n 5000
+    python abtest.py --b-set TB.attack=350,400 --independent     # plain Monte Carlo, for reference
+"""
+import argparse
+import math
+import time
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+
+from characters import ATTACK_RANGES, create_all_character_prototypes
+from engine import DEFAULT_MAX_ROUNDS, BattleEngine, random_team_indices
+from policies import POLICIES
+from rng import SeedSequence, make_rng
+from simulate import DEFAULT_CHUNK_SIZE, TEAM_SIZE, play_battle
+
+Z_95 = 1.96
+STATS = ("max_hp", "base_speed", "base_crit", "crit_amp")
+
+# prototypes / attack_ranges None: the stock ones; player / cpu None: random teams per unit
+Variant = namedtuple("Variant", ["prototypes", "attack_ranges", "player", "cpu"], defaults=(None, None, None, None))
+
+
+def score(winner):
+    return 1.0 if winner == "player" else 0.5 if winner == "draw" else 0.0
+
+
+class PairedStats:
+    """Sufficient statistics of a comparison: per-unit differences and per-battle scores of each variant."""
+
+    def __init__(self):
+        self.units = 0
+        self.battles = 0            # per variant
+        self.diff = [0.0, 0.0]      # sum, sum of squares of the unit differences
+        self.a = [0.0, 0.0]         # sum, sum of squares of variant A's battle scores
+        self.b = [0.0, 0.0]
+
+    def add_unit(self, scores_a, scores_b):
+        d = (sum(scores_a) - sum(scores_b)) / len(scores_a)
+        self.units += 1
+        self.battles += len(scores_a)
+        self.diff[0] += d
+        self.diff[1] += d * d
+        for acc, scores in ((self.a, scores_a), (self.b, scores_b)):
+            for x in scores:
+                acc[0] += x
+                acc[1] += x * x
+
+    def merge(self, other):
+        self.units += other.units
+        self.battles += other.battles
+        for mine, theirs in ((self.diff, other.diff), (self.a, other.a), (self.b, other.b)):
+            mine[0] += theirs[0]
+            mine[1] += theirs[1]
+        return self
+
+    @staticmethod
+    def _var(acc, n):
+        # sample variance from (sum, sum of squares)
+        if n < 2:
+            return 0.0
+        return max(acc[1] - acc[0] * acc[0] / n, 0.0) / (n - 1)
+
+    def rate_a(self):
+        return self.a[0] / self.battles if self.battles else 0.0
+
+    def rate_b(self):
+        return self.b[0] / self.battles if self.battles else 0.0
+
+    def difference(self):
+        return self.diff[0] / self.units if self.units else 0.0
+
+    def stderr(self):
+        return math.sqrt(self._var(self.diff, self.units) / self.units) if self.units else math.inf
+
+    def independent_stderr(self):
+        # standard error of the difference had both variants run the same battle counts independently
+        if not self.battles:
+            return math.inf
+        return math.sqrt((self._var(self.a, self.battles) + self._var(self.b, self.battles)) / self.battles)
+
+    def ess_gain(self):
+        se = self.stderr()
+        return (self.independent_stderr() / se) ** 2 if se > 0 else math.inf
+
+    def summary(self, z=Z_95):
+        d, se = self.difference(), self.stderr()
+        gain = self.ess_gain()
+        return "\n".join([
+            f"A: {self.rate_a():.2%}  B: {self.rate_b():.2%}  ({self.units} units, {self.battles} battles per variant)",
+            f"A - B: {d:+.2%} +- {z * se:.2%}  (independent runs: +- {z * self.independent_stderr():.2%})",
+            f"ESS gain: {gain:.1f}x  (~{gain * self.battles:,.0f} independent battles per variant for this precision)",
+        ])
+
+
+def _engine(variant):
+    protos = variant.prototypes or create_all_character_prototypes()
+    return BattleEngine(protos, protos, log_mode="off", attack_ranges=variant.attack_ranges), len(protos)
+
+
+def _run_units(args):
+    # worker entry point: n units; with crn both variants share each unit's teams and seed
+    n, chunk_seed, a, b, crn, antithetic, player_policy, cpu_policy, max_rounds = args
+    comp_seed, battle_seed = chunk_seed.spawn(2)
+    comp_rng, battle_rng = make_rng(comp_seed), make_rng(battle_seed)
+    engines = [_engine(a), _engine(b)]
+    flips = (False, True) if antithetic else (False,)
+    stats = PairedStats()
+    for _ in range(n):
+        draws = None
+        unit = []
+        for variant, (engine, n_protos) in zip((a, b), engines):
+            if draws is None or not crn:
+                draws = (random_team_indices(comp_rng, n_protos, TEAM_SIZE),
+                         random_team_indices(comp_rng, n_protos, TEAM_SIZE),
+                         battle_rng.getrandbits(64))
+            p_rand, c_rand, seed = draws
+            p_idx = variant.player if variant.player is not None else p_rand
+            c_idx = variant.cpu if variant.cpu is not None else c_rand
+            scores = []
+            for flip in flips:
+                engine.reseed(seed, antithetic=flip)
+                winner, _ = play_battle(engine, p_idx, c_idx, player_policy, cpu_policy, max_rounds)
+                scores.append(score(winner))
+            unit.append(scores)
+        stats.add_unit(*unit)
+    return stats
+
+
+def compare(a, b, n_units, seed=None, crn=True, antithetic=False, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+            player_policy="cpu", cpu_policy="cpu", max_rounds=DEFAULT_MAX_ROUNDS):
+    """
+    Plays n_units units of variants a and b (2 battles per variant per unit with antithetic, else 1)
+    and returns their PairedStats. crn=False draws every battle independently, as plain Monte Carlo
+    would. Results depend on (seed, chunk_size) only, not on the worker count.
+    """
+    workers = workers or cpu_count()
+    root = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+    starts = range(0, n_units, chunk_size)
+    tasks = [(min(chunk_size, n_units - start), chunk_seed, a, b, crn, antithetic, player_policy, cpu_policy,
+              max_rounds) for start, chunk_seed in zip(starts, root.spawn(len(starts)))]
+    stats = PairedStats()
+    if workers == 1:
+        for task in tasks:
+            stats.merge(_run_units(task))
+    else:
+        with Pool(workers) as pool:
+            for part in pool.imap_unordered(_run_units, tasks):
+                stats.merge(part)
+    return stats
+
+
+def parse_variant(player, cpu, settings):
+    """Variant from CLI values: settings are "SN.stat=value" (stat in STATS) or "SN.attack=low,high"."""
+    protos, ranges = None, None
+    for setting in settings:
+        try:
+            target, value = setting.split("=")
+            shortname, stat = target.split(".")
+        except ValueError:
+            raise ValueError(f"bad setting {setting!r} (expected SN.stat=value)") from None
+        if stat == "attack":
+            ranges = dict(ranges or ATTACK_RANGES)
+            low, high = (int(v) for v in value.split(","))
+            ranges[shortname] = (low, high)
+            continue
+        if stat not in STATS:
+            raise ValueError(f"unknown stat {stat!r} (choose from {', '.join(STATS + ('attack',))})")
+        protos = protos or create_all_character_prototypes()
+        matches = [p for p in protos if p.shortname == shortname]
+        if not matches:
+            raise ValueError(f"no character {shortname!r}")
+        for p in matches:
+            setattr(p, stat, int(value))
+            if stat == "max_hp":
+                p.hp = p.max_hp
+    return Variant(protos, ranges, player, cpu)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the player win rate of two variants with CRN and "
+                                                 "antithetic runs.")
+    parser.add_argument("-n", "--units", type=int, default=5000, help="paired units to play")
+    for side in ("a", "b"):
+        parser.add_argument(f"--{side}-player", type=int, nargs="+", metavar="IDX",
+                            help=f"variant {side.upper()} player team (default: random per unit)")
+        parser.add_argument(f"--{side}-cpu", type=int, nargs="+", metavar="IDX",
+                            help=f"variant {side.upper()} cpu team (default: random per unit)")
+        parser.add_argument(f"--{side}-set", action="append", default=[], metavar="SN.STAT=VALUE",
+                            help=f"variant {side.upper()} stat change, e.g. RW.max_hp=1400 or TB.attack=350,400")
+    parser.add_argument("--independent", action="store_true", help="no common random numbers")
+    parser.add_argument("--antithetic", action="store_true", help="also play every unit on mirrored dice")
+    parser.add_argument("--player-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--cpu-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    args = parser.parse_args(argv)
+
+    try:
+        a = parse_variant(args.a_player, args.a_cpu, args.a_set)
+        b = parse_variant(args.b_player, args.b_cpu, args.b_set)
+    except ValueError as e:
+        parser.error(str(e))
+    t0 = time.perf_counter()
+    stats = compare(a, b, args.units, args.seed, not args.independent, args.antithetic, args.workers,
+                    args.chunk_size, args.player_policy, args.cpu_policy, args.max_rounds)
+    print(stats.summary())
+    print(f"{time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
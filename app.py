@@ -1,43 +1,57 @@
 import streamlit as st
 from characters import create_all_character_prototypes, Character
-from engine import BattleEngine, is_status_move
+from engine import BattleEngine
+from moves import CHARACTER_KITS, MOVES, ENEMY
+from mcts import DIFFICULTIES
+from effects import turns_left_in
+from policies import random_policy
 import random
 
 st.set_page_config(page_title="Turn-Based Battle", layout="wide")
 st.title("Turn-Based Battle Simulator")
 
-# Load prototypes
-prototypes = create_all_character_prototypes(prefix="")
+# Static data, built once per server process and shared by every session (engines only clone prototypes)
+@st.cache_resource
+def load_prototypes():
+    return create_all_character_prototypes(prefix="")
+
+@st.cache_resource
+def load_move_tables():
+    # UI move pickers from the move registry: shortname -> {"1": "attack", "2": special, "3": special}
+    return {
+        sn: {"1": "attack", "2": kit.specials[0], "3": kit.specials[1]}
+        for sn, kit in CHARACTER_KITS.items()
+    }
+
+prototypes = load_prototypes()
+move_names_map = load_move_tables()
 
 # Setup session state
 if "engine" not in st.session_state:
     # instantiate a BattleEngine with prototypes as both player and CPU choices
-    eng = BattleEngine(prototypes, prototypes)
+    eng = BattleEngine(prototypes, prototypes, log_mode="ring")
     st.session_state.engine = eng
     st.session_state.phase = "team_select"  # phases: team_select, in_battle
     st.session_state.selected_indices = []
     st.session_state.player_action_choices = {}
     st.session_state.last_error = ""
+    st.session_state.history = []   # engine snapshots taken before each round (undo)
 
 engine: BattleEngine = st.session_state.engine
 
-# Helper UI: show character card
-def char_card(c):
-    cols = st.columns([1,4])
-    with cols[0]:
-        st.write("")  # placeholder for image
-    with cols[1]:
-        st.markdown(f"**{c.name}**")
-        st.write(f"HP: {c.hp}/{c.max_hp}")
-        st.write(f"SPD: {c.effective_speed()}")
-        flags = []
-        if c.stunned: flags.append("STUNNED")
-        if c.team_crit_buff_turns>0: flags.append(f"CRITBUFF:{c.team_crit_buff_turns}")
-        if c.team_speed_buff_turns>0: flags.append(f"SPEED+{c.team_speed_bonus}:{c.team_speed_buff_turns}")
-        if c.damage_buff_turns>0: flags.append(f"DMG+:{c.damage_buff_turns}")
-        if c.resist_buff_turns>0: flags.append(f"RES+:{c.resist_buff_turns}")
-        if flags:
-            st.write(" | ".join(flags))
+# Helper UI: show character card (one markdown element per card); turns maps timed-effect fields to
+# the turns they have left (EffectScheduler.active, or effects.turns_left_in for a snapshot)
+def char_card(c, turns):
+    lines = [f"**{c.name}**", f"HP: {c.hp}/{c.max_hp}", f"SPD: {c.effective_speed()}"]
+    flags = []
+    if c.stunned: flags.append("STUNNED")
+    if c.team_crit_buff_turns>0: flags.append(f"CRITBUFF:{turns['team_crit_buff_turns']}")
+    if c.team_speed_buff_turns>0: flags.append(f"SPEED+{c.team_speed_bonus}:{turns['team_speed_buff_turns']}")
+    if c.damage_buff_turns>0: flags.append(f"DMG+:{turns['damage_buff_turns']}")
+    if c.resist_buff_turns>0: flags.append(f"RES+:{turns['resist_buff_turns']}")
+    if flags:
+        lines.append(" | ".join(flags))
+    st.markdown("  \n".join(lines))
 
 # Team selection screen
 if st.session_state.phase == "team_select":
@@ -59,12 +73,17 @@ if st.session_state.phase == "team_select":
                     else:
                         st.warning("You already selected 3. Deselect to pick another.")
     st.write("Selected indices:", st.session_state.selected_indices)
+    difficulties = list(DIFFICULTIES)
+    difficulty = st.selectbox("CPU difficulty", difficulties, index=difficulties.index(engine.difficulty))
+    if difficulty != engine.difficulty:
+        engine = st.session_state.engine = BattleEngine(prototypes, prototypes, log_mode="ring", difficulty=difficulty)
     if st.button("Start Battle") and len(st.session_state.selected_indices) == 3:
         # pick CPU team randomly
         cpu_indices = engine.cpu_pick_random_team_indices()
         engine.start_battle(st.session_state.selected_indices, cpu_indices)
         st.session_state.phase = "in_battle"
         st.session_state.player_action_choices = {}
+        st.session_state.history = []
         st.rerun()
     elif st.button("Start Quick Battle (random)"):
         player_indices = random.sample(range(len(prototypes)), 3)
@@ -72,190 +91,190 @@ if st.session_state.phase == "team_select":
         engine.start_battle(player_indices, cpu_indices)
         st.session_state.phase = "in_battle"
         st.session_state.player_action_choices = {}
+        st.session_state.history = []
         st.rerun()
     st.stop()
 
-# In-battle UI
-player_team = engine.get_player_team()
-cpu_team = engine.get_cpu_team()
-
-col_left, col_right = st.columns([3,2])
+# In-battle UI: four fragments, so a widget change reruns only its own panel (Streamlit >= 1.37).
+# Anything that changes the battle calls st.rerun(), which reruns the whole page.
+@st.fragment
+def team_panels():
+    engine = st.session_state.engine
+    col_left, col_right = st.columns([3,2])
 
-with col_left:
-    st.subheader("Your Team")
-    for i, c in enumerate(player_team):
-        with st.expander(f"{i}. {c.name}  — {c.hp}/{c.max_hp} HP"):
-            char_card(c)
+    with col_left:
+        st.subheader("Your Team")
+        for i, c in enumerate(engine.get_player_team()):
+            with st.expander(f"{i}. {c.name}  — {c.hp}/{c.max_hp} HP"):
+                char_card(c, engine.effects.active(c))
 
-with col_right:
-    st.subheader("CPU Team")
-    for i, c in enumerate(cpu_team):
-        st.write(f"{i}. {c.name} — {c.hp}/{c.max_hp} HP")
+    with col_right:
+        st.subheader("CPU Team")
+        st.markdown("  \n".join(f"{i}. {c.name} — {c.hp}/{c.max_hp} HP" for i, c in enumerate(engine.get_cpu_team())))
 
-st.markdown("---")
-st.subheader("Choose moves for your team (for all 3 characters)")
 
-# Build UI for selecting actions
-move_names_map = {
-    "RW": { "1":"attack", "2":"heroic_raise", "3":"ruby_shield" },
-    "EA": { "1":"attack", "2":"arrow_shower", "3":"sharp_aim" },
-    "TB": { "1":"attack", "2":"shiny_flex", "3":"stun_punch" },
-    "CA": { "1":"attack", "2":"vital_stab", "3":"sneak_boost" },
-    "QK": { "1":"attack", "2":"die_for_me", "3":"kings_command" }
-}
+@st.fragment
+def move_pickers():
+    engine = st.session_state.engine
+    player_team = engine.get_player_team()
+    st.subheader("Choose moves for your team (for all 3 characters)")
 
-player_choices = {}
-player_errors = []
+    player_choices = {}
+    player_errors = []
+    legal = engine.legal_actions("player")
 
-for idx, ch in enumerate(player_team):
-    if not ch.is_alive():
-        st.info(f"{idx}. {ch.name} is down.")
-        continue
-    st.markdown(f"**{idx}. {ch.name}**")
-    options = []
-    options.append("1) Attack")
-    if ch.shortname in move_names_map:
-        options.append(f"2) {move_names_map[ch.shortname]['2']}")
-        options.append(f"3) {move_names_map[ch.shortname]['3']}")
-    heal_label = f"4) Heal Ring (left {engine.player_heal_left})"
-    options.append(heal_label)
+    for idx, ch in enumerate(player_team):
+        if not ch.is_alive():
+            st.info(f"{idx}. {ch.name} is down.")
+            continue
+        st.markdown(f"**{idx}. {ch.name}**")
+        alive_indices = [t for name, t in legal[idx] if name == "attack"]
+        options = []
+        options.append("1) Attack")
+        if ch.shortname in move_names_map:
+            options.append(f"2) {move_names_map[ch.shortname]['2']}")
+            options.append(f"3) {move_names_map[ch.shortname]['3']}")
+        heal_label = f"4) Heal Ring (left {engine.player_heal_left})"
+        options.append(heal_label)
 
-    sel = st.radio(f"Select move for {ch.name}", options, key=f"move_{idx}")
+        sel = st.radio(f"Select move for {ch.name}", options, key=f"move_{idx}")
 
-    # Map selection to action tuple
-    if sel.startswith("1"):
-        # Attack target selection
-        alive_indices = [i for i, e in enumerate(cpu_team) if e.is_alive()]
-        if not alive_indices:
-            player_choices[idx] = ("none", None)
-        else:
-            target = st.selectbox(f"Choose target for {ch.name}", alive_indices, key=f"target_{idx}")
-            player_choices[idx] = ("attack", int(target))
-    elif sel.startswith("2"):
-        act = move_names_map[ch.shortname]["2"]
-        if act == "vital_stab":
-            alive_indices = [i for i, e in enumerate(cpu_team) if e.is_alive()]
+        # Map selection to action tuple
+        if sel.startswith("1"):
+            # Attack target selection
             if not alive_indices:
                 player_choices[idx] = ("none", None)
             else:
-                target = st.selectbox(f"Choose target for Vital Stab ({ch.name})", alive_indices, key=f"vital_target_{idx}")
-                player_choices[idx] = ("vital_stab", int(target))
-        else:
-            player_choices[idx] = (act, None)
-    elif sel.startswith("3"):
-        act = move_names_map[ch.shortname]["3"]
-        if act == "stun_punch":
-            alive_indices = [i for i, e in enumerate(cpu_team) if e.is_alive()]
-            if not alive_indices:
-                player_choices[idx] = ("none", None)
+                target = st.selectbox(f"Choose target for {ch.name}", alive_indices, key=f"target_{idx}")
+                player_choices[idx] = ("attack", int(target))
+        elif sel.startswith("2") or sel.startswith("3"):
+            act = move_names_map[ch.shortname][sel[0]]
+            if MOVES[act].targeting == ENEMY:
+                if not alive_indices:
+                    player_choices[idx] = ("none", None)
+                else:
+                    target = st.selectbox(f"Choose target for {MOVES[act].label} ({ch.name})", alive_indices, key=f"{act}_target_{idx}")
+                    player_choices[idx] = (act, int(target))
             else:
-                target = st.selectbox(f"Choose target for Stun Punch ({ch.name})", alive_indices, key=f"stun_target_{idx}")
-                player_choices[idx] = ("stun_punch", int(target))
+                player_choices[idx] = (act, None)
         else:
-            player_choices[idx] = (act, None)
-    else:
-        # heal option -> choose all or single
-        if engine.player_heal_left <= 0:
-            st.warning("No Heal Rings left — default to Attack on first alive CPU.")
-            alive_indices = [i for i, e in enumerate(cpu_team) if e.is_alive()]
-            player_choices[idx] = ("attack", alive_indices[0] if alive_indices else None)
-        else:
-            heal_mode = st.radio(f"Heal mode for {ch.name}", ["a) Heal All (30%)", "b) Heal One (75%)"], key=f"hm_{idx}")
-            if heal_mode.startswith("a"):
-                player_choices[idx] = ("heal_all", None)
+            # heal option -> choose all or single
+            if engine.player_heal_left <= 0:
+                st.warning("No Heal Rings left — default to Attack on first alive CPU.")
+                player_choices[idx] = ("attack", alive_indices[0] if alive_indices else None)
             else:
-                ally_indices = [i for i, a in enumerate(player_team)]
-                t = st.selectbox(f"Choose ally to heal for {ch.name}", ally_indices, key=f"heal_target_{idx}")
-                player_choices[idx] = ("heal_single", int(t))
+                heal_mode = st.radio(f"Heal mode for {ch.name}", ["a) Heal All (30%)", "b) Heal One (75%)"], key=f"hm_{idx}")
+                if heal_mode.startswith("a"):
+                    player_choices[idx] = ("heal_all", None)
+                else:
+                    ally_indices = [i for i, a in enumerate(player_team)]
+                    t = st.selectbox(f"Choose ally to heal for {ch.name}", ally_indices, key=f"heal_target_{idx}")
+                    player_choices[idx] = ("heal_single", int(t))
 
-# Validate status-repeat rule client-side and show errors
-valid = True
-for idx, act in player_choices.items():
-    ch = player_team[idx]
-    name, param = act
-    if is_status_move(name) and ch.last_status_move == name:
-        player_errors.append(f"{ch.name} cannot use {name} twice in a row.")
-        valid = False
+    # Validate client-side against the engine's legal actions and show errors (nothing to pick once it is over)
+    valid = True
+    if not engine.is_over():
+        for idx, act in player_choices.items():
+            error = engine.action_error("player", idx, act)
+            if error is not None:
+                player_errors.append(error)
+                valid = False
 
-if player_errors:
-    for e in player_errors:
-        st.error(e)
+    if player_errors:
+        for e in player_errors:
+            st.error(e)
 
-# Buttons: Commit player moves & execute turn
-col1, col2 = st.columns([1,1])
-with col1:
-    if st.button("Confirm Moves (lock in)"):
-        # Attempt to set actions on engine
-        actions_list = []
-        for i in range(len(player_team)):
-            if i in player_choices:
-                actions_list.append(player_choices[i])
+    # Buttons: Commit player moves & execute turn
+    col1, col2, col3, col4 = st.columns([1,1,1,1])
+    with col1:
+        if st.button("Confirm Moves (lock in)"):
+            # Attempt to set actions on engine
+            actions_list = []
+            for i in range(len(player_team)):
+                if i in player_choices:
+                    actions_list.append(player_choices[i])
+                else:
+                    actions_list.append(("none", None))
+            snap = engine.snapshot()
+            ok, msg = engine.set_player_actions(actions_list)
+            if not ok:
+                st.session_state.last_error = msg
+                st.error(msg)
             else:
-                actions_list.append(("none", None))
-        ok, msg = engine.set_player_actions(actions_list)
-        if not ok:
-            st.session_state.last_error = msg
-            st.error(msg)
-        else:
-            # pick cpu actions and resolve
+                st.session_state.history.append(snap)
+                # pick cpu actions and resolve
+                engine._choose_cpu_actions()
+                engine.resolve_round()
+                st.rerun()
+
+    with col2:
+        if st.button("Auto-play 1 Round (random moves)"):
+            st.session_state.history.append(engine.snapshot())
+            engine.set_player_actions(random_policy(engine, "player"))
             engine._choose_cpu_actions()
             engine.resolve_round()
             st.rerun()
 
-with col2:
-    if st.button("Auto-play 1 Round (random moves)"):
-        # choose random legal moves for player and resolve
-        rand_actions = []
-        for ch in player_team:
-            if not ch.is_alive():
-                rand_actions.append(("none", None))
-                continue
-            # pick random move that obeys status repeat
-            attempt = 0
-            while True:
-                attempt += 1
-                # moves: attack, two statuses, heal (if any)
-                choices = []
-                choices.append(("attack", None))
-                if ch.shortname == "RW":
-                    choices.append(("heroic_raise", None))
-                    choices.append(("ruby_shield", None))
-                elif ch.shortname == "EA":
-                    choices.append(("arrow_shower", None))
-                    choices.append(("sharp_aim", None))
-                elif ch.shortname == "TB":
-                    choices.append(("shiny_flex", None))
-                    # choose a random target for stun later
-                    alive = [i for i,e in enumerate(cpu_team) if e.is_alive()]
-                    choices.append(("stun_punch", random.choice(alive) if alive else None))
-                elif ch.shortname == "CA":
-                    alive = [i for i,e in enumerate(cpu_team) if e.is_alive()]
-                    choices.append(("vital_stab", random.choice(alive) if alive else None))
-                    choices.append(("sneak_boost", None))
-                elif ch.shortname == "QK":
-                    choices.append(("die_for_me", None))
-                    choices.append(("kings_command", None))
+    with col3:
+        if st.button("Fast-forward to End (random moves)"):
+            # every remaining round in one call; the pre-round snapshots feed undo and the playback panel
+            with st.spinner("Playing out the battle..."):
+                engine.play_until_end(random_policy, history=st.session_state.history)
+            st.rerun()
+
+    with col4:
+        if st.button("Undo Round", disabled=not st.session_state.history):
+            engine.restore(st.session_state.history.pop())
+            st.rerun()
 
-                if engine.player_heal_left > 0:
-                    choices.append(("heal_all", None))
-                pick = random.choice(choices)
-                if is_status_move(pick[0]) and ch.last_status_move == pick[0]:
-                    if attempt > 20:
-                        pick = ("attack", random.choice([i for i,e in enumerate(cpu_team) if e.is_alive()]) )
-                        break
-                    continue
-                break
-            rand_actions.append(pick)
-        engine.set_player_actions(rand_actions)
-        engine._choose_cpu_actions()
-        engine.resolve_round()
-        st.rerun()
 
-# show battle log
+@st.fragment
+def playback():
+    # per-round summary and a slider over the recorded snapshots: nothing is re-simulated
+    history = st.session_state.history
+    if not history:
+        return
+    engine = st.session_state.engine
+    frames = [(s.round_number - 1, [Character.from_state(c) for c in s.player_team],
+               [Character.from_state(c) for c in s.cpu_team]) for s in history]
+    frames.append((engine.round_number - 1, engine.get_player_team(), engine.get_cpu_team()))
+    with st.expander("Round summary & playback", expanded=engine.is_over()):
+        rows = []
+        for rnd, player_team, cpu_team in frames[1:]:
+            rows.append({
+                "After round": rnd,
+                "Your HP": sum(c.hp for c in player_team), "Your team up": sum(c.is_alive() for c in player_team),
+                "CPU HP": sum(c.hp for c in cpu_team), "CPU team up": sum(c.is_alive() for c in cpu_team),
+            })
+        st.dataframe(rows, hide_index=True)
+        pos = st.slider("After round", 0, len(frames) - 1, len(frames) - 1)
+        _, player_team, cpu_team = frames[pos]
+        col_left, col_right = st.columns(2)
+        for col, side, team in ((col_left, "player", player_team), (col_right, "cpu", cpu_team)):
+            with col:
+                for i, c in enumerate(team):
+                    if pos < len(history):
+                        snap = history[pos]
+                        char_card(c, turns_left_in(snap.effects, snap.round_number, side, i))
+                    else:
+                        char_card(c, engine.effects.active(c))
+
+
+@st.fragment
+def battle_log():
+    engine = st.session_state.engine
+    st.subheader("Battle Log")
+    n = st.selectbox("Lines", [30, 100, 200], key="log_lines")
+    # one text element for the whole log instead of one element per line
+    st.text("\n".join(reversed(engine.get_log(n))))
+
+
+team_panels()
+st.markdown("---")
+move_pickers()
 st.markdown("---")
-st.subheader("Battle Log")
-for line in reversed(engine.get_log(30)):
-    st.write(line)
+playback()
+battle_log()
 
 # End conditions
 if engine.all_dead(engine.get_cpu_team()):
@@ -264,7 +283,7 @@ if engine.all_dead(engine.get_cpu_team()):
         st.session_state.phase = "team_select"
         st.session_state.selected_indices = []
         st.session_state.player_action_choices = {}
-        st.session_state.engine = BattleEngine(prototypes, prototypes)
+        st.session_state.engine = BattleEngine(prototypes, prototypes, log_mode="ring", difficulty=engine.difficulty)
         st.rerun()
 
 if engine.all_dead(engine.get_player_team()):
@@ -273,5 +292,5 @@ if engine.all_dead(engine.get_player_team()):
         st.session_state.phase = "team_select"
         st.session_state.selected_indices = []
         st.session_state.player_action_choices = {}
-        st.session_state.engine = BattleEngine(prototypes, prototypes)
+        st.session_state.engine = BattleEngine(prototypes, prototypes, log_mode="ring", difficulty=engine.difficulty)
         st.rerun()
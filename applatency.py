@@ -0,0 +1,144 @@
+# applatency.py
+"""
+Interaction latency of the Streamlit app, measured against a live server.
+
+Starts `streamlit run` on the given script, drives one session over the app's websocket the way the
+browser does (BackMsg rerun requests carrying widget states, fragment-scoped where the widget lives in
+a fragment) and times each interaction from request to the script_finished message:
+
+    picker   change a move radio
+    log      change the log length (only if the app has that selectbox)
+    confirm  lock in moves and resolve a round
+
+    python applatency.py                  # app.py, 60 interactions of each kind
+    python applatency.py old_app.py -n 100
+
+Needs streamlit (and websockets, which streamlit depends on).
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+DEFAULT_PORT = 8599
+WIDGET_TYPES = ("button", "radio", "selectbox")
+
+
+class Session:
+    """One browser-like session: remembers widget values and where each widget was last drawn."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}   # label -> (widget proto, fragment id)
+        self.values = {}    # widget id -> string value
+
+    async def rerun(self, trigger=None, value=None, fragment_id=""):
+        msg = BackMsg()
+        state = msg.rerun_script
+        if value is not None:
+            self.values[value[0]] = value[1]
+        for wid, v in self.values.items():
+            w = state.widget_states.widgets.add()
+            w.id = wid
+            w.string_value = v
+        if trigger is not None:
+            w = state.widget_states.widgets.add()
+            w.id = trigger
+            w.trigger_value = True
+        state.fragment_id = fragment_id
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            fm = ForwardMsg()
+            fm.ParseFromString(await self.ws.recv())
+            kind = fm.WhichOneof("type")
+            if kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                element = fm.delta.new_element
+                etype = element.WhichOneof("type")
+                if etype in WIDGET_TYPES:
+                    widget = getattr(element, etype)
+                    self.widgets[widget.label] = (widget, fm.delta.fragment_id)
+            elif kind == "script_finished" and fm.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - t0
+
+    def find(self, prefix):
+        for label, found in self.widgets.items():
+            if label.startswith(prefix):
+                return found
+        return None, None
+
+
+def percentile(samples, q):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[int(q * (len(ordered) - 1))] * 1000
+
+
+async def measure(port, n):
+    timings = {"picker": [], "log": [], "confirm": []}
+    async with websockets.connect(f"ws://localhost:{port}/_stcore/stream", max_size=None) as ws:
+        session = Session(ws)
+        await session.rerun()
+        for i in range(n):
+            start, _ = session.find("Start Quick")
+            if start is not None and session.find("Select move for")[0] is None:
+                await session.rerun(trigger=start.id)
+            radio, frag = session.find("Select move for")
+            timings["picker"].append(await session.rerun(value=(radio.id, radio.options[i % 2]), fragment_id=frag))
+            lines, frag = session.find("Lines")
+            if lines is not None:
+                timings["log"].append(await session.rerun(value=(lines.id, lines.options[(i + 1) % 2]),
+                                                          fragment_id=frag))
+            radio, frag = session.find("Select move for")
+            await session.rerun(value=(radio.id, radio.options[0]), fragment_id=frag)
+            confirm, frag = session.find("Confirm")
+            timings["confirm"].append(await session.rerun(trigger=confirm.id, fragment_id=frag))
+            restart, _ = session.find("Restart")
+            if restart is not None:
+                session.widgets.clear()
+                await session.rerun(trigger=restart.id)
+    return timings
+
+
+def wait_for_server(port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"streamlit server on port {port} did not come up")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="p50/p95 interaction latency of the Streamlit app.")
+    parser.add_argument("script", nargs="?", default="app.py")
+    parser.add_argument("-n", type=int, default=60, help="interactions of each kind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args, extra = parser.parse_known_args(argv)
+
+    server = subprocess.Popen([sys.executable, "-m", "streamlit", "run", args.script, "--server.headless", "true",
+                               "--server.port", str(args.port)] + extra,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(args.port)
+        timings = asyncio.run(measure(args.port, args.n))
+    finally:
+        server.terminate()
+        server.wait()
+    for kind, samples in timings.items():
+        if samples:
+            print(f"  {kind:8s} p50 {percentile(samples, 0.5):8.1f} ms   p95 {percentile(samples, 0.95):8.1f} ms"
+                  f"   ({len(samples)} runs)")
+
+
+if __name__ == "__main__":
+    main()
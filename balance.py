@@ -0,0 +1,204 @@
+# balance.py
+"""
+Balance tuner: searches character stats and attack ranges until every character's win rate (per team
+slot, random 3v3 teams, CPU AI on both sides) is within 50% +- tolerance.
+
+The objective is the largest deviation from 50% over the characters, measured with the vectorized
+engine (vecengine.py). The search is a directed local search: each candidate nudges one stat of one
+character, usually the one furthest from 50%, in the direction that pulls it back (a buff for an
+underdog, a nerf for a favourite), with a step that grows with the deviation. Candidates are raced in
+stages of increasing size; after each stage, a candidate is dropped once the lower confidence bound of
+its deviation is already worse than the best set so far. Most bad candidates cost one small stage, and
+only the survivors pay for the full battle count. A candidate that finishes every stage is then judged
+against the best set re-run on the same seeds (common random numbers, as in abtest.py): it replaces the
+best set only if it wins that paired comparison. Otherwise the re-run is merged into the best set's
+result, so its estimate keeps sharpening instead of staying at the lucky draw that made it the best.
+
+At ~18k battles/s per core, a candidate costs 0.2 s when dropped after the first stage and 4 s when
+it runs all stages, so an overnight run tries thousands of candidates on a single core.
+
+    python balance.py                                   # tolerance 0.03, stop at target or after 8 h
+    python balance.py --hours 10 --workers 8 --out tuned.json
+    python balance.py --start tuned.json --hours 2      # continue from a saved set
+
+The result prints as the Character(...) lines of create_all_character_prototypes and the ATTACK_RANGES
+entries, ready to paste. Needs numpy.
+"""
+import argparse
+import json
+import math
+import random
+import time
+from multiprocessing import Pool, cpu_count
+
+from characters import ATTACK_RANGES, DEFAULT_ATTACK_RANGE, Character, create_all_character_prototypes
+from simulate import BatchResult
+from vecengine import run_vectorized
+
+DEFAULT_TOLERANCE = 0.03
+DEFAULT_STAGES = (4096, 12288, 49152)    # battles per racing stage (65536 for a full evaluation)
+DEFAULT_HOURS = 8.0
+BATCH_SIZE = 4096
+Z_RACE = 1.0      # a candidate is dropped once it is ~84% sure to be worse than the best set
+Z_TARGET = 2.0    # the target counts as met once it holds at ~98% confidence
+
+# tunable stat -> (lowest, highest, base step); larger is a buff for every one of them
+PARAM_SPACE = {
+    "max_hp": (300, 3000, 50),
+    "base_speed": (10, 150, 5),
+    "base_crit": (0, 60, 2),
+    "crit_amp": (0, 300, 10),
+    "attack": (20, 800, 10),     # shifts the attack range, keeping its spread
+}
+
+
+def stock_params():
+    # {shortname: {stat: value}} of the current characters, attack as the range's low end plus "spread"
+    params = {}
+    for p in create_all_character_prototypes():
+        low, high = ATTACK_RANGES.get(p.shortname, DEFAULT_ATTACK_RANGE)
+        params[p.shortname] = {"max_hp": p.max_hp, "base_speed": p.base_speed, "base_crit": p.base_crit,
+                               "crit_amp": p.crit_amp, "attack": low, "spread": high - low}
+    return params
+
+
+def build(params):
+    # (prototypes, attack_ranges) for a parameter set; names come from the stock characters
+    names = {p.shortname: p.name for p in create_all_character_prototypes()}
+    protos = [Character(sn, names[sn], s["max_hp"], s["base_speed"], s["base_crit"], s["crit_amp"])
+              for sn, s in params.items()]
+    ranges = {sn: (s["attack"], s["attack"] + s["spread"]) for sn, s in params.items()}
+    return protos, ranges
+
+
+def deviation(result, z=0.0):
+    """Largest |win rate - 0.5| over the characters, less z standard errors (floored at 0) when z > 0."""
+    worst = 0.0
+    for sn, n in result.char_battles.items():
+        p = result.char_wins.get(sn, 0) / n
+        d = abs(p - 0.5) - z * math.sqrt(max(p * (1 - p), 1e-9) / n)
+        worst = max(worst, d)
+    return worst
+
+
+def evaluate(params, stages, key, best=None, z=Z_RACE, workers=1, pool=None):
+    """
+    Races one parameter set through the stages, seeded from key (a tuple of ints). Returns
+    (result, finished): finished is False when it was dropped early because its deviation's lower
+    bound already exceeded best.
+    """
+    protos, ranges = build(params)
+    result = BatchResult()
+    for stage, n in enumerate(stages):
+        part = run_vectorized(n, workers=workers, batch_size=min(BATCH_SIZE, n), seed=list(key) + [stage],
+                              prototypes=protos, attack_ranges=ranges, pool=pool)
+        result.merge(part)
+        if best is not None and deviation(result, z) > best:
+            return result, False
+    return result, True
+
+
+def propose(params, rates, rng, tolerance):
+    # one stat of one character, moved toward 50%: mostly the worst character, sometimes any other
+    worst = max(rates, key=lambda sn: abs(rates[sn] - 0.5))
+    while True:
+        sn = worst if rng.random() < 0.7 else rng.choice(sorted(rates))
+        stat = rng.choice(sorted(PARAM_SPACE))
+        low, high, step = PARAM_SPACE[stat]
+        direction = 1 if rates[sn] < 0.5 else -1
+        size = min(abs(rates[sn] - 0.5) / tolerance, 4.0)
+        delta = direction * max(1, round(step * size * rng.uniform(0.5, 1.5)))
+        value = min(max(params[sn][stat] + delta, low), high)
+        if value != params[sn][stat]:
+            break   # else the stat is at its bound already
+    candidate = {k: dict(v) for k, v in params.items()}
+    candidate[sn][stat] = value
+    return candidate, f"{sn}.{stat} {params[sn][stat]} -> {candidate[sn][stat]}"
+
+
+def tune(params=None, tolerance=DEFAULT_TOLERANCE, stages=DEFAULT_STAGES, hours=DEFAULT_HOURS, max_candidates=None,
+         workers=1, seed=0, out=None, log=print):
+    """
+    Tunes params (default: the stock characters) and returns (params, result) of the best set found.
+    Stops when the best set's deviation plus Z_TARGET standard errors is within tolerance, after `hours`,
+    or after max_candidates candidates. With out, the best set is saved as JSON whenever it improves.
+    """
+    params = params or stock_params()
+    rng = random.Random(seed)
+    deadline = time.time() + hours * 3600
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        result, _ = evaluate(params, stages, (seed, 0), workers=workers, pool=pool)
+        best = deviation(result)
+        log(f"start: deviation {best:.2%}  {format_rates(result)}")
+        tried = dropped = 0
+        while deviation(result, -Z_TARGET) > tolerance and time.time() < deadline:
+            if max_candidates is not None and tried >= max_candidates:
+                break
+            tried += 1
+            candidate, change = propose(params, result.char_win_rates(), rng, tolerance)
+            cand_result, finished = evaluate(candidate, stages, (seed, tried), best, workers=workers, pool=pool)
+            if not finished:
+                dropped += 1
+                continue
+            # re-measure the incumbent on the candidate's seeds, so one lucky draw cannot decide
+            inc_result, _ = evaluate(params, stages, (seed, tried), workers=workers, pool=pool)
+            if deviation(cand_result) < deviation(inc_result):
+                params, result, best = candidate, cand_result, deviation(cand_result)
+                log(f"#{tried} {change}: deviation {best:.2%}  {format_rates(result)}  ({dropped} dropped early)")
+                if out:
+                    save(out, params)
+            else:
+                result.merge(inc_result)
+                best = deviation(result)
+        log(f"{tried} candidates, {dropped} dropped early; best deviation {best:.2%}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return params, result
+
+
+def format_rates(result):
+    return "  ".join(f"{sn} {rate:.1%}" for sn, rate in result.char_win_rates().items())
+
+
+def format_params(params):
+    protos, ranges = build(params)
+    lines = [f'        Character("{p.shortname}", f"{{prefix}} {p.name.strip()}", {p.max_hp}, {p.base_speed}, '
+             f'{p.base_crit}, {p.crit_amp}),' for p in protos]
+    lines.append("")
+    lines.extend(f'    "{sn}": ({low}, {high}),' for sn, (low, high) in ranges.items())
+    return "\n".join(lines)
+
+
+def save(path, params):
+    with open(path, "w") as f:
+        json.dump(params, f, indent=1)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune character stats toward 50% win rates.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--stages", type=int, nargs="+", default=list(DEFAULT_STAGES),
+                        help="battles per racing stage")
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS, help="time limit")
+    parser.add_argument("--max-candidates", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", metavar="PATH", help="start from a saved parameter set")
+    parser.add_argument("--out", metavar="PATH", help="save the best set as JSON whenever it improves")
+    args = parser.parse_args(argv)
+
+    params, result = tune(load(args.start) if args.start else None, args.tolerance, args.stages, args.hours,
+                          args.max_candidates, args.workers or cpu_count(), args.seed, args.out)
+    print(format_params(params))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# battlelog.py
+"""
+Structured battle log.
+
+The engine records events as plain tuples (kind, prefix, actor, target, amount, extra) holding names
+and numbers only; the text shown in the UI is rendered from TEMPLATES when the log is read. Three
+modes: "full" keeps every event, "ring" keeps the last `size` events, "off" drops everything
+(headless simulation).
+"""
+from collections import deque
+
+# event kinds
+ROUND = "round"
+HEAL_ALL = "heal_all"
+HEAL_ONE = "heal_one"
+HEAL_INVALID = "heal_invalid"
+STUNNED = "stunned"
+REDIRECT = "redirect"
+ATTACK = "attack"
+USES = "uses"
+AOE_HIT = "aoe_hit"
+SHARP_AIM = "sharp_aim"
+STUN_PUNCH = "stun_punch"
+VITAL_STAB = "vital_stab"
+DIE_FOR_ME = "die_for_me"
+DIE_FOR_ME_FAILED = "die_for_me_failed"
+KINGS_COMMAND = "kings_command"
+KINGS_COMMAND_FAILED = "kings_command_failed"
+
+TEMPLATES = {
+    ROUND: "--- Round {amount} ---",
+    HEAL_ALL: "{prefix} {actor} used Heal Ring -> Heal All (30%).",
+    HEAL_ONE: "{prefix} {actor} used Heal Ring -> Heal One on {target} (75%).",
+    HEAL_INVALID: "{prefix} {actor} attempted Heal Ring (single) but target invalid.",
+    STUNNED: "{actor} is stunned and cannot act this round.",
+    REDIRECT: "{prefix} {actor} takes the hit for {target} (QK).",
+    ATTACK: "{prefix} {actor} attacks {target} for {amount}{extra}.",
+    USES: "{prefix} {actor} uses {extra}.",
+    AOE_HIT: "  → {target} takes {amount} AoE damage.",
+    SHARP_AIM: "{prefix} {actor} uses Sharp Aim (guarantees next crit).",
+    STUN_PUNCH: "{prefix} {actor} hits {target} with Stun Punch for {amount} and stuns them.",
+    VITAL_STAB: "{prefix} {actor} uses Vital Stab on {target} for {amount} damage and heals {extra} HP.",
+    DIE_FOR_ME: "{prefix} {actor} uses Die For Me: {target} will absorb the first hit aimed at {actor} next turn.",
+    DIE_FOR_ME_FAILED: "{prefix} {actor} tried to use Die For Me but it failed (no available protector).",
+    KINGS_COMMAND: "{prefix} {actor} uses King's Command: +20% damage & +20% resist for 2 turns.",
+    KINGS_COMMAND_FAILED: "{prefix} {actor} tried to use King's Command but buff already active — move fails.",
+}
+
+DEFAULT_RING_SIZE = 200
+
+
+def render(event):
+    kind, prefix, actor, target, amount, extra = event
+    return TEMPLATES[kind].format(prefix=prefix, actor=actor, target=target, amount=amount, extra=extra)
+
+
+class BattleLog:
+    """Keeps every event ("full" mode)."""
+
+    def __init__(self):
+        self._events = []
+
+    def add(self, kind, prefix="", actor="", target="", amount=0, extra=""):
+        self._events.append((kind, prefix, actor, target, amount, extra))
+
+    def clear(self):
+        self._events = []
+
+    def events(self):
+        return list(self._events)
+
+    def tail(self, n):
+        # rendered text of the last n events
+        return [render(e) for e in self._events[-n:]]
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return (render(e) for e in self._events)
+
+    # snapshot support: the event list is append-only, so a (list, length) pair is a stable mark
+    def mark(self):
+        return self._events, len(self._events)
+
+    def rewind(self, mark):
+        events, n = mark
+        self._events = events[:n]
+
+
+class RingLog(BattleLog):
+    """Keeps the last `size` events ("ring" mode)."""
+
+    def __init__(self, size=DEFAULT_RING_SIZE):
+        self.size = size
+        self._events = deque(maxlen=size)
+
+    def clear(self):
+        self._events = deque(maxlen=self.size)
+
+    def tail(self, n):
+        return [render(e) for e in list(self._events)[-n:]]
+
+    def mark(self):
+        # the deque is mutated in place, so a mark has to copy it (at most `size` events)
+        return tuple(self._events)
+
+    def rewind(self, mark):
+        self._events = deque(mark, maxlen=self.size)
+
+
+class NullLog(BattleLog):
+    """Drops every event ("off" mode)."""
+
+    def add(self, kind, prefix="", actor="", target="", amount=0, extra=""):
+        pass
+
+    def mark(self):
+        return None
+
+    def rewind(self, mark):
+        pass
+
+
+def make_log(mode="full", size=DEFAULT_RING_SIZE):
+    if mode == "full":
+        return BattleLog()
+    if mode == "ring":
+        return RingLog(size)
+    if mode == "off":
+        return NullLog()
+    raise ValueError(f"unknown log mode {mode!r} (full, ring or off)")
@@ -0,0 +1,257 @@
+# bench.py
+"""
+Micro-benchmarks for the engine hot paths.
+
+    python bench.py                                  # run every benchmark
+    python bench.py clone engine                     # just the named ones
+    python bench.py --save baseline.json             # record a baseline
+    python bench.py --compare baseline.json          # exit 1 if any metric regressed beyond --threshold
+    python bench.py scaling                          # per-round cost for teams of 3 up to 1000 a side
+
+Metrics ending in _us or _bytes are lower-is-better, _per_sec and _speedup higher-is-better; everything
+runs at fixed seeds and compositions so runs are comparable.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from copy import deepcopy
+from types import SimpleNamespace
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from rng import BufferedRandom, make_rng
+from simulate import play_battle
+
+# Character's attributes before __slots__ (the first commit's characters.py), for the clone baseline
+BASELINE_CHARACTER_FIELDS = (
+    "shortname", "name", "max_hp", "hp", "base_speed", "base_crit", "crit_amp",
+    "crit_immune_turns", "damage_resist_turns", "guaranteed_crit_turn", "stunned",
+    "team_crit_buff_turns", "team_speed_buff_turns", "team_speed_bonus",
+    "damage_buff_turns", "resist_buff_turns",
+    "acted_this_round", "last_status_move", "take_hit_for_qk",
+)
+
+
+def _per_call_us(stmt, number):
+    # best of 5 repeats, in microseconds per call
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def _per_instance_bytes(make, n=10000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [make() for _ in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / n
+
+
+def bench_clone():
+    """Character clone cost and per-instance memory: deepcopy/__dict__ layout vs slotted clone()."""
+    proto = create_all_character_prototypes()[0]
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos)
+    # the pre-__slots__ layout: the old attribute set in an instance __dict__, cloned by deepcopy
+    fields = {name: getattr(proto, name) for name in BASELINE_CHARACTER_FIELDS}
+    old = SimpleNamespace(**fields)
+
+    results = {
+        "deepcopy_us": _per_call_us(lambda: deepcopy(old), 20000),
+        "clone_us": _per_call_us(proto.clone, 200000),
+        "start_battle_us": _per_call_us(lambda: engine.start_battle([0, 1, 2], [2, 3, 4]), 20000),
+        "dict_instance_bytes": _per_instance_bytes(lambda: SimpleNamespace(**fields)),
+        "slots_instance_bytes": _per_instance_bytes(proto.clone),
+    }
+    results["clone_speedup"] = results["deepcopy_us"] / results["clone_us"]
+    return results
+
+
+def bench_snapshot():
+    """Engine rewind cost: deepcopy of a mid-battle engine vs snapshot()/restore()."""
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos)
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    for _ in range(3):
+        engine.set_player_actions(engine.choose_ai_actions("player"))
+        engine._choose_cpu_actions()
+        engine.resolve_round()
+    snap = engine.snapshot()
+    snap_no_rng = engine.snapshot(include_rng=False)
+
+    results = {
+        "deepcopy_engine_us": _per_call_us(lambda: deepcopy(engine), 2000),
+        "snapshot_us": _per_call_us(engine.snapshot, 20000),
+        "snapshot_no_rng_us": _per_call_us(lambda: engine.snapshot(include_rng=False), 50000),
+        "restore_us": _per_call_us(lambda: engine.restore(snap), 20000),
+        "restore_no_rng_us": _per_call_us(lambda: engine.restore(snap_no_rng), 50000),
+    }
+    results["branch_speedup"] = results["deepcopy_engine_us"] / (
+        results["snapshot_no_rng_us"] + results["restore_no_rng_us"])
+    return results
+
+
+def bench_rng():
+    """Per-roll dice cost of random.Random vs BufferedRandom, and a full battle with each."""
+    plain = make_rng(1)
+    buffered = BufferedRandom(1)
+    protos = create_all_character_prototypes()
+    results = {
+        "randint_us": _per_call_us(lambda: plain.randint(200, 300), 200000),
+        "buffered_randint_us": _per_call_us(lambda: buffered.randint(200, 300), 200000),
+    }
+    for label, flag in (("battle_us", False), ("buffered_battle_us", True)):
+        engine = BattleEngine(protos, protos, seed=1, buffered_rng=flag)
+        results[label] = _per_call_us(lambda: play_battle(engine, [0, 1, 2], [2, 3, 4]), 500)
+    return results
+
+
+def bench_log():
+    """Per-round cost in each log mode, and the cost of rendering the UI's last 30 lines."""
+    protos = create_all_character_prototypes()
+    modes = ("full", "ring", "off")
+    engines = {mode: BattleEngine(protos, protos, seed=1, log_mode=mode) for mode in modes}
+    best = {mode: float("inf") for mode in modes}
+    # interleave the modes so machine noise hits them alike; time per round, not per battle
+    for _ in range(7):
+        for mode in modes:
+            engine = engines[mode]
+            rounds = 0
+            t0 = timeit.default_timer()
+            for _ in range(200):
+                rounds += play_battle(engine, [0, 1, 2], [2, 3, 4])[1]
+            best[mode] = min(best[mode], (timeit.default_timer() - t0) / rounds * 1e6)
+    results = {f"{mode}_round_us": best[mode] for mode in modes}
+    engine = engines["full"]
+    play_battle(engine, [0, 1, 2], [2, 3, 4])
+    results["render_tail30_us"] = _per_call_us(lambda: engine.get_log(30), 2000)
+    return results
+
+
+def bench_engine():
+    """start_battle, one CPU decision and one round at fixed seeds, and full battles per second."""
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=7, log_mode="off")
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    engine.set_player_actions(engine.choose_ai_actions("player"))
+    engine._choose_cpu_actions()
+    snap = engine.snapshot()
+
+    def round_from_snapshot():
+        engine.restore(snap)
+        engine.resolve_round()
+
+    restore_us = _per_call_us(lambda: engine.restore(snap), 20000)
+    results = {
+        "start_battle_us": _per_call_us(lambda: engine.start_battle([0, 1, 2], [2, 3, 4]), 20000),
+        "choose_ai_actions_us": _per_call_us(lambda: engine.choose_ai_actions("cpu"), 20000),
+        # the same round every call (snapshot includes the RNG), minus the restore that resets it
+        "resolve_round_us": _per_call_us(round_from_snapshot, 20000) - restore_us,
+    }
+    battles = 2000
+    engine = BattleEngine(protos, protos, seed=7, log_mode="off")
+    best = min(timeit.repeat(lambda: play_battle(engine, [0, 1, 2], [2, 3, 4]), number=battles, repeat=3))
+    results["battles_per_sec"] = battles / best
+    return results
+
+
+SCALING_SIZES = (3, 10, 30, 100, 300, 1000)
+# rosters for bench_scaling: prototype indices cycled to fill each side
+SCALING_ROSTERS = {
+    "mixed": ((0, 1, 2, 3, 4), (2, 3, 4, 0, 1)),
+    # Topaz Brawler and Quartz King only: no area attacks or team-wide buffs, whose cost per use grows
+    # with the team by the rules themselves, so this isolates the engine's own per-unit overhead
+    "single_target": ((2, 4), (4, 2)),
+}
+
+
+def bench_scaling():
+    """Mean cost of one round at fixed seeds as teams grow from 3 to 1000 a side, per roster."""
+    protos = create_all_character_prototypes()
+    results = {}
+    for roster, (player_cycle, cpu_cycle) in SCALING_ROSTERS.items():
+        for n in SCALING_SIZES:
+            engine = BattleEngine(protos, protos, seed=11, log_mode="off")
+            player = [player_cycle[i % len(player_cycle)] for i in range(n)]
+            cpu = [cpu_cycle[i % len(cpu_cycle)] for i in range(n)]
+            rounds = 0
+            t0 = timeit.default_timer()
+            for _ in range(max(3, 3000 // n)):
+                rounds += play_battle(engine, player, cpu)[1]
+            results[f"{roster}_n{n}_round_us"] = (timeit.default_timer() - t0) / rounds * 1e6
+    return results
+
+
+BENCHMARKS = {
+    "clone": bench_clone,
+    "engine": bench_engine,
+    "snapshot": bench_snapshot,
+    "rng": bench_rng,
+    "log": bench_log,
+    "scaling": bench_scaling,
+}
+
+
+def direction(metric):
+    # +1 higher is better, -1 lower is better, 0 informational
+    if metric.endswith(("_per_sec", "_speedup")):
+        return 1
+    if metric.endswith(("_us", "_bytes")):
+        return -1
+    return 0
+
+
+def compare(results, baseline, threshold):
+    """Yields (name, metric, old, new, change, regressed) for every metric present in both runs."""
+    for name, metrics in results.items():
+        for metric, new in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            sign = direction(metric)
+            if old is None or not old or not sign:
+                continue
+            change = (new - old) / old
+            yield name, metric, old, new, change, sign * change < -threshold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine micro-benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(sorted(BENCHMARKS))})")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"[{name}]")
+        results[name] = BENCHMARKS[name]()
+        for key, value in results[name].items():
+            print(f"  {key:24s} {value:12.2f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = 0
+        print(f"[vs {args.compare}]")
+        for name, metric, old, new, change, regressed in compare(results, baseline, args.threshold):
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {name + '.' + metric:32s} {old:12.2f} -> {new:12.2f}  {change:+7.1%}{flag}")
+        if regressions:
+            print(f"{regressions} metric(s) regressed by more than {args.threshold:.1%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
 # characters.py
 import random
-from copy import deepcopy
+from bisect import bisect_left
 
-def diceroll(low, high):
-    return random.randint(low, high)
+def diceroll(low, high, rng=random):
+    return rng.randint(low, high)
 
 def clamp(x, lo, hi):
     return max(lo, min(hi, x))
 
 class Character:
+    # fixed layout: no per-instance __dict__, and clone() copies fields explicitly.
+    # team_index/team_slot link a battle clone to its team's TeamIndex; they are not part of get_state().
+    __slots__ = (
+        "shortname", "name", "max_hp", "hp", "base_speed", "base_crit", "crit_amp",
+        "crit_immune_turns", "damage_resist_turns", "guaranteed_crit_turn", "_stunned",
+        "team_crit_buff_turns", "team_speed_buff_turns", "team_speed_bonus",
+        "damage_buff_turns", "resist_buff_turns",
+        "acted_this_round", "last_status_move", "_take_hit_for_qk",
+        "team_index", "team_slot",
+    )
+
     def __init__(self, shortname, fullname, max_hp, base_speed, base_crit, crit_amp):
+        self.team_index = None
+        self.team_slot = None
         self.shortname = shortname
         self.name = fullname
         self.max_hp = max_hp
@@ -39,7 +52,79 @@ class Character:
         self.take_hit_for_qk = False
 
     def clone(self):
-        return deepcopy(self)
+        # every field is an immutable scalar/str, so a flat field copy is a full copy
+        c = object.__new__(self.__class__)
+        c.team_index = None
+        c.team_slot = None
+        c.shortname = self.shortname
+        c.name = self.name
+        c.max_hp = self.max_hp
+        c.hp = self.hp
+        c.base_speed = self.base_speed
+        c.base_crit = self.base_crit
+        c.crit_amp = self.crit_amp
+        c.crit_immune_turns = self.crit_immune_turns
+        c.damage_resist_turns = self.damage_resist_turns
+        c.guaranteed_crit_turn = self.guaranteed_crit_turn
+        c._stunned = self._stunned
+        c.team_crit_buff_turns = self.team_crit_buff_turns
+        c.team_speed_buff_turns = self.team_speed_buff_turns
+        c.team_speed_bonus = self.team_speed_bonus
+        c.damage_buff_turns = self.damage_buff_turns
+        c.resist_buff_turns = self.resist_buff_turns
+        c.acted_this_round = self.acted_this_round
+        c.last_status_move = self.last_status_move
+        c._take_hit_for_qk = self._take_hit_for_qk
+        return c
+
+    def get_state(self):
+        # full field tuple in __slots__ order, minus the team link (immutable; used by BattleEngine.snapshot)
+        return (
+            self.shortname, self.name, self.max_hp, self.hp, self.base_speed, self.base_crit, self.crit_amp,
+            self.crit_immune_turns, self.damage_resist_turns, self.guaranteed_crit_turn, self.stunned,
+            self.team_crit_buff_turns, self.team_speed_buff_turns, self.team_speed_bonus,
+            self.damage_buff_turns, self.resist_buff_turns,
+            self.acted_this_round, self.last_status_move, self.take_hit_for_qk,
+        )
+
+    def set_state(self, state):
+        # raw field writes, bypassing the TeamIndex hooks: the caller re-indexes the team afterwards
+        # (BattleEngine.restore rebuilds its TeamIndexes)
+        (
+            self.shortname, self.name, self.max_hp, self.hp, self.base_speed, self.base_crit, self.crit_amp,
+            self.crit_immune_turns, self.damage_resist_turns, self.guaranteed_crit_turn, self._stunned,
+            self.team_crit_buff_turns, self.team_speed_buff_turns, self.team_speed_bonus,
+            self.damage_buff_turns, self.resist_buff_turns,
+            self.acted_this_round, self.last_status_move, self._take_hit_for_qk,
+        ) = state
+
+    @classmethod
+    def from_state(cls, state):
+        c = object.__new__(cls)
+        c.team_index = None
+        c.team_slot = None
+        c.set_state(state)
+        return c
+
+    @property
+    def stunned(self):
+        return self._stunned
+
+    @stunned.setter
+    def stunned(self, value):
+        self._stunned = value
+        if self.team_index is not None:
+            self.team_index.stun_changed()
+
+    @property
+    def take_hit_for_qk(self):
+        return self._take_hit_for_qk
+
+    @take_hit_for_qk.setter
+    def take_hit_for_qk(self, value):
+        self._take_hit_for_qk = value
+        if self.team_index is not None:
+            self.team_index.protect_changed(self)
 
     def is_alive(self):
         return self.hp > 0
@@ -49,13 +134,83 @@ class Character:
 
     def take_damage(self, amount):
         self.hp = clamp(self.hp - amount, 0, self.max_hp)
+        if self.team_index is not None:
+            self.team_index.hp_changed(self)
 
     def heal_amount(self, amount):
         self.hp = clamp(self.hp + amount, 0, self.max_hp)
+        if self.team_index is not None:
+            self.team_index.hp_changed(self)
 
     def __repr__(self):
         return f"{self.name} ({self.hp}/{self.max_hp} HP, SPD {self.effective_speed()})"
 
+class TeamIndex:
+    """
+    Living members of one battle team, kept current by Character.take_damage/heal_amount and the stunned
+    and take_hit_for_qk setters so targeting and AI queries read cached tuples instead of rescanning the
+    team (which matters for raid-sized teams).
+    alive: slots of living members in team order; unstunned(): the living ones not stunned;
+    lowest(): the living member with the least HP (first in team order on ties, like min());
+    protectors(): slots of living members marked by Die For Me, in team order.
+    """
+    __slots__ = ("team", "alive", "_flags", "_unstunned", "_lowest", "_lowest_valid", "_protectors")
+
+    def __init__(self, team):
+        self.team = team
+        self.rebuild()
+
+    def rebuild(self):
+        # (re)link every member and recompute from scratch (start of battle, restore)
+        for i, c in enumerate(self.team):
+            c.team_index = self
+            c.team_slot = i
+        self._flags = [c.hp > 0 for c in self.team]
+        self.alive = tuple(i for i, f in enumerate(self._flags) if f)
+        self._unstunned = None
+        self._lowest_valid = False
+        self._protectors = {i for i, c in enumerate(self.team) if c.take_hit_for_qk}
+
+    def hp_changed(self, c):
+        self._lowest_valid = False
+        alive = c.hp > 0
+        slot = c.team_slot
+        if alive != self._flags[slot]:
+            # death or revival: splice the slot out of (into) the ordered tuple instead of rescanning the team
+            self._flags[slot] = alive
+            k = bisect_left(self.alive, slot)
+            if alive:
+                self.alive = self.alive[:k] + (slot,) + self.alive[k:]
+            else:
+                self.alive = self.alive[:k] + self.alive[k + 1:]
+            self._unstunned = None
+
+    def stun_changed(self):
+        self._unstunned = None
+
+    def protect_changed(self, c):
+        if c.take_hit_for_qk:
+            self._protectors.add(c.team_slot)
+        else:
+            self._protectors.discard(c.team_slot)
+
+    def protectors(self):
+        flags = self._flags
+        return sorted(i for i in self._protectors if flags[i])
+
+    def unstunned(self):
+        if self._unstunned is None:
+            team = self.team
+            self._unstunned = tuple(i for i in self.alive if not team[i].stunned)
+        return self._unstunned
+
+    def lowest(self):
+        if not self._lowest_valid:
+            team = self.team
+            self._lowest = min((team[i] for i in self.alive), key=lambda x: x.hp, default=None)
+            self._lowest_valid = True
+        return self._lowest
+
 # Factory that returns prototypes
 def create_all_character_prototypes(prefix=""):
     # Return prototypes (not clones) for selection
@@ -68,20 +223,21 @@ def create_all_character_prototypes(prefix=""):
     ]
 
 # --- Attack wrappers that compute damage but do not mutate or print ---
-def compute_attack_damage(user, target, low, high):
+def compute_attack_damage(user, target, low, high, rng=random):
     """
     Returns (dmg, is_crit).
     Considers user's guaranteed crit, team crit buff (30%), target crit immunity,
     King's Command damage buff, target resist (King's Command) and damage_resist_turns (Shiny Flex).
+    Rolls come from rng (the engine's stream; defaults to the global random module).
     """
-    dmg = diceroll(low, high)
+    dmg = diceroll(low, high, rng)
 
     # determine crit
     if user.guaranteed_crit_turn:
         is_crit = True
     else:
         effective_crit = 30 if user.team_crit_buff_turns > 0 else user.base_crit
-        is_crit = (random.random() < effective_crit / 100.0)
+        is_crit = (rng.random() < effective_crit / 100.0)
 
     if target.crit_immune_turns > 0:
         is_crit = False
@@ -107,36 +263,45 @@ def compute_attack_damage(user, target, low, high):
 
     return dmg, is_crit
 
+# Per-character attack rolls (low, high); characters without an entry roll DEFAULT_ATTACK_RANGE
+ATTACK_RANGES = {
+    "RW": (200, 300),
+    "EA": (100, 150),
+    "TB": (400, 450),
+    "CA": (200, 270),
+    "QK": (250, 350),
+}
+DEFAULT_ATTACK_RANGE = (50, 60)
+
 # Per-character attack calls
-def rw_attack(user, target):
-    return compute_attack_damage(user, target, 200, 300)
+def rw_attack(user, target, rng=random):
+    return compute_attack_damage(user, target, *ATTACK_RANGES["RW"], rng)
 
-def ea_attack(user, target):
-    return compute_attack_damage(user, target, 100, 150)
+def ea_attack(user, target, rng=random):
+    return compute_attack_damage(user, target, *ATTACK_RANGES["EA"], rng)
 
-def tb_attack(user, target):
-    return compute_attack_damage(user, target, 400, 450)
+def tb_attack(user, target, rng=random):
+    return compute_attack_damage(user, target, *ATTACK_RANGES["TB"], rng)
 
-def ca_attack(user, target):
-    return compute_attack_damage(user, target, 200, 270)
+def ca_attack(user, target, rng=random):
+    return compute_attack_damage(user, target, *ATTACK_RANGES["CA"], rng)
 
-def qk_attack(user, target):
-    return compute_attack_damage(user, target, 250, 350)
+def qk_attack(user, target, rng=random):
+    return compute_attack_damage(user, target, *ATTACK_RANGES["QK"], rng)
 
-# Status moves implemented as effects applied by engine; some convenience functions:
-def rw_heroic_raise(allies):
-    for a in allies:
-        if a.is_alive():
-            a.team_crit_buff_turns = 3
+# Status moves implemented as effects applied by engine; some convenience functions.
+# Timed buffs go through the engine's effects.EffectScheduler, which also expires them.
+def rw_heroic_raise(allies, effects):
+    effects.add_all([a for a in allies if a.is_alive()], "team_crit_buff_turns", 3)
 
-def rw_ruby_shield(actor):
-    actor.crit_immune_turns = 5
+def rw_ruby_shield(actor, effects):
+    effects.add(actor, "crit_immune_turns", 5)
 
-def ea_arrow_shower(opponents):
+def ea_arrow_shower(opponents, rng=random):
     results = []
     for o in opponents:
         if o.is_alive():
-            dmg = diceroll(50, 70)
+            dmg = diceroll(50, 70, rng)
             # target resist / shiny flex adjustments should be applied outside or here:
             if o.damage_resist_turns > 0:
                 dmg = int(dmg * 0.7)
@@ -149,8 +314,8 @@ def ea_arrow_shower(opponents):
 def ea_sharp_aim(actor):
     actor.guaranteed_crit_turn = True
 
-def tb_shiny_flex(actor):
-    actor.damage_resist_turns = 2
+def tb_shiny_flex(actor, effects):
+    effects.add(actor, "damage_resist_turns", 2)
 
 def tb_stun_punch(actor, target):
     dmg = 90
@@ -173,11 +338,11 @@ def ca_vital_stab(actor, target):
     actor.heal_amount(heal_amt)
     return dmg, heal_amt
 
-def ca_sneak_boost(allies):
-    for a in allies:
-        if a.is_alive():
-            a.team_speed_buff_turns = 3
-            a.team_speed_bonus = 20
+def ca_sneak_boost(allies, effects):
+    boosted = [a for a in allies if a.is_alive()]
+    effects.add_all(boosted, "team_speed_buff_turns", 3)
+    for a in boosted:
+        a.team_speed_bonus = 20
 
 def qk_die_for_me(actor, allies):
     alive_allies = [a for a in allies if a.is_alive() and a.shortname != "QK"]
@@ -187,10 +352,10 @@ def qk_die_for_me(actor, allies):
     protector.take_hit_for_qk = True
     return protector
 
-def qk_kings_command(actor):
+def qk_kings_command(actor, effects):
     # Option C: if buff already active -> fail
     if actor.damage_buff_turns > 0 or actor.resist_buff_turns > 0:
         return False
-    actor.damage_buff_turns = 2
-    actor.resist_buff_turns = 2
+    effects.add(actor, "damage_buff_turns", 2)
+    effects.add(actor, "resist_buff_turns", 2)
     return True
@@ -0,0 +1,106 @@
+# effects.py
+"""
+Timed status effects.
+
+A timed effect is a Character field that is on while positive (crit_immune_turns, team_crit_buff_turns,
+...). Instead of counting every such field on every character down at the end of every round, the
+engine's EffectScheduler files each application under the round it runs out in and, at the end of that
+round, zeroes the field and the fields linked to it (team_speed_bonus). End-of-round cost is the number
+of effects expiring that round, whatever the team sizes.
+
+A field keeps the duration it was applied with; turns_left() gives what is left. A new timed effect
+needs a Character field, an entry in TIMED_EFFECTS and an EffectScheduler.add() call from its move.
+"""
+
+# field -> fields zeroed with it when it expires
+TIMED_EFFECTS = {
+    "crit_immune_turns": (),                            # Ruby Shield
+    "damage_resist_turns": (),                          # Shiny Flex
+    "team_crit_buff_turns": (),                         # Heroic Raise
+    "team_speed_buff_turns": ("team_speed_bonus",),     # Sneak Boost
+    "damage_buff_turns": (),                            # King's Command
+    "resist_buff_turns": (),                            # King's Command
+}
+
+
+class EffectScheduler:
+    """
+    Expiry schedule of one battle's timed effects. `round` follows the engine's round_number: the engine
+    calls end_round() once per resolved round, and clear()/set_state() at start_battle and restore.
+    """
+
+    def __init__(self, round_number=1):
+        self.clear(round_number)
+
+    def clear(self, round_number=1):
+        self.round = round_number
+        self._until = {}   # (character, field) -> last round the effect is on
+        self._due = {}     # round -> [(character, field)] running out at its end; refreshed ones are skipped
+
+    def add(self, c, field, turns):
+        # on for this round and the next turns - 1, like a countdown from `turns` ticked at each round end;
+        # re-applying an active effect restarts it (the earlier expiry entry goes stale)
+        setattr(c, field, turns)
+        until = self.round + turns - 1
+        key = (c, field)
+        if self._until.get(key) != until:
+            self._until[key] = until
+            due = self._due.get(until)
+            if due is None:
+                self._due[until] = [key]
+            else:
+                due.append(key)
+
+    def add_all(self, members, field, turns):
+        # add() for a whole team buff: one expiry bucket for every member
+        until = self.round + turns - 1
+        until_of = self._until
+        due = self._due.setdefault(until, [])
+        for c in members:
+            setattr(c, field, turns)
+            key = (c, field)
+            if until_of.get(key) != until:
+                until_of[key] = until
+                due.append(key)
+
+    def end_round(self):
+        due = self._due.pop(self.round, None)
+        if due is not None:
+            until = self._until
+            for key in due:
+                if until.get(key) == self.round:
+                    del until[key]
+                    c, field = key
+                    setattr(c, field, 0)
+                    for linked in TIMED_EFFECTS[field]:
+                        setattr(c, linked, 0)
+        self.round += 1
+
+    def turns_left(self, c, field):
+        until = self._until.get((c, field))
+        return until - self.round + 1 if until is not None else 0
+
+    def active(self, c):
+        # {field: turns left} of c's running effects
+        return {field: self.turns_left(c, field) for field in TIMED_EFFECTS if (c, field) in self._until}
+
+    def __len__(self):
+        return len(self._until)
+
+    # snapshot support: effects are recorded by (side, slot), since restore may rebuild the Character objects
+    def get_state(self, player_index):
+        return tuple(("player" if c.team_index is player_index else "cpu", c.team_slot, field, until)
+                     for (c, field), until in self._until.items())
+
+    def set_state(self, state, round_number, player_team, cpu_team):
+        self.clear(round_number)
+        teams = {"player": player_team, "cpu": cpu_team}
+        for side, slot, field, until in state:
+            key = (teams[side][slot], field)
+            self._until[key] = until
+            self._due.setdefault(until, []).append(key)
+
+
+def turns_left_in(state, round_number, side, slot):
+    """{field: turns left} for one character of an EffectScheduler.get_state() taken at round_number."""
+    return {field: until - round_number + 1 for s, i, field, until in state if s == side and i == slot}
@@ -1,24 +1,53 @@
 # engine.py
-import random
-from copy import deepcopy
-from characters import (
-    Character, create_all_character_prototypes,
-    rw_attack, ea_attack, tb_attack, ca_attack, qk_attack,
-    rw_heroic_raise, rw_ruby_shield, ea_arrow_shower, ea_sharp_aim,
-    tb_shiny_flex, tb_stun_punch, ca_vital_stab, ca_sneak_boost,
-    qk_die_for_me, qk_kings_command, diceroll, clamp
+from collections import namedtuple
+from characters import ATTACK_RANGES, Character, TeamIndex, create_all_character_prototypes, diceroll, clamp
+from moves import MOVES, HEAL_MOVES, ENEMY, UNSTUNNED, ai_table, kit_actions, kit_for
+from rng import as_seed_sequence, make_rng
+from mcts import make_cpu_ai
+from metrics import BattleTally, Metrics
+from effects import EffectScheduler
+from policies import cpu_policy, get_policy
+from battlelog import (
+    make_log, DEFAULT_RING_SIZE, ROUND, HEAL_ALL, HEAL_ONE, HEAL_INVALID, STUNNED,
 )
 
-# Clone function using deepcopy
+# Bump whenever a rules change alters battle outcomes: recorded results (matchups.py cache) are keyed on it
+ENGINE_VERSION = 1
+
+# Round cap for play_until_end (and the batch runners): a battle still running after this many rounds is a draw
+DEFAULT_MAX_ROUNDS = 500
+
+# Random team of `size` prototype indices: distinct while the roster allows, repeats for raid-sized teams
+def random_team_indices(rng, n_protos, size=3):
+    if size <= n_protos:
+        return rng.sample(range(n_protos), size)
+    return [rng.randrange(n_protos) for _ in range(size)]
+
+# Clone function (flat field copy, see Character.clone)
 def clone_character(proto):
-    return deepcopy(proto)
+    return proto.clone()
+
+# Immutable engine state captured by BattleEngine.snapshot(). Teams are tuples of Character.get_state()
+# tuples; effects is the timed-effect schedule (effects.EffectScheduler.get_state); log_mark is the log's
+# own mark (see battlelog.BattleLog.mark), rewound on restore.
+BattleSnapshot = namedtuple("BattleSnapshot", [
+    "player_team", "cpu_team", "player_heal_left", "cpu_heal_left",
+    "player_actions", "cpu_actions", "round_number", "effects", "log_mark", "rng_state",
+])
+
+# the only action of a fallen actor
+PASS = ("none", None)
+FALLEN_ACTIONS = (PASS,)
 
 def is_status_move(name):
     if name is None: return False
-    return name not in ("attack",)
+    move = MOVES.get(name)
+    return move.status if move is not None else True
 
 class BattleEngine:
-    def __init__(self, player_protos, cpu_protos):
+    def __init__(self, player_protos, cpu_protos, seed=None, rng=None, ai_rng=None, buffered_rng=False,
+                 log_mode="full", log_size=DEFAULT_RING_SIZE, difficulty="normal", metrics=False, attack_ranges=None,
+                 tally=False):
         # player_protos and cpu_protos are lists of character prototypes (to be cloned)
         self.player_prototypes = player_protos
         self.cpu_prototypes = cpu_protos
@@ -26,6 +55,7 @@ class BattleEngine:
         # selected teams (filled when start_battle called)
         self.player_team = []
         self.cpu_team = []
+        self._index_teams()
 
         # heal uses
         self.player_heal_left = 3
@@ -35,145 +65,308 @@ class BattleEngine:
         self.player_actions = []   # each entry: ("attack"/"heroic_raise"/..., param)
         self.cpu_actions = []
 
-        # logs
-        self.log = []
+        # side -> legal_actions(side), dropped whenever the battle state changes
+        self._legal = {}
+
+        # logs: structured events rendered on read; "full", "ring" (last log_size events) or "off"
+        self.log = make_log(log_mode, log_size)
         self.round_number = 0
 
-        # randomness seed left default
+        # timed buffs: expired by round (see effects.py) rather than counted down on every character
+        self.effects = EffectScheduler()
+
+        # randomness: one stream for battle rolls (dice, crits, ties, team picks) and an independent one
+        # for AI decisions, both spawned from `seed` (int, None or rng.SeedSequence) unless injected;
+        # a third seeds the search AI (kept for policies.mcts_policy when the CPU is the built-in AI)
+        battle_seed, ai_seed, search_seed = as_seed_sequence(seed).spawn(3)
+        self.search_seed = search_seed
+        self.buffered_rng = buffered_rng
+        self.rng = rng if rng is not None else make_rng(battle_seed, buffered_rng)
+        self.ai_rng = ai_rng if ai_rng is not None else make_rng(ai_seed, buffered_rng)
+
+        # CPU opponent: "normal" is the built-in AI, "hard"/"expert" search (see mcts.DIFFICULTIES)
+        self.difficulty = difficulty
+        self.cpu_ai = make_cpu_ai(difficulty, search_seed)
+
+        # optional phase timers and counters (metrics.Metrics); None costs one check per hook
+        self.metrics = Metrics() if metrics else None
+        # optional per-battle damage and move-use totals (metrics.BattleTally, for resultstore.py)
+        self.tally = BattleTally() if tally else None
+
+        # shortname -> (low, high) attack roll; overrides characters.ATTACK_RANGES for stat experiments
+        self.attack_ranges = attack_ranges if attack_ranges is not None else ATTACK_RANGES
 
     def start_battle(self, player_indices, cpu_indices=None):
-        # player_indices: indices into self.player_prototypes to pick (3)
+        # player_indices: indices into self.player_prototypes to pick (3, or any number for N-vs-M raids;
+        # an index may repeat)
         self.player_team = [clone_character(self.player_prototypes[i]) for i in player_indices]
-        # if cpu_indices passed, use them; else pick random 3 from cpu_prototypes
+        # if cpu_indices passed, use them; else pick a random team the size of the player's
         if cpu_indices is None:
-            choices = list(range(len(self.cpu_prototypes)))
-            cpu_indices = random.sample(choices, 3)
+            cpu_indices = random_team_indices(self.rng, len(self.cpu_prototypes), len(player_indices))
         self.cpu_team = [clone_character(self.cpu_prototypes[i]) for i in cpu_indices]
+        self._index_teams()
 
         # reset uses, logs, round
         self.player_heal_left = 3
         self.cpu_heal_left = 3
         self.player_actions = [None] * len(self.player_team)
         self.cpu_actions = [None] * len(self.cpu_team)
-        self.log = []
+        self.log.clear()
         self.round_number = 1
+        self.effects.clear(self.round_number)
+        self._legal.clear()
+        if self.tally is not None:
+            self.tally.reset(len(self.player_team), len(self.cpu_team))
+
+    def reseed(self, seed, antithetic=False):
+        # battle and AI streams as a fresh BattleEngine(..., seed=seed) would have them (replays store the
+        # seed of each battle); cpu_ai keeps its own stream, search_seed moves on for mcts_policy.
+        # antithetic mirrors every draw of the battle and AI streams (see abtest.py)
+        battle_seed, ai_seed, self.search_seed = as_seed_sequence(seed).spawn(3)
+        self.rng = make_rng(battle_seed, self.buffered_rng, antithetic)
+        self.ai_rng = make_rng(ai_seed, self.buffered_rng, antithetic)
 
     # Utility helpers
+    def _index_teams(self):
+        # alive/unstunned/lowest-HP indexes, updated by the characters themselves (see TeamIndex)
+        self.player_index = TeamIndex(self.player_team)
+        self.cpu_index = TeamIndex(self.cpu_team)
+
+    def index_for(self, side):
+        return self.player_index if side == "player" else self.cpu_index
+
     def all_dead(self, team):
         return all(not c.is_alive() for c in team)
 
+    def team_for(self, side):
+        # (allies, opponents) as seen from one side
+        if side == "player":
+            return self.player_team, self.cpu_team
+        return self.cpu_team, self.player_team
+
+    def heal_left_for(self, side):
+        return self.player_heal_left if side == "player" else self.cpu_heal_left
+
+    def legal_actions(self, side):
+        """
+        The legal (move, param) actions of every actor of side, one collection per team slot to iterate
+        or test with `in`: a moves.ActorActions (Heal One may target a fallen ally, which revives it),
+        FALLEN_ACTIONS for a fallen actor. A pass (PASS) is accepted from any actor but only listed for
+        fallen ones. Shared by set_player_actions, the AIs and the UI. Computed once per round and side
+        and cached until the state next changes through the engine (resolve_round, restore,
+        start_battle, a CPU heal reservation).
+        """
+        legal = self._legal.get(side)
+        if legal is None:
+            legal = self._legal[side] = self._compute_legal(side)
+        return legal
+
+    def _compute_legal(self, side):
+        allies = self.team_for(side)[0]
+        targets = tuple(self.index_for("cpu" if side == "player" else "player").alive)
+        heal = self.heal_left_for(side) > 0
+        n = len(allies)
+        legal = []
+        shared = {}     # actors with the same kit and last status move share one ActorActions
+        for a in allies:
+            if a.is_alive():
+                key = (a.shortname, a.last_status_move)
+                actions = shared.get(key)
+                if actions is None:
+                    actions = kit_actions(kit_for(a.shortname), a.last_status_move, targets, heal, n)
+                    # with every opponent down and no heal ring left there may be nothing but a pass
+                    actions = shared[key] = actions if targets or len(actions) else FALLEN_ACTIONS
+                legal.append(actions)
+            else:
+                legal.append(FALLEN_ACTIONS)
+        return tuple(legal)
+
+    def action_error(self, side, idx, action):
+        """None if action is legal for actor idx of side, else the reason it is not (for the UI)."""
+        legal = self.legal_actions(side)[idx]
+        name, param = action
+        # passing ("none", None) is always accepted, as it was before legal_actions existed
+        if action in legal or action == PASS:
+            return None
+        move = MOVES.get(name)
+        # an ENEMY move may leave its target out: resolve_round then picks a random living opponent
+        if param is None and move is not None and move.targeting == ENEMY and any(a[0] == name for a in legal):
+            return None
+        actor = self.team_for(side)[0][idx]
+        if move is not None and move.status and actor.last_status_move == name:
+            return f"{actor.name} cannot use {name} twice in a row."
+        if move is not None and move.heal and self.heal_left_for(side) <= 0:
+            return f"{actor.name} has no Heal Rings left."
+        return f"{actor.name} cannot use {name} ({param}) now."
+
+    def is_over(self):
+        return not self.player_index.alive or not self.cpu_index.alive
+
+    def winner(self):
+        # "player" / "cpu" / "draw" once the battle is over, None while it is running
+        player_dead = not self.player_index.alive
+        cpu_dead = not self.cpu_index.alive
+        if player_dead and cpu_dead:
+            return "draw"
+        if cpu_dead:
+            return "player"
+        if player_dead:
+            return "cpu"
+        return None
+
     def _choose_cpu_actions(self):
-        # ported CPU AI from earlier simulator (obeys status-repeat)
-        actions = [None] * len(self.cpu_team)
-        cpu_heal_left = self.cpu_heal_left
+        # the CPU opponent is a policy: the search AI for hard/expert, else the built-in AI
+        policy = self.cpu_ai if self.cpu_ai is not None else cpu_policy
+        self.set_cpu_actions(policy(self, "cpu"))
+
+    def play_until_end(self, player_policy="cpu", cpu_policy=None, max_rounds=DEFAULT_MAX_ROUNDS, history=None,
+                       record=None):
+        """
+        Plays rounds until one side is wiped out or max_rounds more rounds have been resolved, and returns
+        winner() (None if the cap was hit first). Policies are callables policy(engine, side) or names from
+        policies.POLICIES; cpu_policy=None uses the engine's own CPU opponent (see difficulty). When a list
+        is passed as history, the snapshot taken before each round is appended to it (the app's undo and
+        playback stack), so earlier states can be shown without re-simulating. A list passed as record
+        receives each round's submitted (player_actions, cpu_actions), which is what replay.py stores.
+        """
+        player_policy = get_policy(player_policy)
+        cpu_policy = get_policy(cpu_policy) if cpu_policy is not None else None
+        for _ in range(max_rounds):
+            if self.is_over():
+                break
+            if history is not None:
+                history.append(self.snapshot())
+            self.submit_actions("player", player_policy(self, "player"))
+            if cpu_policy is None:
+                self._choose_cpu_actions()
+            else:
+                self.submit_actions("cpu", cpu_policy(self, "cpu"))
+            if record is not None:
+                record.append((tuple(self.player_actions), tuple(self.cpu_actions)))
+            self.resolve_round()
+        return self.winner()
 
-        for idx, actor in enumerate(self.cpu_team):
+    def choose_ai_actions(self, side):
+        """
+        Ported CPU AI from earlier simulator (obeys status-repeat). Picks actions for either side
+        and returns them without storing; heal uses are reserved when the actions are submitted.
+        One draw per actor: the actor's last status move is left out of its kit table up front, which
+        gives the same distribution as the old re-roll-until-legal loop (see moves.ai_table).
+        """
+        m = self.metrics
+        t0 = m.clock() if m is not None else 0.0
+        allies = self.team_for(side)[0]
+        ally_index = self.index_for(side)
+        opp_index = self.index_for("cpu" if side == "player" else "player")
+        rng = self.ai_rng
+        actions = [None] * len(allies)
+        heal_left = self.heal_left_for(side)
+
+        for idx, actor in enumerate(allies):
             if not actor.is_alive():
                 actions[idx] = ("none", None)
                 continue
-            attempt = 0
-            chosen = None
-            while True:
-                attempt += 1
-                if cpu_heal_left > 0:
-                    # heal if someone low
-                    low_ally = min([a for a in self.cpu_team if a.is_alive()], key=lambda x: x.hp, default=None)
-                    if low_ally and low_ally.hp < low_ally.max_hp * 0.35:
-                        chosen = ("heal_single", self.cpu_team.index(low_ally))
-                    else:
-                        if actor.shortname == "EA":
-                            r = random.random()
-                            if r < 0.25:
-                                chosen = ("arrow_shower", None)
-                            elif r < 0.45:
-                                chosen = ("sharp_aim", None)
-                            else:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        elif actor.shortname == "TB":
-                            targets = [i for i,p in enumerate(self.player_team) if p.is_alive() and not p.stunned]
-                            if targets and random.random() < 0.25:
-                                chosen = ("stun_punch", random.choice(targets))
-                            else:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        elif actor.shortname == "RW":
-                            if random.random() < 0.18:
-                                chosen = ("heroic_raise", None)
-                            elif random.random() < 0.30:
-                                chosen = ("ruby_shield", None)
-                            else:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        elif actor.shortname == "CA":
-                            r = random.random()
-                            if r < 0.22:
-                                chosen = ("sneak_boost", None)
-                            elif r < 0.38:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("vital_stab", random.choice(targets)) if targets else ("none", None)
-                            else:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        elif actor.shortname == "QK":
-                            r = random.random()
-                            if r < 0.18:
-                                chosen = ("die_for_me", None)
-                            elif r < 0.36:
-                                chosen = ("kings_command", None)
-                            else:
-                                targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                                chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        else:
-                            targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                            chosen = ("attack", random.choice(targets)) if targets else ("none", None)
+            kit = kit_for(actor.shortname)
+            low_ally = ally_index.lowest() if heal_left > 0 else None
+            if low_ally and low_ally.hp < low_ally.max_hp * 0.35:
+                # heal if someone low; a heal straight after this actor's last heal is forced to an attack
+                if ("heal_single", low_ally.team_slot) in self.legal_actions(side)[idx]:
+                    chosen = ("heal_single", low_ally.team_slot)
                 else:
-                    if actor.shortname == "EA" and random.random() < 0.25:
-                        chosen = ("arrow_shower", None)
-                    else:
-                        targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                        chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-
-                # Enforce status-repeat rule
-                if is_status_move(chosen[0]) and actor.last_status_move == chosen[0]:
-                    if attempt > 20:
-                        targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                        chosen = ("attack", random.choice(targets)) if targets else ("none", None)
-                        break
-                    continue
-                break
+                    if m is not None:
+                        m.count("ai_heal_lockouts")
+                    targets = opp_index.alive
+                    chosen = ("attack", rng.choice(targets)) if targets else ("none", None)
+            else:
+                chosen = self._ai_pick_move(kit, heal_left > 0, actor.last_status_move, opp_index, rng, m)
 
-            # Reserve heal uses for CPU (decrement)
-            if chosen[0] in ("heal_single", "heal_all"):
-                if cpu_heal_left > 0:
-                    cpu_heal_left -= 1
+            # Reserve heal uses locally so later actors see the updated count
+            if chosen[0] in HEAL_MOVES:
+                if heal_left > 0:
+                    heal_left -= 1
                 else:
-                    targets = [i for i,p in enumerate(self.player_team) if p.is_alive()]
-                    chosen = ("attack", random.choice(targets)) if targets else ("none", None)
+                    targets = opp_index.alive
+                    chosen = ("attack", rng.choice(targets)) if targets else ("none", None)
 
             actions[idx] = chosen
 
+        if m is not None:
+            m.count("ai_decisions", len(allies))
+            m.lap("choose_ai_actions", t0)
+        return actions
+
+    @staticmethod
+    def _ai_targets(move, opp_index):
+        if move.targeting != ENEMY:
+            return None
+        return opp_index.unstunned() if move.ai_target == UNSTUNNED else opp_index.alive
+
+    @classmethod
+    def _ai_pick_move(cls, kit, heal, last, opp_index, rng, metrics=None):
+        # one draw over the kit's AI table; leftover probability (or a special without a target) -> attack.
+        # The last status move is excluded only while it has a target: otherwise it would have fallen
+        # back to a (legal) attack under the re-roll loop, so its share stays in the table.
+        last_move = MOVES.get(last)
+        if last_move is not None and last_move.targeting == ENEMY and not cls._ai_targets(last_move, opp_index):
+            last = None
+        names, thresholds = ai_table(kit, heal, last)
+        if metrics is not None and len(names) < len(ai_table(kit, heal)[0]):
+            metrics.count("ai_status_excluded")
+        if names:
+            r = rng.random()
+            for name, threshold in zip(names, thresholds):
+                if r < threshold:
+                    move = MOVES[name]
+                    if move.targeting != ENEMY:
+                        return (name, None)
+                    targets = cls._ai_targets(move, opp_index)
+                    if targets:
+                        return (name, rng.choice(targets))
+                    break
+        targets = opp_index.alive
+        return ("attack", rng.choice(targets)) if targets else ("none", None)
+
+    def set_cpu_actions(self, actions):
+        """
+        actions: list of length len(self.cpu_team), as returned by choose_ai_actions("cpu").
+        Heal uses are reserved (decremented) here, when the CPU commits to its moves.
+        """
+        if len(actions) != len(self.cpu_team):
+            raise ValueError("actions length mismatch")
+        for act in actions:
+            if act is not None and act[0] in HEAL_MOVES and self.cpu_heal_left > 0:
+                self.cpu_heal_left -= 1
+                self._legal.pop("cpu", None)
         self.cpu_actions = actions
-        self.cpu_heal_left = cpu_heal_left
+
+    def submit_actions(self, side, actions):
+        # Headless entry point: store actions for either side, raising on illegal player moves
+        if side == "cpu":
+            self.set_cpu_actions(actions)
+            return
+        ok, msg = self.set_player_actions(actions)
+        if not ok:
+            raise ValueError(msg)
 
     def set_player_actions(self, actions):
         """
         actions: list of length len(self.player_team). Each entry: ("attack", target_idx) or ("heroic_raise",None) etc.
-        Should be validated by UI; we also enforce status-repeat server-side (return False if invalid).
+        Should be validated by UI; we also check every action against legal_actions server-side
+        (return False and the reason if one is not).
         """
         # Validate length
         if len(actions) != len(self.player_team):
             raise ValueError("actions length mismatch")
 
-        # Validate legality (status-repeat): cannot use same non-attack twice in a row
+        # Validate legality (status-repeat, living targets, heal rings)
+        legal = self.legal_actions("player")
         for idx, act in enumerate(actions):
             if act is None:
-                actions[idx] = ("none", None)
-                continue
-            name, param = act
-            if is_status_move(name):
-                if self.player_team[idx].last_status_move == name:
-                    return False, f"{self.player_team[idx].name} cannot use {name} twice in a row."
+                actions[idx] = act = PASS
+            if act not in legal[idx]:
+                error = self.action_error("player", idx, act)
+                if error is not None:
+                    return False, error
         # All good — store
         self.player_actions = actions
         return True, "ok"
@@ -181,9 +374,29 @@ class BattleEngine:
     def resolve_round(self):
         """
         Resolves one round: heals first, then all non-heal actions sorted by effective speed (ties -> diceroll),
-        applying all move effects and decrementing durations at end of round.
+        applying all move effects and decrementing durations at end of round. Same as begin_round(),
+        resolve_action() on each queued entry, then end_round().
+        """
+        m = self.metrics
+        action_entries = self.begin_round()
+        t = m.clock() if m is not None else 0.0
+        for entry in action_entries:
+            self.resolve_action(entry)
+        if m is not None:
+            m.lap("actions", t)
+        self.end_round()
+        return True
+
+    def begin_round(self):
+        """
+        First part of resolve_round: runs the heal phase and returns the other actions in resolution order,
+        as entries (actor, side, action, effective speed, tie roll, team slot) for resolve_action. The
+        round can be driven step by step this way (solver.py branches after every action).
         """
-        self.log.append(f"--- Round {self.round_number} ---")
+        m = self.metrics
+        t = m.clock() if m is not None else 0.0
+        tally = self.tally
+        self.log.add(ROUND, amount=self.round_number)
 
         # Reset acted flag
         for c in self.player_team + self.cpu_team:
@@ -202,15 +415,19 @@ class BattleEngine:
                         c.heal_amount(int(c.max_hp * 0.30))
                 self.player_heal_left -= 1
                 actor.last_status_move = "heal_all"
-                self.log.append(f"[Player] {actor.name} used Heal Ring -> Heal All (30%).")
+                self.log.add(HEAL_ALL, "[Player]", actor.name)
+                if tally is not None:
+                    tally.record("player", i, MOVES["heal_all"].move_id)
             elif name == "heal_single" and self.player_heal_left > 0:
                 if param is None or not (0 <= param < len(self.player_team)):
-                    self.log.append(f"[Player] {actor.name} attempted Heal Ring (single) but target invalid.")
+                    self.log.add(HEAL_INVALID, "[Player]", actor.name)
                 else:
                     self.player_team[param].heal_amount(int(self.player_team[param].max_hp * 0.75))
                     self.player_heal_left -= 1
                     actor.last_status_move = "heal_single"
-                    self.log.append(f"[Player] {actor.name} used Heal Ring -> Heal One on {self.player_team[param].name} (75%).")
+                    self.log.add(HEAL_ONE, "[Player]", actor.name, self.player_team[param].name)
+                    if tally is not None:
+                        tally.record("player", i, MOVES["heal_single"].move_id)
 
         # CPU heals: ensure cpu_actions populated
         for i, act in enumerate(self.cpu_actions):
@@ -224,15 +441,22 @@ class BattleEngine:
                         c.heal_amount(int(c.max_hp * 0.30))
                 self.cpu_heal_left -= 1
                 actor.last_status_move = "heal_all"
-                self.log.append(f"[CPU] {actor.name} used Heal Ring -> Heal All (30%).")
+                self.log.add(HEAL_ALL, "[CPU]", actor.name)
+                if tally is not None:
+                    tally.record("cpu", i, MOVES["heal_all"].move_id)
             elif name == "heal_single" and self.cpu_heal_left > 0:
                 if param is None or not (0 <= param < len(self.cpu_team)):
-                    self.log.append(f"[CPU] {actor.name} attempted Heal Ring (single) but target invalid.")
+                    self.log.add(HEAL_INVALID, "[CPU]", actor.name)
                 else:
                     self.cpu_team[param].heal_amount(int(self.cpu_team[param].max_hp * 0.75))
                     self.cpu_heal_left -= 1
                     actor.last_status_move = "heal_single"
-                    self.log.append(f"[CPU] {actor.name} used Heal Ring -> Heal One on {self.cpu_team[param].name} (75%).")
+                    self.log.add(HEAL_ONE, "[CPU]", actor.name, self.cpu_team[param].name)
+                    if tally is not None:
+                        tally.record("cpu", i, MOVES["heal_single"].move_id)
+
+        if m is not None:
+            t = m.lap("heal_phase", t)
 
         # 2) Collect non-heal actions and resolve by speed order
         action_entries = []
@@ -242,9 +466,9 @@ class BattleEngine:
             if not actor.is_alive() or act is None:
                 continue
             name, param = act
-            if name in ("heal_all", "heal_single"):
+            if name in HEAL_MOVES:
                 continue
-            action_entries.append((actor, "player", act, actor.effective_speed(), diceroll(1,100), idx))
+            action_entries.append((actor, "player", act, actor.effective_speed(), diceroll(1,100,self.rng), idx))
 
         # add cpu actions
         for idx, act in enumerate(self.cpu_actions):
@@ -252,173 +476,130 @@ class BattleEngine:
             if not actor.is_alive() or act is None:
                 continue
             name, param = act
-            if name in ("heal_all", "heal_single"):
+            if name in HEAL_MOVES:
                 continue
-            action_entries.append((actor, "cpu", act, actor.effective_speed(), diceroll(1,100), idx))
+            action_entries.append((actor, "cpu", act, actor.effective_speed(), diceroll(1,100,self.rng), idx))
+
+        if m is not None:
+            t = m.lap("collect_actions", t)
 
         # sort by speed desc, tie by tie_roll desc
         action_entries.sort(key=lambda x: (x[3], x[4]), reverse=True)
-
-        # Resolve actions in order
-        for entry in action_entries:
-            actor, team_label, action, eff_spd, tie, actor_idx = entry
-            if not actor.is_alive():
-                continue
-            if actor.acted_this_round:
-                continue
-            if actor.stunned:
-                self.log.append(f"{actor.name} is stunned and cannot act this round.")
-                actor.stunned = False
-                actor.acted_this_round = True
-                continue
-
-            name, param = action
-            allies = self.player_team if team_label == "player" else self.cpu_team
-            opponents = self.cpu_team if team_label == "player" else self.player_team
-
-            # Status move record after action
-            if is_status_move(name):
-                actor.last_status_move = name
-
-            # Team prefix for logs
-            prefix = "[YOU]" if team_label == "player" else "[CPU]"
-            
-            # Handle each action
-            if name == "attack":
-                # choose fallback target
-                alive_targets = [i for i,t in enumerate(opponents) if t.is_alive()]
-                if not alive_targets:
-                    actor.acted_this_round = True
-                    continue
-                if param is None or param not in alive_targets:
-                    param = random.choice(alive_targets)
-                target = opponents[param]
-
-                # REDIRECTION: Die For Me - if target is QK, and some protector marked on target's team, redirect
-                if target.shortname == "QK":
-                    protectors = [p for p in opponents if p.take_hit_for_qk and p.is_alive() and p.shortname != "QK"]
-                    if protectors:
-                        protector = protectors[0]  # there should be at most one
-                        protector.take_hit_for_qk = False
-                        target = protector
-                        self.log.append(f"{prefix} {protector.name} takes the hit for {opponents[param].name} (QK).")
-
-                # compute damage
-                if actor.shortname == "RW":
-                    dmg, crit = rw_attack(actor, target)
-                elif actor.shortname == "EA":
-                    dmg, crit = ea_attack(actor, target)
-                elif actor.shortname == "TB":
-                    dmg, crit = tb_attack(actor, target)
-                elif actor.shortname == "CA":
-                    dmg, crit = ca_attack(actor, target)
-                elif actor.shortname == "QK":
-                    dmg, crit = qk_attack(actor, target)
-                else:
-                    from characters import compute_attack_damage
-                    dmg, crit = compute_attack_damage(actor, target, 50, 60)
-
-                target.take_damage(dmg)
-                self.log.append(f"{prefix} {actor.name} attacks {target.name} for {dmg}{' (CRIT)' if crit else ''}.")
-                actor.acted_this_round = True
-
-            elif name == "heroic_raise":
-                rw_heroic_raise(allies)
-                self.log.append(f"{prefix} {actor.name} uses Heroic Raise.")
-                actor.acted_this_round = True
-
-            elif name == "ruby_shield":
-                rw_ruby_shield(actor)
-                self.log.append(f"{prefix} {actor.name} uses Ruby Shield.")
-                actor.acted_this_round = True
-
-            elif name == "arrow_shower":
-                hits = ea_arrow_shower(opponents)
-                for targ, dmg in hits:
-                    self.log.append(f"  → {targ.name} takes {dmg} AoE damage.")
-                self.log.append(f"{prefix} {actor.name} uses Arrow Shower.")
-                actor.acted_this_round = True
-
-            elif name == "sharp_aim":
-                ea_sharp_aim(actor)
-                self.log.append(f"{prefix} {actor.name} uses Sharp Aim (guarantees next crit).")
-                actor.acted_this_round = True
-
-            elif name == "shiny_flex":
-                tb_shiny_flex(actor)
-                self.log.append(f"{prefix} {actor.name} uses Shiny Flex.")
-                actor.acted_this_round = True
-
-            elif name == "stun_punch":
-                alive_targets = [i for i,t in enumerate(opponents) if t.is_alive()]
-                if not alive_targets:
-                    actor.acted_this_round = True
-                    continue
-                if param is None or param not in alive_targets:
-                    param = random.choice(alive_targets)
-                target = opponents[param]
-                dmg = tb_stun_punch(actor, target)
-                self.log.append(f"{prefix} {actor.name} hits {target.name} with Stun Punch for {dmg} and stuns them.")
-                actor.acted_this_round = True
-
-            elif name == "vital_stab":
-                alive_targets = [i for i,t in enumerate(opponents) if t.is_alive()]
+        if m is not None:
+            t = m.lap("speed_sort", t)
+        return action_entries
+
+    def resolve_action(self, entry):
+        # one entry of begin_round's queue; skipped if the actor has fallen or already acted, spent if stunned
+        m = self.metrics
+        tally = self.tally
+        actor, team_label, action, eff_spd, tie, actor_idx = entry
+        if not actor.is_alive():
+            return
+        if actor.acted_this_round:
+            return
+        if actor.stunned:
+            if m is not None:
+                m.count("stuns_consumed")
+            self.log.add(STUNNED, actor=actor.name)
+            actor.stunned = False
+            actor.acted_this_round = True
+            return
+
+        name, param = action
+        allies = self.player_team if team_label == "player" else self.cpu_team
+        opponents = self.cpu_team if team_label == "player" else self.player_team
+
+        # Status move record after action
+        if is_status_move(name):
+            actor.last_status_move = name
+
+        # Team prefix for logs
+        prefix = "[YOU]" if team_label == "player" else "[CPU]"
+        actor.acted_this_round = True
+
+        # Dispatch through the move registry (unknown moves do nothing)
+        move = MOVES.get(name)
+        if move is None:
+            return
+        target = None
+        if move.targeting == ENEMY:
+            # choose fallback target
+            if param is None or not (0 <= param < len(opponents)) or not opponents[param].is_alive():
+                alive_targets = (self.cpu_index if team_label == "player" else self.player_index).alive
                 if not alive_targets:
-                    actor.acted_this_round = True
-                    continue
-                if param is None or param not in alive_targets:
-                    param = random.choice(alive_targets)
-                target = opponents[param]
-                dmg, heal_amt = ca_vital_stab(actor, target)
-                self.log.append(f"{prefix} {actor.name} uses Vital Stab on {target.name} for {dmg} damage and heals {heal_amt} HP.")
-                actor.acted_this_round = True
-
-            elif name == "sneak_boost":
-                ca_sneak_boost(allies)
-                self.log.append(f"{prefix} {actor.name} uses Sneak Boost.")
-                actor.acted_this_round = True
-
-            elif name == "die_for_me":
-                prot = qk_die_for_me(actor, allies)
-                if prot:
-                    self.log.append(f"{prefix} {actor.name} uses Die For Me: {prot.name} will absorb the first hit aimed at {actor.name} next turn.")
-                else:
-                    self.log.append(f"{prefix} {actor.name} tried to use Die For Me but it failed (no available protector).")
-                actor.acted_this_round = True
-
-            elif name == "kings_command":
-                ok = qk_kings_command(actor)
-                if not ok:
-                    self.log.append(f"{prefix} {actor.name} tried to use King's Command but buff already active — move fails.")
-                else:
-                    self.log.append(f"{prefix} {actor.name} uses King's Command: +20% damage & +20% resist for 2 turns.")
-                actor.acted_this_round = True
-
-            else:
-                actor.acted_this_round = True
-                continue
-
-        # End of round: decrement durations
-        for c in self.player_team + self.cpu_team:
-            if c.team_crit_buff_turns > 0:
-                c.team_crit_buff_turns -= 1
-            if c.crit_immune_turns > 0:
-                c.crit_immune_turns -= 1
-            if c.damage_resist_turns > 0:
-                c.damage_resist_turns -= 1
-            if c.team_speed_buff_turns > 0:
-                c.team_speed_buff_turns -= 1
-                if c.team_speed_buff_turns == 0:
-                    c.team_speed_bonus = 0
-            if c.damage_buff_turns > 0:
-                c.damage_buff_turns -= 1
-            if c.resist_buff_turns > 0:
-                c.resist_buff_turns -= 1
+                    return
+                param = self.rng.choice(alive_targets)
+            target = opponents[param]
+        if tally is not None:
+            hp_before = sum(c.hp for c in opponents)
+        if m is None:
+            move.handler(self, actor, target, allies, opponents, prefix)
+        else:
+            t_move = m.clock()
+            move.handler(self, actor, target, allies, opponents, prefix)
+            m.lap("move." + name, t_move)
+        if tally is not None:
+            tally.record(team_label, actor_idx, move.move_id, hp_before - sum(c.hp for c in opponents))
+
+    def end_round(self):
+        # last part of resolve_round: timed buffs run out, the round counter moves on
+        m = self.metrics
+        t = m.clock() if m is not None else 0.0
+
+        # End of round: expire the timed buffs that run out this round
+        self.effects.end_round()
 
         # Clear any remaining stun markers? (stun is consumed when used earlier)
         self.round_number += 1
+        self._legal.clear()
+        if m is not None:
+            m.lap("durations", t)
+            m.count("rounds")
 
-        return True
+    # Snapshot / restore (undo, search branching)
+    def snapshot(self, include_rng=True):
+        """
+        Captures the battle state in a BattleSnapshot; much cheaper than deep-copying the engine.
+        With include_rng=False the RNG keeps running on restore (search AIs sampling fresh outcomes).
+        """
+        return BattleSnapshot(
+            tuple(c.get_state() for c in self.player_team),
+            tuple(c.get_state() for c in self.cpu_team),
+            self.player_heal_left,
+            self.cpu_heal_left,
+            tuple(self.player_actions),
+            tuple(self.cpu_actions),
+            self.round_number,
+            self.effects.get_state(self.player_index),
+            self.log.mark(),
+            (self.rng.getstate(), self.ai_rng.getstate()) if include_rng else None,
+        )
+
+    def restore(self, snap):
+        # Character objects are reused when the team size matches, so references held by the UI stay valid
+        self.player_team = self._restore_team(self.player_team, snap.player_team)
+        self.cpu_team = self._restore_team(self.cpu_team, snap.cpu_team)
+        self._index_teams()
+        self.player_heal_left = snap.player_heal_left
+        self.cpu_heal_left = snap.cpu_heal_left
+        self.player_actions = list(snap.player_actions)
+        self.cpu_actions = list(snap.cpu_actions)
+        self.round_number = snap.round_number
+        self.effects.set_state(snap.effects, snap.round_number, self.player_team, self.cpu_team)
+        self.log.rewind(snap.log_mark)
+        self._legal.clear()
+        if snap.rng_state is not None:
+            self.rng.setstate(snap.rng_state[0])
+            self.ai_rng.setstate(snap.rng_state[1])
+
+    @staticmethod
+    def _restore_team(team, states):
+        if len(team) != len(states):
+            return [Character.from_state(s) for s in states]
+        for c, s in zip(team, states):
+            c.set_state(s)
+        return team
 
     # convenience getters for UI
     def get_player_team(self):
@@ -428,7 +609,8 @@ class BattleEngine:
         return self.cpu_team
 
     def get_log(self, n=20):
-        return self.log[-n:]
+        # text of the last n log events (rendered here, not when recorded)
+        return self.log.tail(n)
 
-    def cpu_pick_random_team_indices(self):
-        return random.sample(range(len(self.cpu_prototypes)), 3)
+    def cpu_pick_random_team_indices(self, team_size=3):
+        return random_team_indices(self.rng, len(self.cpu_prototypes), team_size)
@@ -0,0 +1,194 @@
+# matchups.py
+"""
+Team-composition matchup matrix.
+
+Plays every 3-character composition of the prototypes (player side) against every composition (CPU side)
+n times, across a process pool, and prints the player win rate of each pairing with a 95% Wilson interval,
+followed by each composition's pooled win rate on either side. Results are cached on disk per pairing,
+keyed by a hash of the six characters' stats and kits, engine.ENGINE_VERSION and the run settings, so a
+re-run only plays the pairings whose inputs changed.
+
+    python matchups.py -n 2000
+    python matchups.py -n 2000 --json matrix.json --cache /tmp/matchups.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from itertools import combinations
+from multiprocessing import Pool, cpu_count
+
+from characters import ATTACK_RANGES, DEFAULT_ATTACK_RANGE, create_all_character_prototypes
+from engine import ENGINE_VERSION
+from moves import kit_for
+from policies import POLICIES
+from rng import SeedSequence
+from simulate import DEFAULT_MAX_ROUNDS, TEAM_SIZE, play_chunk
+
+DEFAULT_CACHE = "matchup_cache.json"
+DEFAULT_SEED = 0
+Z_95 = 1.96
+
+
+def compositions(n_protos, team_size=TEAM_SIZE):
+    return list(combinations(range(n_protos), team_size))
+
+
+def character_key(proto):
+    # everything about a character that can change a battle's outcome (the display name cannot)
+    return (
+        proto.shortname, proto.max_hp, proto.base_speed, proto.base_crit, proto.crit_amp,
+        ATTACK_RANGES.get(proto.shortname, DEFAULT_ATTACK_RANGE), tuple(kit_for(proto.shortname)),
+    )
+
+
+def pairing_key(protos, player_comp, cpu_comp, settings):
+    payload = repr((
+        ENGINE_VERSION, settings,
+        tuple(character_key(protos[i]) for i in player_comp),
+        tuple(character_key(protos[i]) for i in cpu_comp),
+    ))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def wilson_interval(wins, n, z=Z_95):
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return centre - half, centre + half
+
+
+def load_cache(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(path, cache):
+    # write-then-rename so an interrupted run never leaves a truncated cache
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def _play_pairing(args):
+    # worker entry point: one pairing, seeded from (seed, pairing) so results never depend on what was cached
+    key, n, seed, player_comp, cpu_comp, player_policy, cpu_policy, max_rounds = args
+    chunk_seed = SeedSequence(seed, spawn_key=player_comp + cpu_comp)
+    result = play_chunk(n, chunk_seed, list(player_comp), list(cpu_comp), player_policy, cpu_policy, max_rounds)
+    return key, {"battles": result.battles, "wins": result.wins, "rounds": result.rounds}
+
+
+def run_matrix(n, workers=None, seed=DEFAULT_SEED, player_policy="cpu", cpu_policy="cpu",
+               max_rounds=DEFAULT_MAX_ROUNDS, cache_path=None):
+    """
+    Returns (comps, cells, computed): cells[i][j] is the {"battles", "wins", "rounds"} record of player
+    composition comps[i] against CPU composition comps[j]; computed counts the pairings actually played.
+    Nothing is read or written on disk unless cache_path is given (the CLI defaults to DEFAULT_CACHE).
+    """
+    protos = create_all_character_prototypes()
+    comps = compositions(len(protos))
+    settings = (n, seed, player_policy, cpu_policy, max_rounds)
+    cache = load_cache(cache_path)
+
+    keys = [[pairing_key(protos, p, c, settings) for c in comps] for p in comps]
+    tasks = [(keys[i][j], n, seed, p, c, player_policy, cpu_policy, max_rounds)
+             for i, p in enumerate(comps) for j, c in enumerate(comps) if keys[i][j] not in cache]
+    if tasks:
+        workers = workers or cpu_count()
+        if workers == 1:
+            results = map(_play_pairing, tasks)
+        else:
+            pool = Pool(workers)
+            results = pool.imap_unordered(_play_pairing, tasks)
+        try:
+            for key, record in results:
+                cache[key] = record
+        finally:
+            if workers != 1:
+                pool.close()
+                pool.join()
+            if cache_path:
+                save_cache(cache_path, cache)
+
+    cells = [[cache[key] for key in row] for row in keys]
+    return comps, cells, len(tasks)
+
+
+def comp_label(protos, comp):
+    return "+".join(protos[i].shortname for i in comp)
+
+
+def format_matrix(protos, comps, cells):
+    labels = [comp_label(protos, c) for c in comps]
+    width = max(len(label) for label in labels) + 1
+    cell_width = max(width, len(" 100.0%±10.0%"))
+    lines = ["player win rate (rows: player team, columns: CPU team), ±95% CI half-width",
+             " " * width + "".join(f"{label:>{cell_width}}" for label in labels)]
+    for label, row in zip(labels, cells):
+        parts = []
+        for cell in row:
+            lo, hi = wilson_interval(cell["wins"]["player"], cell["battles"])
+            parts.append(f"{cell['wins']['player'] / cell['battles']:5.1%}±{(hi - lo) / 2:.1%}".rjust(cell_width))
+        lines.append(f"{label:<{width}}" + "".join(parts))
+    return "\n".join(lines)
+
+
+def format_rankings(protos, comps, cells):
+    # each composition's pooled win rate over all opponents, on each side
+    lines = []
+    for side, title in (("player", "as player"), ("cpu", "as CPU")):
+        rows = []
+        for k, comp in enumerate(comps):
+            pool = [cells[k][j] for j in range(len(comps))] if side == "player" else [cells[i][k] for i in range(len(comps))]
+            battles = sum(c["battles"] for c in pool)
+            wins = sum(c["wins"][side] for c in pool)
+            rows.append((wins / battles, wilson_interval(wins, battles), comp_label(protos, comp)))
+        lines.append(f"composition win rate {title}:")
+        for rate, (lo, hi), label in sorted(rows, reverse=True):
+            lines.append(f"  {label:<10} {rate:6.2%}  [{lo:.2%}, {hi:.2%}]")
+    return "\n".join(lines)
+
+
+def matrix_json(protos, comps, cells):
+    return {
+        "engine_version": ENGINE_VERSION,
+        "compositions": [comp_label(protos, c) for c in comps],
+        "matrix": [[dict(cell, ci=wilson_interval(cell["wins"]["player"], cell["battles"])) for cell in row]
+                   for row in cells],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Win-rate matrix of every team composition against every other.")
+    parser.add_argument("-n", "--battles", type=int, default=1000, help="battles per pairing")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--player-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--cpu-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help=f"result cache file (default: {DEFAULT_CACHE}; '' disables)")
+    parser.add_argument("--json", metavar="PATH", help="also write the matrix as JSON")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    comps, cells, computed = run_matrix(args.battles, args.workers, args.seed, args.player_policy,
+                                        args.cpu_policy, args.max_rounds, args.cache)
+    protos = create_all_character_prototypes()
+    print(format_matrix(protos, comps, cells))
+    print(format_rankings(protos, comps, cells))
+    print(f"{computed} of {len(comps) ** 2} pairings played, the rest from cache ({time.perf_counter() - t0:.2f}s)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(matrix_json(protos, comps, cells), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
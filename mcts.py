@@ -0,0 +1,250 @@
+# mcts.py
+"""
+Search-based CPU opponent.
+
+MCTSPlayer picks one side's actions for the coming round by Monte Carlo search through the real engine.
+Rounds are simultaneous, so the root holds one UCB1 bandit per actor (decoupled UCT: the joint action
+space is never enumerated) and the other side's actions are sampled from the built-in AI on every
+iteration, which stands in for the opponent's hidden choice. Each iteration restores the current state,
+resolves the round with the bandits' picks and plays the battle out with the built-in AI on both sides
+for up to rollout_depth rounds. Search stops at a hard per-decision time budget (or after `iterations`);
+with workers > 1 independent root-parallel searches run in a process pool and their statistics are summed.
+The workers stop early by the measured pool round trip, and results still missing at the deadline are
+dropped, so parallel decisions keep the budget too. A player with workers owns a process pool: close it,
+or use it as a context manager (a discarded player terminates its pool when collected).
+
+    BattleEngine(protos, protos, difficulty="hard")     # 50 ms per CPU decision
+"""
+import gc
+import math
+import time
+import weakref
+from multiprocessing import Pool, TimeoutError
+
+from battlelog import NullLog
+from rng import as_seed_sequence, make_rng
+
+DEFAULT_TIME_BUDGET = 0.05      # seconds per decision
+DEFAULT_ROLLOUT_DEPTH = 12      # rounds played after the searched one before scoring by HP
+DEFAULT_EXPLORATION = math.sqrt(2)
+DEADLINE_MARGIN = 0.002         # seconds kept back for merging results and restoring the engine
+POOL_OVERHEAD = 0.01            # first guess at the pool round trip (engine out, results back), in seconds
+OVERHEAD_DECAY = 0.99           # per decision, while the round trip stays below the estimate
+
+# difficulty -> MCTSPlayer settings; None is the built-in weighted-random AI
+DIFFICULTIES = {
+    "normal": None,
+    "hard": {"time_budget": 0.05},
+    "expert": {"time_budget": 0.25},
+}
+
+
+def make_cpu_ai(difficulty="normal", seed=None):
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"unknown difficulty {difficulty!r} (choose from {', '.join(DIFFICULTIES)})")
+    settings = DIFFICULTIES[difficulty]
+    return MCTSPlayer(seed=seed, **settings) if settings is not None else None
+
+
+def _other(side):
+    return "cpu" if side == "player" else "player"
+
+
+def legal_actions(engine, side, idx):
+    """Actions searched for actor idx of side: engine.legal_actions, Heal One only on living wounded allies."""
+    allies = engine.team_for(side)[0]
+    actions = [a for a in engine.legal_actions(side)[idx]
+               if a[0] != "heal_single" or 0 < allies[a[1]].hp < allies[a[1]].max_hp]
+    return actions or [("none", None)]
+
+
+def _hp_fraction(team):
+    return sum(c.hp for c in team) / sum(c.max_hp for c in team)
+
+
+def _reward(engine, side):
+    # 1 win, 0 loss, 0.5 draw; unfinished rollouts score by the HP balance
+    winner = engine.winner()
+    if winner is not None:
+        return 1.0 if winner == side else 0.5 if winner == "draw" else 0.0
+    allies, opponents = engine.team_for(side)
+    return 0.5 + 0.5 * (_hp_fraction(allies) - _hp_fraction(opponents))
+
+
+def _ucb_pick(visits, totals, exploration, rng):
+    untried = [k for k, v in enumerate(visits) if v == 0]
+    if untried:
+        return rng.choice(untried)
+    log_n = math.log(sum(visits))
+    scores = [t / v + exploration * math.sqrt(log_n / v) for v, t in zip(visits, totals)]
+    return scores.index(max(scores))
+
+
+def _search(engine, side, deadline, iterations, rollout_depth, exploration, seed):
+    """
+    One root search on engine, which is left as found. Returns (arms, visits, totals), one list per actor.
+    Rolls come from streams spawned from seed, not the engine's own, so the search never sees the dice
+    the real round will use.
+    """
+    tree_seed, battle_seed, ai_seed = seed.spawn(3)
+    rng = make_rng(tree_seed)
+    other = _other(side)
+    n = len(engine.team_for(side)[0])
+    arms = [legal_actions(engine, side, i) for i in range(n)]
+    visits = [[0] * len(a) for a in arms]
+    totals = [[0.0] * len(a) for a in arms]
+
+    saved_rngs = engine.rng, engine.ai_rng
+    root = engine.snapshot(include_rng=False)
+    engine.rng, engine.ai_rng = make_rng(battle_seed), make_rng(ai_seed)
+    # rollouts allocate no reference cycles; a cyclic GC pass mid-search would only eat the budget
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        done = 0
+        while done < iterations and time.time() < deadline:
+            picks = [_ucb_pick(visits[i], totals[i], exploration, rng) for i in range(n)]
+            engine.restore(root)
+            engine.submit_actions(other, engine.choose_ai_actions(other))
+            engine.submit_actions(side, [arms[i][k] for i, k in enumerate(picks)])
+            engine.resolve_round()
+            depth = 0
+            while not engine.is_over() and depth < rollout_depth and time.time() < deadline:
+                engine.submit_actions(other, engine.choose_ai_actions(other))
+                engine.submit_actions(side, engine.choose_ai_actions(side))
+                engine.resolve_round()
+                depth += 1
+            if not engine.is_over() and depth < rollout_depth:
+                break   # out of time mid-rollout: drop the unfinished iteration
+            reward = _reward(engine, side)
+            for i, k in enumerate(picks):
+                visits[i][k] += 1
+                totals[i][k] += reward
+            done += 1
+    finally:
+        if gc_enabled:
+            gc.enable()
+        engine.rng, engine.ai_rng = saved_rngs
+        engine.restore(root)
+    return arms, visits, totals
+
+
+def _search_task(args):
+    # worker entry point: engine arrives as a private copy
+    engine, side, deadline, iterations, rollout_depth, exploration, seed = args
+    return _search(engine, side, deadline, iterations, rollout_depth, exploration, seed)
+
+
+class MCTSPlayer:
+    """
+    Search AI for either side. time_budget is a hard wall-clock limit per decision (the last rollout
+    is dropped rather than overrun, as is a worker's result that would arrive late); iterations
+    optionally caps the work too, which together with a seed and a generous budget makes decisions
+    reproducible.
+    """
+
+    def __init__(self, time_budget=DEFAULT_TIME_BUDGET, iterations=None, workers=1,
+                 rollout_depth=DEFAULT_ROLLOUT_DEPTH, exploration=DEFAULT_EXPLORATION, seed=None):
+        self.time_budget = time_budget
+        self.iterations = iterations if iterations is not None else math.inf
+        self.workers = workers
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.seed = as_seed_sequence(seed)
+        # seconds between the workers' deadline and the last result arriving, learned per decision
+        self._pool_overhead = POOL_OVERHEAD
+        self._wake_latency = DEADLINE_MARGIN    # how late the parent has woken from waiting on the pool
+        self._pool = None
+        if workers > 1:
+            self._start_pool()  # here, so process start-up is not charged to the first decision's budget
+
+    def _start_pool(self):
+        self._pool = Pool(self.workers)
+        # a player dropped without close() takes its worker processes with it
+        self._finalizer = weakref.finalize(self, self._pool.terminate)
+
+    def choose_actions(self, engine, side):
+        """Actions for side, same format as BattleEngine.choose_ai_actions; the engine is left as found."""
+        if self.workers > 1 and self._pool is None:
+            self._start_pool()      # after close() or unpickling; before the clock starts
+        # time.time() rather than perf_counter(): the deadline is shared with the worker processes
+        deadline = time.time() + self.time_budget - DEADLINE_MARGIN
+        seeds = self.seed.spawn(self.workers)
+        # the search resolves hundreds of rounds: keep them out of the battle log and the engine metrics
+        log, engine.log = engine.log, NullLog()
+        metrics, engine.metrics = engine.metrics, None
+        t0 = time.perf_counter()
+        try:
+            if self.workers == 1:
+                results = [_search(engine, side, deadline, self.iterations, self.rollout_depth,
+                                   self.exploration, seeds[0])]
+            else:
+                results = self._parallel_search(engine, side, deadline, seeds)
+        finally:
+            engine.log = log
+            engine.metrics = metrics
+            if metrics is not None:
+                metrics.lap("mcts_search", t0)
+
+        if not results:
+            return engine.choose_ai_actions(side)   # no worker made it back in time
+        arms = results[0][0]
+        actions = []
+        for i, actor_arms in enumerate(arms):
+            visits = [sum(r[1][i][k] for r in results) for k in range(len(actor_arms))]
+            totals = [sum(r[2][i][k] for r in results) for k in range(len(actor_arms))]
+            if not any(visits):
+                # budget too small for a single rollout: fall back to the built-in AI
+                return engine.choose_ai_actions(side)
+            # most visited, ties -> better mean
+            best = max(range(len(actor_arms)), key=lambda k: (visits[k], totals[k] / visits[k] if visits[k] else 0.0))
+            actions.append(actor_arms[best])
+        return actions
+
+    def _parallel_search(self, engine, side, deadline, seeds):
+        # the workers stop early by the pool round trip and the parent stops waiting early by how late it
+        # has been seen to wake up (busy workers on few cores); whatever is still out then is dropped
+        cutoff = deadline - self._wake_latency
+        worker_deadline = cutoff - self._pool_overhead
+        per_worker = math.ceil(self.iterations / self.workers) if self.iterations != math.inf else math.inf
+        pending = [self._pool.apply_async(_search_task, ((engine, side, worker_deadline, per_worker,
+                                                          self.rollout_depth, self.exploration, s),))
+                   for s in seeds]
+        results = []
+        for task in pending:
+            try:
+                results.append(task.get(timeout=max(0.0, cutoff - time.time())))
+            except TimeoutError:
+                pass
+        now = time.time()
+        # both margins are slowly decaying maxima: one late wake-up or straggler is enough to overrun
+        self._wake_latency = max(now - cutoff, OVERHEAD_DECAY * self._wake_latency, DEADLINE_MARGIN)
+        if len(results) < len(pending):
+            self._pool_overhead = min(2 * self._pool_overhead, self.time_budget / 2)
+        else:
+            # negative when the iteration cap ended the search early
+            self._pool_overhead = max(now - worker_deadline, OVERHEAD_DECAY * self._pool_overhead, DEADLINE_MARGIN)
+        return results
+
+    # an MCTSPlayer is a policy (see policies.py)
+    __call__ = choose_actions
+
+    def close(self):
+        if self._pool is not None:
+            self._finalizer.detach()
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # the process pool stays with the parent (engines holding a player are pickled to workers)
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state.pop("_finalizer", None)
+        return state
@@ -0,0 +1,91 @@
+# metrics.py
+"""
+Optional engine instrumentation: wall time per phase of resolve_round and choose_ai_actions, plus event
+counters. Off by default; the engine only tests `self.metrics is not None` at each hook, so a disabled
+engine pays one attribute check per phase.
+
+    engine = BattleEngine(protos, protos, metrics=True)
+    ...
+    engine.metrics.snapshot()      # {"timers": {...}, "counters": {...}}, JSON-ready
+
+Timers: heal_phase, collect_actions, speed_sort, actions (the whole action loop) and move.<name> for
+each handler, durations, choose_ai_actions, mcts_search (rounds resolved inside the search AI are not
+counted anywhere else). Counters: ai_decisions, ai_status_excluded (draws made with the actor's last
+status move left out of its table, where the old AI re-rolled), ai_heal_lockouts (forced attacks
+instead of a repeated heal), redirects (Die For Me), stuns_applied, stuns_consumed, rounds.
+
+BattleTally (BattleEngine(..., tally=True)) keeps per-battle totals instead, for result stores
+(resultstore.py): HP removed from the opponents by each team slot and uses of each move per side.
+It is reset by start_battle.
+"""
+import json
+from time import perf_counter
+
+from moves import MOVE_LIST
+
+
+class Metrics:
+    def __init__(self):
+        self.timers = {}     # name -> [total seconds, calls]
+        self.counters = {}
+
+    @staticmethod
+    def clock():
+        return perf_counter()
+
+    def lap(self, name, start):
+        # charges the time since start to name and returns now, the start of the next phase
+        now = perf_counter()
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [now - start, 1]
+        else:
+            timer[0] += now - start
+            timer[1] += 1
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for name, (total, calls) in other.timers.items():
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += total
+            timer[1] += calls
+        for name, n in other.counters.items():
+            self.count(name, n)
+        return self
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    def snapshot(self):
+        return {
+            "timers": {name: {"total_s": total, "calls": calls, "mean_us": total / calls * 1e6}
+                       for name, (total, calls) in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+class BattleTally:
+    """
+    Per-battle totals for one engine: damage[side][slot] is the HP that team slot removed from the
+    opponents, moves[side][move_id] the uses of each move. Callers that keep the totals past the next
+    start_battle should copy the lists.
+    """
+
+    def __init__(self):
+        self.reset(0, 0)
+
+    def reset(self, n_player, n_cpu):
+        # rebinds fresh lists rather than clearing in place, so a copy taken from the last battle is never zeroed
+        self.damage = {"player": [0] * n_player, "cpu": [0] * n_cpu}    # HP removed, per team slot
+        self.moves = {"player": [0] * len(MOVE_LIST), "cpu": [0] * len(MOVE_LIST)}    # uses, by move id
+
+    def record(self, side, slot, move_id, damage=0):
+        self.moves[side][move_id] += 1
+        self.damage[side][slot] += damage
@@ -0,0 +1,291 @@
+# moves.py
+"""
+Move and character registry.
+
+Every move is declared once here with its integer id, UI label, status flag (status moves cannot be
+repeated back to back), targeting rule and effect handler; every character kit lists its two special
+moves and the CPU AI's move weights. BattleEngine.resolve_round dispatches through MOVES,
+choose_ai_actions reads the kits' AI tables, and the UI builds its move pickers from the kits, so a new
+character only needs a prototype and attack range in characters.py and a kit here.
+"""
+from collections import namedtuple
+
+from battlelog import (
+    ATTACK, AOE_HIT, DIE_FOR_ME, DIE_FOR_ME_FAILED, KINGS_COMMAND, KINGS_COMMAND_FAILED,
+    REDIRECT, SHARP_AIM, STUN_PUNCH, USES, VITAL_STAB,
+)
+
+from characters import (
+    DEFAULT_ATTACK_RANGE, compute_attack_damage,
+    rw_heroic_raise, rw_ruby_shield, ea_arrow_shower, ea_sharp_aim,
+    tb_shiny_flex, tb_stun_punch, ca_vital_stab, ca_sneak_boost,
+    qk_die_for_me, qk_kings_command,
+)
+
+# targeting rules
+ENEMY = "enemy"     # one living opponent (param), random living opponent if param is missing/dead
+ALLY = "ally"       # one ally by index (Heal One)
+SELF = "self"
+ALLIES = "allies"
+ENEMIES = "enemies"
+NO_TARGET = "none"
+
+# AI target filters for ENEMY moves
+ALIVE = "alive"
+UNSTUNNED = "unstunned"
+
+Move = namedtuple("Move", ["name", "move_id", "label", "status", "heal", "targeting", "ai_target", "handler"])
+CharacterKit = namedtuple("CharacterKit", ["shortname", "specials", "ai_weights", "ai_weights_no_heal"])
+
+
+# --- effect handlers: handler(engine, actor, target, allies, opponents, prefix) ---
+def _attack(engine, actor, target, allies, opponents, prefix):
+    # REDIRECTION: Die For Me - if target is QK, and some protector marked on target's team, redirect
+    if target.shortname == "QK":
+        protectors = [opponents[i] for i in target.team_index.protectors() if opponents[i].shortname != "QK"]
+        if protectors:
+            protector = protectors[0]  # there should be at most one
+            protector.take_hit_for_qk = False
+            if engine.metrics is not None:
+                engine.metrics.count("redirects")
+            engine.log.add(REDIRECT, prefix, protector.name, target.name)
+            target = protector
+
+    low, high = engine.attack_ranges.get(actor.shortname, DEFAULT_ATTACK_RANGE)
+    dmg, crit = compute_attack_damage(actor, target, low, high, engine.rng)
+    target.take_damage(dmg)
+    engine.log.add(ATTACK, prefix, actor.name, target.name, dmg, " (CRIT)" if crit else "")
+
+
+def _heroic_raise(engine, actor, target, allies, opponents, prefix):
+    rw_heroic_raise(allies, engine.effects)
+    engine.log.add(USES, prefix, actor.name, extra="Heroic Raise")
+
+
+def _ruby_shield(engine, actor, target, allies, opponents, prefix):
+    rw_ruby_shield(actor, engine.effects)
+    engine.log.add(USES, prefix, actor.name, extra="Ruby Shield")
+
+
+def _arrow_shower(engine, actor, target, allies, opponents, prefix):
+    hits = ea_arrow_shower(opponents, engine.rng)
+    for targ, dmg in hits:
+        engine.log.add(AOE_HIT, prefix, actor.name, targ.name, dmg)
+    engine.log.add(USES, prefix, actor.name, extra="Arrow Shower")
+
+
+def _sharp_aim(engine, actor, target, allies, opponents, prefix):
+    ea_sharp_aim(actor)
+    engine.log.add(SHARP_AIM, prefix, actor.name)
+
+
+def _shiny_flex(engine, actor, target, allies, opponents, prefix):
+    tb_shiny_flex(actor, engine.effects)
+    engine.log.add(USES, prefix, actor.name, extra="Shiny Flex")
+
+
+def _stun_punch(engine, actor, target, allies, opponents, prefix):
+    dmg = tb_stun_punch(actor, target)
+    if engine.metrics is not None:
+        engine.metrics.count("stuns_applied")
+    engine.log.add(STUN_PUNCH, prefix, actor.name, target.name, dmg)
+
+
+def _vital_stab(engine, actor, target, allies, opponents, prefix):
+    dmg, heal_amt = ca_vital_stab(actor, target)
+    engine.log.add(VITAL_STAB, prefix, actor.name, target.name, dmg, heal_amt)
+
+
+def _sneak_boost(engine, actor, target, allies, opponents, prefix):
+    ca_sneak_boost(allies, engine.effects)
+    engine.log.add(USES, prefix, actor.name, extra="Sneak Boost")
+
+
+def _die_for_me(engine, actor, target, allies, opponents, prefix):
+    prot = qk_die_for_me(actor, allies)
+    if prot:
+        engine.log.add(DIE_FOR_ME, prefix, actor.name, prot.name)
+    else:
+        engine.log.add(DIE_FOR_ME_FAILED, prefix, actor.name)
+
+
+def _kings_command(engine, actor, target, allies, opponents, prefix):
+    ok = qk_kings_command(actor, engine.effects)
+    if not ok:
+        engine.log.add(KINGS_COMMAND_FAILED, prefix, actor.name)
+    else:
+        engine.log.add(KINGS_COMMAND, prefix, actor.name)
+
+
+def _no_effect(engine, actor, target, allies, opponents, prefix):
+    pass
+
+
+# Move ids are stable (replays and the NumPy engine store them); append new moves at the end.
+# Heals are resolved in the engine's heal phase, before the speed-ordered actions.
+MOVE_LIST = [
+    Move("attack", 0, "Attack", False, False, ENEMY, ALIVE, _attack),
+    Move("heroic_raise", 1, "Heroic Raise", True, False, ALLIES, None, _heroic_raise),
+    Move("ruby_shield", 2, "Ruby Shield", True, False, SELF, None, _ruby_shield),
+    Move("arrow_shower", 3, "Arrow Shower", True, False, ENEMIES, None, _arrow_shower),
+    Move("sharp_aim", 4, "Sharp Aim", True, False, SELF, None, _sharp_aim),
+    Move("shiny_flex", 5, "Shiny Flex", True, False, SELF, None, _shiny_flex),
+    Move("stun_punch", 6, "Stun Punch", True, False, ENEMY, UNSTUNNED, _stun_punch),
+    Move("vital_stab", 7, "Vital Stab", True, False, ENEMY, ALIVE, _vital_stab),
+    Move("sneak_boost", 8, "Sneak Boost", True, False, ALLIES, None, _sneak_boost),
+    Move("die_for_me", 9, "Die For Me", True, False, ALLIES, None, _die_for_me),
+    Move("kings_command", 10, "King's Command", True, False, SELF, None, _kings_command),
+    Move("heal_single", 11, "Heal One (75%)", True, True, ALLY, None, None),
+    Move("heal_all", 12, "Heal All (30%)", True, True, ALLIES, None, None),
+    Move("none", 13, "No action", True, False, NO_TARGET, None, _no_effect),
+]
+MOVES = {m.name: m for m in MOVE_LIST}
+MOVE_IDS = {m.name: m.move_id for m in MOVE_LIST}
+MOVES_BY_ID = [m.name for m in MOVE_LIST]
+HEAL_MOVES = frozenset(m.name for m in MOVE_LIST if m.heal)
+
+
+# ai_weights: (move, probability) tried in order with a single uniform draw while heal rings remain;
+# the leftover probability is an attack. A targeted special with no valid AI target also falls back
+# to attack. ai_weights_no_heal applies once the side's heal rings are used up.
+CHARACTER_KITS = {
+    # RW: 18% Heroic Raise, then 30% of the remainder Ruby Shield
+    "RW": CharacterKit("RW", ("heroic_raise", "ruby_shield"),
+                       (("heroic_raise", 0.18), ("ruby_shield", 0.82 * 0.30)), ()),
+    "EA": CharacterKit("EA", ("arrow_shower", "sharp_aim"),
+                       (("arrow_shower", 0.25), ("sharp_aim", 0.20)), (("arrow_shower", 0.25),)),
+    "TB": CharacterKit("TB", ("shiny_flex", "stun_punch"),
+                       (("stun_punch", 0.25),), ()),
+    "CA": CharacterKit("CA", ("vital_stab", "sneak_boost"),
+                       (("sneak_boost", 0.22), ("vital_stab", 0.16)), ()),
+    "QK": CharacterKit("QK", ("die_for_me", "kings_command"),
+                       (("die_for_me", 0.18), ("kings_command", 0.18)), ()),
+}
+
+
+# characters without a kit: attack only
+DEFAULT_KIT = CharacterKit(None, (), (), ())
+
+
+def kit_for(shortname):
+    return CHARACTER_KITS.get(shortname, DEFAULT_KIT)
+
+
+_AI_TABLES = {}
+
+
+def ai_table(kit, heal, excluded=None):
+    """
+    The kit's AI table (ai_weights if heal else ai_weights_no_heal) as (names, thresholds) for one
+    uniform draw, with `excluded` (the actor's last status move) dropped and the rest renormalized;
+    a draw past the last threshold is an attack. Built once per (kit, heal, excluded).
+    """
+    key = (kit.shortname, heal, excluded)
+    table = _AI_TABLES.get(key)
+    if table is None:
+        weights = kit.ai_weights if heal else kit.ai_weights_no_heal
+        total = 1.0 - sum(w for name, w in weights if name == excluded)
+        names, thresholds, cum = [], [], 0.0
+        for name, w in weights:
+            if name == excluded:
+                continue
+            cum += w / total
+            names.append(name)
+            thresholds.append(cum)
+        table = _AI_TABLES[key] = (tuple(names), tuple(thresholds))
+    return table
+
+
+_KIT_MOVES = {}
+
+
+def kit_moves(kit, last, heal):
+    """
+    The target-independent part of an actor's legal actions: {move name: targeting} in the order attack,
+    specials except `last`, then while heal rings remain Heal All and Heal One unless `last` was that
+    heal. Built once per (kit, last, heal).
+    """
+    key = (kit.shortname, last, heal)
+    moves = _KIT_MOVES.get(key)
+    if moves is None:
+        names = ["attack"] + [name for name in kit.specials if name != last]
+        if heal:
+            names += [name for name in ("heal_all", "heal_single") if name != last]
+        moves = _KIT_MOVES[key] = {name: MOVES[name].targeting for name in names}
+    return moves
+
+
+class ActorActions:
+    """
+    Legal (move, param) actions of a living actor: its kit_moves paired with the living opponent slots
+    `targets` (a tuple) and `n_allies` ally slots. Iterates as attacks on each target, specials (ENEMY
+    ones once per target), Heal All, then Heal One per ally slot; `in` is O(1), so a raid actor's
+    actions are not spelled out per target unless iterated.
+    """
+    __slots__ = ("moves", "targets", "n_allies", "_target_set")
+
+    def __init__(self, moves, targets, n_allies):
+        self.moves = moves
+        self.targets = targets
+        self.n_allies = n_allies
+        self._target_set = None
+
+    def __iter__(self):
+        for name, targeting in self.moves.items():
+            if targeting == ENEMY:
+                for t in self.targets:
+                    yield name, t
+            elif targeting == ALLY:
+                for i in range(self.n_allies):
+                    yield name, i
+            else:
+                yield name, None
+
+    def __len__(self):
+        n = 0
+        for targeting in self.moves.values():
+            n += len(self.targets) if targeting == ENEMY else self.n_allies if targeting == ALLY else 1
+        return n
+
+    def __contains__(self, action):
+        name, param = action
+        targeting = self.moves.get(name)
+        if targeting is None:
+            return False
+        if targeting == ENEMY:
+            if self._target_set is None:
+                self._target_set = frozenset(self.targets)
+            return param in self._target_set
+        if targeting == ALLY:
+            return param in range(self.n_allies)
+        return param is None
+
+    def __eq__(self, other):
+        if not isinstance(other, ActorActions):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"ActorActions({list(self)!r})"
+
+
+_KIT_ACTIONS = {}
+KIT_ACTIONS_CACHE_SIZE = 1024
+MEMO_TARGETS = 8
+
+
+def kit_actions(kit, last, targets, heal, n_allies):
+    """
+    Legal actions of a living actor with this kit and last status move, as an ActorActions. Small
+    battles see the same few target lists every round, so those are memoized (at most
+    KIT_ACTIONS_CACHE_SIZE entries, dropped together when full); raid target lists change too often.
+    """
+    if len(targets) > MEMO_TARGETS:
+        return ActorActions(kit_moves(kit, last, heal), targets, n_allies)
+    key = (kit.shortname, last, targets, heal, n_allies)
+    actions = _KIT_ACTIONS.get(key)
+    if actions is None:
+        if len(_KIT_ACTIONS) >= KIT_ACTIONS_CACHE_SIZE:
+            _KIT_ACTIONS.clear()
+        actions = _KIT_ACTIONS[key] = ActorActions(kit_moves(kit, last, heal), targets, n_allies)
+    return actions
@@ -0,0 +1,73 @@
+# policies.py
+# A policy is any callable policy(engine, side) -> list of actions for that side's team,
+# in the same ("move", param) format accepted by set_player_actions / set_cpu_actions.
+# The engine's own CPU opponent is one too (cpu_policy, or an mcts.MCTSPlayer for hard/expert), as is
+# the app's random auto-play; a policy must only return actions from engine.legal_actions(side).
+# Policies must be module-level (picklable) so the batch runner can ship them to worker processes;
+# register_policy makes one selectable by name (simulate.py, matchups.py, tournament.py).
+import weakref
+
+from moves import ENEMY, ActorActions
+
+
+def cpu_policy(engine, side):
+    # the built-in CPU AI, usable for either side
+    return engine.choose_ai_actions(side)
+
+
+def random_policy(engine, side):
+    # uniform over each actor's legal moves except Heal One (engine.legal_actions), then a uniform target;
+    # the app's auto-play. Draws from the engine's AI stream, so seeded engines replay it exactly.
+    # Reads the kit moves and target list of each ActorActions rather than spelling out every pair.
+    rng = engine.ai_rng
+    actions = []
+    for legal in engine.legal_actions(side):
+        if not isinstance(legal, ActorActions):
+            actions.append(next(iter(legal)))    # a fallen actor
+            continue
+        names = [name for name, targeting in legal.moves.items()
+                 if name != "heal_single" and (targeting != ENEMY or legal.targets)]
+        name = rng.choice(names)
+        actions.append((name, rng.choice(legal.targets) if legal.moves[name] == ENEMY else None))
+    return actions
+
+
+# engine -> (search_seed, MCTSPlayer) for engines whose own CPU is not a search AI
+_mcts_players = weakref.WeakKeyDictionary()
+
+
+def mcts_policy(engine, side):
+    # search AI at the "hard" settings: the engine's own cpu_ai when it is one, else a player per engine
+    # seeded from engine.search_seed (renewed by reseed), so seeded engines search the same way every run
+    from mcts import MCTSPlayer, make_cpu_ai
+    if isinstance(engine.cpu_ai, MCTSPlayer):
+        return engine.cpu_ai(engine, side)
+    seed, player = _mcts_players.get(engine, (None, None))
+    if seed is not engine.search_seed:
+        seed = engine.search_seed
+        player = make_cpu_ai("hard", seed)
+        _mcts_players[engine] = seed, player
+    return player(engine, side)
+
+
+POLICIES = {
+    "cpu": cpu_policy,
+    "random": random_policy,
+    "mcts": mcts_policy,
+}
+
+
+def register_policy(name, policy):
+    # makes a module-level policy selectable by name; worker processes see it if it is registered at import
+    if name in POLICIES and POLICIES[name] is not policy:
+        raise ValueError(f"policy {name!r} is already registered")
+    POLICIES[name] = policy
+    return policy
+
+
+def get_policy(name):
+    if callable(name):
+        return name
+    if name not in POLICIES:
+        raise ValueError(f"unknown policy {name!r} (choose from {', '.join(sorted(POLICIES))})")
+    return POLICIES[name]
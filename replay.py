@@ -0,0 +1,314 @@
+# replay.py
+"""
+Compact battle replays.
+
+A replay is the battle's seed, both teams' prototype ids and every round's submitted actions; feeding
+them back through BattleEngine reproduces the battle, log included (the engine's dice come from the
+seed, so only decisions need storing). A 3v3 battle is about 60 bytes:
+
+    varint flags (bit 0: buffered_rng) | varint seed | varint winner code
+    varint n_player, n_player ids | varint n_cpu, n_cpu ids | varint n_rounds
+    per round: n_player action codes, then n_cpu action codes
+
+An action code packs (move id + 1) into the low MOVE_BITS bits and (param + 1) above them, 0 meaning no
+action (None), so an ordinary 3v3 action is one byte.
+
+Files are append-only: a header, then length-prefixed records; a sidecar index (path + ".idx") holds
+one little-endian u64 offset per record, so the reader opens battle N with one lookup. Writing keeps
+one record in memory; reading memory-maps both files.
+
+    python simulate.py -n 1000000 --record battles.rpl
+    python replay.py battles.rpl             # record count and outcomes
+    python replay.py battles.rpl 123456      # replay battle 123456 and print its log
+"""
+import argparse
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from moves import MOVE_IDS, MOVES_BY_ID
+
+MAGIC = b"BTLRPLY\x01"      # tag + format version
+INDEX_SUFFIX = ".idx"
+MOVE_BITS = 5               # room for 31 moves; more needs a new format version
+MOVE_MASK = (1 << MOVE_BITS) - 1
+WINNERS = ("player", "cpu", "draw", None)
+_OFFSET = struct.Struct("<Q")
+
+assert len(MOVES_BY_ID) <= MOVE_MASK
+
+# seed: int passed to BattleEngine.reseed; player/cpu: prototype indices; rounds: per round a pair of
+# action tuples as submitted; winner: "player", "cpu", "draw", or None for a battle stopped early
+Replay = namedtuple("Replay", ["seed", "buffered_rng", "player", "cpu", "rounds", "winner"])
+
+
+def _put_varint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _get_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def encode_action(action):
+    if action is None:
+        return 0
+    name, param = action
+    return ((param + 1 if param is not None else 0) << MOVE_BITS) | (MOVE_IDS[name] + 1)
+
+
+def decode_action(code):
+    if code == 0:
+        return None
+    p = code >> MOVE_BITS
+    return (MOVES_BY_ID[(code & MOVE_MASK) - 1], p - 1 if p else None)
+
+
+def encode(replay):
+    buf = bytearray()
+    _put_varint(buf, 1 if replay.buffered_rng else 0)
+    _put_varint(buf, replay.seed)
+    _put_varint(buf, WINNERS.index(replay.winner))
+    for team in (replay.player, replay.cpu):
+        _put_varint(buf, len(team))
+        for i in team:
+            _put_varint(buf, i)
+    _put_varint(buf, len(replay.rounds))
+    for sides in replay.rounds:
+        for actions in sides:
+            for action in actions:
+                code = encode_action(action)
+                if code < 0x80:
+                    buf.append(code)    # the usual case: one byte, no varint loop
+                else:
+                    _put_varint(buf, code)
+    return bytes(buf)
+
+
+def decode(data, pos=0):
+    flags, pos = _get_varint(data, pos)
+    seed, pos = _get_varint(data, pos)
+    winner, pos = _get_varint(data, pos)
+    teams = []
+    for _ in range(2):
+        n, pos = _get_varint(data, pos)
+        team = []
+        for _ in range(n):
+            i, pos = _get_varint(data, pos)
+            team.append(i)
+        teams.append(tuple(team))
+    n_rounds, pos = _get_varint(data, pos)
+    n_player, n_cpu = len(teams[0]), len(teams[1])
+    rounds = []
+    for _ in range(n_rounds):
+        sides = []
+        for n in (n_player, n_cpu):
+            actions = []
+            for _ in range(n):
+                code, pos = _get_varint(data, pos)
+                actions.append(decode_action(code))
+            sides.append(tuple(actions))
+        rounds.append(tuple(sides))
+    return Replay(seed, bool(flags & 1), teams[0], teams[1], tuple(rounds), WINNERS[winner])
+
+
+def replay(rec, prototypes=None, log_mode="full"):
+    """Re-plays a recorded battle on a fresh engine and returns it (log, teams and winner as recorded)."""
+    protos = prototypes if prototypes is not None else create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=rec.seed, buffered_rng=rec.buffered_rng, log_mode=log_mode)
+    engine.start_battle(list(rec.player), list(rec.cpu))
+    for player_actions, cpu_actions in rec.rounds:
+        engine.submit_actions("player", list(player_actions))
+        engine.submit_actions("cpu", list(cpu_actions))
+        engine.resolve_round()
+    return engine
+
+
+def _check_magic(f, path):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path} is not a replay file (or has an unsupported format version)")
+
+
+def _record_end(data, pos, end):
+    # end offset of the record starting at pos, or None if it is cut short before end
+    try:
+        length, start = _get_varint(data, pos)
+    except IndexError:
+        return None
+    return start + length if start + length <= end else None
+
+
+class ReplayWriter:
+    """
+    Appends replays to path (created if missing) and their offsets to path + ".idx". Reopening an existing
+    file continues it; a record cut short by a crash is dropped and a stale index is brought up to date.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._recover()
+        self._data = open(path, "ab")
+        self._index = open(path + INDEX_SUFFIX, "ab")
+        self._offset = self._data.tell()
+
+    def _recover(self):
+        path, index_path = self.path, self.path + INDEX_SUFFIX
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            for p in (path, index_path):
+                with open(p, "wb") as f:
+                    f.write(MAGIC)
+            return
+        raw = None
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                _check_magic(f, index_path)
+                raw = f.read()
+        offsets = [o for (o,) in _OFFSET.iter_unpack(raw[:len(raw) // _OFFSET.size * _OFFSET.size])] if raw else []
+        with open(path, "rb") as f:
+            _check_magic(f, path)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(data)
+        try:
+            # drop index entries past the data on disk, then index the complete records after the last one
+            while offsets and _record_end(data, offsets[-1], end) is None:
+                offsets.pop()
+            pos = _record_end(data, offsets[-1], end) if offsets else len(MAGIC)
+            while pos < end:
+                next_pos = _record_end(data, pos, end)
+                if next_pos is None:
+                    break
+                offsets.append(pos)
+                pos = next_pos
+        finally:
+            data.close()
+        if pos < end:
+            with open(path, "r+b") as f:
+                f.truncate(pos)     # a record cut short by a crash
+        if raw is None or len(raw) != len(offsets) * _OFFSET.size:
+            with open(index_path, "wb") as f:
+                f.write(MAGIC)
+                for o in offsets:
+                    f.write(_OFFSET.pack(o))
+
+    def write(self, rec):
+        self.write_encoded(encode(rec))
+
+    def write_encoded(self, payload):
+        head = bytearray()
+        _put_varint(head, len(payload))
+        self._data.write(head)
+        self._data.write(payload)
+        self._index.write(_OFFSET.pack(self._offset))
+        self._offset += len(head) + len(payload)
+
+    def write_all(self, payloads):
+        for payload in payloads:
+            self.write_encoded(payload)
+
+    def close(self):
+        # data before index, so the index never points past the data on disk
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+    """Random access (reader[n], negative n allowed) and streaming iteration over a replay file."""
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path + INDEX_SUFFIX):
+            ReplayWriter(path).close()      # rebuilds the index
+        self._files = []
+        self._data = self._map(path)
+        self._index = self._map(path + INDEX_SUFFIX)
+        self._count = (len(self._index) - len(MAGIC)) // _OFFSET.size
+
+    def _map(self, path):
+        f = open(path, "rb")
+        _check_magic(f, path)
+        self._files.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._count
+
+    def read_encoded(self, n):
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError(f"replay {n} out of range ({self._count} records)")
+        (offset,) = _OFFSET.unpack_from(self._index, len(MAGIC) + n * _OFFSET.size)
+        length, start = _get_varint(self._data, offset)
+        return self._data[start:start + length]
+
+    def __getitem__(self, n):
+        return decode(self.read_encoded(n))
+
+    def __iter__(self):
+        data = self._data
+        pos = len(MAGIC)
+        for _ in range(self._count):
+            length, pos = _get_varint(data, pos)
+            yield decode(data, pos)
+            pos += length
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and replay a battle replay file.")
+    parser.add_argument("path")
+    parser.add_argument("battle", type=int, nargs="?", help="replay this battle and print its log")
+    args = parser.parse_args(argv)
+
+    with ReplayReader(args.path) as reader:
+        if args.battle is None:
+            wins = {w: 0 for w in WINNERS}
+            rounds = 0
+            for rec in reader:
+                wins[rec.winner] += 1
+                rounds += len(rec.rounds)
+            size = os.path.getsize(args.path)
+            print(f"{len(reader)} battles, {size:,} bytes ({size / max(len(reader), 1):.1f} per battle), "
+                  f"avg rounds {rounds / max(len(reader), 1):.2f}")
+            print("  ".join(f"{w}: {n}" for w, n in wins.items() if w is not None))
+            return
+        rec = reader[args.battle]
+        engine = replay(rec)
+        print(f"battle {args.battle}: seed {rec.seed}, player {list(rec.player)} vs cpu {list(rec.cpu)}, "
+              f"winner {rec.winner}")
+        for line in engine.get_log(len(engine.log)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
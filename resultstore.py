@@ -0,0 +1,328 @@
+# resultstore.py
+"""
+Columnar store of per-battle results, for bulk runs too large for pickles or CSV.
+
+A store is a directory: one raw fixed-width binary file per column (<name>.col, native byte order, no
+header) plus meta.json (format version, team size, the prototypes' shortnames and the committed row
+count). Columns are memory-mapped as NumPy arrays of shape (rows,) + per-row shape, so opening a store
+reads nothing and a query touches only the columns it needs. Appends go to the end of every column
+file first and are committed by rewriting meta.json; rows past the committed count (an append cut
+short) are ignored and trimmed by the next writer. One writer at a time.
+
+Columns, per battle (T = team size):
+    player, cpu   (T,) int16       prototype indices of each team, in slot order
+    winner        int8             0 player, 1 cpu, 2 draw (or the round cap)
+    rounds        int32            rounds played
+    damage        (2, T) int32     HP removed from the opponents by each slot, player row first
+    moves         (2, N) uint16    uses of each move id (moves.MOVE_IDS) per side, player row first
+A 3v3 row is 97 bytes, so 10^8 battles take ~10 GB on disk and any one query streams at most its own
+columns through memory in chunks of DEFAULT_CHUNK_ROWS rows.
+
+    python simulate.py -n 1000000 --store results/
+    python resultstore.py results/                      # win rates by character, rounds, move usage
+    python resultstore.py results/ --by player          # win rate of every player team
+
+Queries: win_rates (group by character, team or matchup), histogram, totals, damage_by_character;
+each takes an optional where(chunk) -> bool mask over a chunk's columns. Needs numpy.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from characters import create_all_character_prototypes
+from moves import MOVE_LIST, MOVES_BY_ID
+
+FORMAT_VERSION = 1
+META = "meta.json"
+SUFFIX = ".col"
+DEFAULT_CHUNK_ROWS = 1 << 20
+WINNERS = ("player", "cpu", "draw")
+GROUPS = ("character", "player", "cpu", "matchup")
+
+
+def schema(team_size):
+    # column -> (dtype, per-row shape)
+    return {
+        "player": (np.dtype(np.int16), (team_size,)),
+        "cpu": (np.dtype(np.int16), (team_size,)),
+        "winner": (np.dtype(np.int8), ()),
+        "rounds": (np.dtype(np.int32), ()),
+        "damage": (np.dtype(np.int32), (2, team_size)),
+        "moves": (np.dtype(np.uint16), (2, len(MOVE_LIST))),
+    }
+
+
+class _Chunk(dict):
+    # one row range of the store: column name -> in-memory slice, read from the memory maps on first use
+    def __init__(self, store, rows, mask=None):
+        super().__init__()
+        self.store = store
+        self.rows = rows
+        self.mask = mask
+
+    def __missing__(self, name):
+        value = np.asarray(self.store.column(name)[self.rows])
+        if self.mask is not None:
+            value = value[self.mask]
+        self[name] = value
+        return value
+
+
+class ResultStore:
+    """
+    Opens the store at path, creating it (for team_size and the stock or given prototypes) if missing;
+    mode "r" opens an existing store read-only.
+    """
+
+    def __init__(self, path, team_size=3, prototypes=None, mode="a"):
+        self.path = path
+        self.mode = mode
+        meta_path = os.path.join(path, META)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported store version {meta.get('version')!r}")
+        elif mode == "r":
+            raise FileNotFoundError(f"no result store at {path}")
+        else:
+            protos = prototypes or create_all_character_prototypes()
+            meta = {"version": FORMAT_VERSION, "team_size": team_size,
+                    "characters": [p.shortname for p in protos], "moves": list(MOVES_BY_ID), "rows": 0}
+            os.makedirs(path, exist_ok=True)
+        self.meta = meta
+        if not os.path.exists(meta_path):
+            self._commit()
+        self.team_size = meta["team_size"]
+        self.characters = meta["characters"]
+        self.columns = schema(self.team_size)
+        self._maps = {}
+        if mode != "r":
+            # drop rows of an append that never committed
+            for name in self.columns:
+                file = self._file(name)
+                size = len(self) * self._row_bytes(name)
+                if os.path.exists(file) and os.path.getsize(file) > size:
+                    os.truncate(file, size)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def _file(self, name):
+        return os.path.join(self.path, name + SUFFIX)
+
+    def _row_bytes(self, name):
+        dtype, shape = self.columns[name]
+        return dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+    def _commit(self):
+        tmp = os.path.join(self.path, META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, META))
+
+    def append(self, rows):
+        """Appends a batch: rows maps every column name to an array of shape (n,) + its per-row shape."""
+        if self.mode == "r":
+            raise ValueError("store opened read-only")
+        if set(rows) != set(self.columns):
+            raise ValueError(f"expected columns {sorted(self.columns)}, got {sorted(rows)}")
+        n = None
+        arrays = {}
+        for name, (dtype, shape) in self.columns.items():
+            arr = np.asarray(rows[name])
+            if n is None:
+                n = len(arr)
+            if arr.shape != (n,) + shape:
+                raise ValueError(f"column {name!r}: expected shape {(n,) + shape}, got {arr.shape}")
+            arrays[name] = np.ascontiguousarray(arr, dtype=dtype)
+        for name, arr in arrays.items():
+            with open(self._file(name), "ab") as f:
+                f.write(arr.tobytes())
+        self.meta["rows"] += n
+        self._commit()
+        self._maps.clear()
+
+    def column(self, name):
+        """The committed rows of a column as a read-only memory map (shape (rows,) + per-row shape)."""
+        col = self._maps.get(name)
+        if col is None:
+            dtype, shape = self.columns[name]
+            if len(self) == 0:
+                col = np.empty((0,) + shape, dtype=dtype)
+            else:
+                col = np.memmap(self._file(name), dtype=dtype, mode="r", shape=(len(self),) + shape)
+            self._maps[name] = col
+        return col
+
+    def chunks(self, where=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Yields the rows in chunks (dicts of column slices, read on first use), filtered by where(chunk)."""
+        for start in range(0, len(self), chunk_rows):
+            rows = slice(start, min(start + chunk_rows, len(self)))
+            chunk = _Chunk(self, rows)
+            if where is not None:
+                chunk = _Chunk(self, rows, np.asarray(where(chunk), dtype=bool))
+            yield chunk
+
+    # --- queries ---
+    def _team_codes(self, teams):
+        # one integer per sorted team (compositions regardless of slot order)
+        n = len(self.characters)
+        teams = np.sort(teams, axis=1)
+        codes = np.zeros(len(teams), dtype=np.int64)
+        for j in range(self.team_size):
+            codes = codes * n + teams[:, j]
+        return codes
+
+    def _team_names(self, code):
+        n = len(self.characters)
+        idx = []
+        for _ in range(self.team_size):
+            code, i = divmod(code, n)
+            idx.append(self.characters[i])
+        return tuple(reversed(idx))
+
+    def win_rates(self, by="character", where=None):
+        """
+        {key: (wins, battles)}. by "character": per shortname, counted once per team slot on either side
+        (as simulate.BatchResult); "player" / "cpu": per team composition (a tuple of shortnames) and
+        that side's wins; "matchup": per (player team, cpu team) and player wins. Draws count as battles.
+        """
+        if by not in GROUPS:
+            raise ValueError(f"unknown grouping {by!r} (choose from {', '.join(GROUPS)})")
+        n = len(self.characters)
+        if by == "character":
+            battles = np.zeros(n, dtype=np.int64)
+            wins = np.zeros(n, dtype=np.int64)
+            for chunk in self.chunks(where):
+                for code, side in enumerate(("player", "cpu")):
+                    teams = chunk[side]
+                    battles += np.bincount(teams.ravel(), minlength=n)
+                    wins += np.bincount(teams[chunk["winner"] == code].ravel(), minlength=n)
+            return {self.characters[i]: (int(wins[i]), int(battles[i])) for i in range(n) if battles[i]}
+
+        totals = {}
+        for chunk in self.chunks(where):
+            if by == "matchup":
+                codes = self._team_codes(chunk["player"]) * n ** self.team_size + self._team_codes(chunk["cpu"])
+                won = chunk["winner"] == 0
+            else:
+                codes = self._team_codes(chunk[by])
+                won = chunk["winner"] == (0 if by == "player" else 1)
+            keys, inverse = np.unique(codes, return_inverse=True)
+            battles = np.bincount(inverse, minlength=len(keys))
+            wins = np.bincount(inverse, weights=won, minlength=len(keys))
+            for key, w, b in zip(keys.tolist(), wins.tolist(), battles.tolist()):
+                acc = totals.setdefault(key, [0, 0])
+                acc[0] += int(w)
+                acc[1] += b
+        result = {}
+        for key, (w, b) in sorted(totals.items()):
+            if by == "matchup":
+                name = (self._team_names(key // n ** self.team_size), self._team_names(key % n ** self.team_size))
+            else:
+                name = self._team_names(key)
+            result[name] = (w, b)
+        return result
+
+    def histogram(self, column, bin_width=1, where=None, index=None):
+        """
+        (edges, counts) of an integer column over the matching rows, every element of each row or only
+        row[index] (e.g. index=(0, 2) for the damage of player slot 2); bins are bin_width wide and start
+        at the smallest value, as numpy.histogram would lay them out.
+        """
+        def values(chunk):
+            v = chunk[column]
+            return (v if index is None else v[(slice(None),) + tuple(np.atleast_1d(index))]).ravel()
+
+        lo = hi = None
+        for chunk in self.chunks(where):
+            v = values(chunk)
+            if len(v):
+                lo = int(v.min()) if lo is None else min(lo, int(v.min()))
+                hi = int(v.max()) if hi is None else max(hi, int(v.max()))
+        if lo is None:
+            return np.array([0, bin_width]), np.zeros(1, dtype=np.int64)
+        n_bins = (hi - lo) // bin_width + 1
+        counts = np.zeros(n_bins, dtype=np.int64)
+        for chunk in self.chunks(where):
+            v = values(chunk).astype(np.int64)
+            counts += np.bincount((v - lo) // bin_width, minlength=n_bins)
+        return lo + bin_width * np.arange(n_bins + 1), counts
+
+    def totals(self, column, where=None):
+        """Sum of a column over the matching rows (per-row shape kept), as int64."""
+        dtype, shape = self.columns[column]
+        total = np.zeros(shape, dtype=np.int64)
+        for chunk in self.chunks(where):
+            total += chunk[column].sum(axis=0, dtype=np.int64)
+        return total
+
+    def move_usage(self, where=None):
+        """{side: {move name: uses}} over the matching rows, unused moves left out."""
+        total = self.totals("moves", where)
+        return {side: {MOVES_BY_ID[i]: int(k) for i, k in enumerate(total[s]) if k}
+                for s, side in enumerate(("player", "cpu"))}
+
+    def damage_by_character(self, where=None):
+        """{shortname: (total damage dealt, team slots played)} over the matching rows, both sides."""
+        n = len(self.characters)
+        damage = np.zeros(n)
+        slots = np.zeros(n, dtype=np.int64)
+        for chunk in self.chunks(where):
+            for s, side in enumerate(("player", "cpu")):
+                teams = chunk[side].ravel()
+                damage += np.bincount(teams, weights=chunk["damage"][:, s].ravel(), minlength=n)
+                slots += np.bincount(teams, minlength=n)
+        return {self.characters[i]: (int(damage[i]), int(slots[i])) for i in range(n) if slots[i]}
+
+
+def battle_rows(results, team_size):
+    """
+    Column arrays for ResultStore.append from (player indices, cpu indices, winner, rounds, damage, moves)
+    tuples, damage and moves being a metrics.BattleTally's dicts after the battle (see simulate.run_batch).
+    """
+    n = len(results)
+    rows = {name: np.zeros((n,) + shape, dtype=dtype) for name, (dtype, shape) in schema(team_size).items()}
+    for k, (p_idx, c_idx, winner, rounds, damage, moves) in enumerate(results):
+        rows["player"][k] = p_idx
+        rows["cpu"][k] = c_idx
+        rows["winner"][k] = WINNERS.index(winner)
+        rows["rounds"][k] = rounds
+        rows["damage"][k] = (damage["player"], damage["cpu"])
+        rows["moves"][k] = (moves["player"], moves["cpu"])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a result store.")
+    parser.add_argument("path")
+    parser.add_argument("--by", default="character", choices=GROUPS, help="win rate grouping")
+    parser.add_argument("--bin-width", type=int, default=5, help="rounds histogram bin width")
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.path, mode="r")
+    print(f"{len(store)} battles, teams of {store.team_size}")
+    print(f"win rates by {args.by}:")
+    for key, (wins, battles) in store.win_rates(args.by).items():
+        name = " vs ".join(" ".join(t) for t in key) if args.by == "matchup" else \
+            key if args.by == "character" else " ".join(key)
+        print(f"  {name}: {wins / battles:.2%}  ({battles} battles)")
+    damage = store.damage_by_character()
+    print("mean damage dealt per battle:")
+    for sn, (total, slots) in damage.items():
+        print(f"  {sn}: {total / slots:.0f}")
+    edges, counts = store.histogram("rounds", args.bin_width)
+    print("rounds:")
+    for lo, k in zip(edges[:-1].tolist(), counts.tolist()):
+        if k:
+            print(f"  {lo:>4}-{lo + args.bin_width - 1:<4} {k}")
+    print("move usage:")
+    for side, usage in store.move_usage().items():
+        print(f"  {side}: " + ", ".join(f"{name} {k}" for name, k in usage.items()))
+
+
+if __name__ == "__main__":
+    main()
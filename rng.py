@@ -0,0 +1,103 @@
+# rng.py
+"""
+Random streams for the engine.
+
+SeedSequence is a small pure-Python take on numpy's: a root seed plus a spawn key, hashed into a
+seed, with spawn(n) handing out statistically independent children (one per worker, per chunk,
+per engine stream). BufferedRandom is a random.Random whose integer dice are drawn in bulk, skipping
+the randint -> randrange -> _randbelow call chain on every roll. The antithetic variants mirror every
+draw of the plain stream with the same seed (u -> 1 - u, k -> n - 1 - k), for antithetic sampling.
+"""
+import hashlib
+import random
+import secrets
+
+DEFAULT_BLOCK_SIZE = 512
+
+
+class SeedSequence:
+    def __init__(self, entropy=None, spawn_key=()):
+        if entropy is None:
+            entropy = secrets.randbits(128)
+        self.entropy = entropy
+        self.spawn_key = tuple(spawn_key)
+        self.n_children_spawned = 0
+
+    def spawn(self, n):
+        children = [SeedSequence(self.entropy, self.spawn_key + (self.n_children_spawned + i,))
+                    for i in range(n)]
+        self.n_children_spawned += n
+        return children
+
+    def seed(self):
+        # 128-bit integer seed for random.Random
+        digest = hashlib.blake2b(repr((self.entropy, self.spawn_key)).encode(), digest_size=16).digest()
+        return int.from_bytes(digest, "little")
+
+    def __repr__(self):
+        return f"SeedSequence(entropy={self.entropy!r}, spawn_key={self.spawn_key!r})"
+
+
+def as_seed_sequence(seed):
+    return seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+
+
+class BufferedRandom(random.Random):
+    """
+    random.Random that pre-draws integer dice in blocks, one block per (low, high) range.
+    random() stays the C implementation: it is already cheaper than any Python-level buffer.
+    """
+
+    def __init__(self, x=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        super().__init__(x)
+
+    def seed(self, a=None, version=2):
+        super().seed(a, version)
+        self._int_blocks = {}
+
+    def _refill(self, a, b):
+        block = self.choices(range(a, b + 1), k=self.block_size)
+        self._int_blocks[(a, b)] = block
+        return block
+
+    def randint(self, a, b):
+        block = self._int_blocks.get((a, b))
+        if not block:
+            block = self._refill(a, b)
+        return block.pop()
+
+    def getstate(self):
+        return super().getstate(), {k: tuple(v) for k, v in self._int_blocks.items()}
+
+    def setstate(self, state):
+        base, blocks = state
+        super().setstate(base)
+        self._int_blocks = {k: list(v) for k, v in blocks.items()}
+
+
+class _Antithetic:
+    # mirrors the two primitives every other method draws through: random() for floats and weighted
+    # choices, _randbelow() for randint/randrange/choice/sample
+    def random(self):
+        u = super().random()
+        return 1.0 - u if u else 0.0    # stays in [0, 1)
+
+    def _randbelow(self, n):
+        return n - 1 - super()._randbelow(n)
+
+
+class AntitheticRandom(_Antithetic, random.Random):
+    pass
+
+
+class AntitheticBufferedRandom(_Antithetic, BufferedRandom):
+    pass
+
+
+def make_rng(seed=None, buffered=False, antithetic=False):
+    """random.Random (or BufferedRandom, or their antithetic mirror) seeded from an int, None or a SeedSequence."""
+    x = seed.seed() if isinstance(seed, SeedSequence) else seed
+    if antithetic:
+        return AntitheticBufferedRandom(x) if buffered else AntitheticRandom(x)
+    return BufferedRandom(x) if buffered else random.Random(x)
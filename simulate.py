@@ -0,0 +1,264 @@
+# simulate.py
+"""
+Headless battle runner: plays complete battles end to end without the Streamlit UI
+and spreads large batches over a process pool.
+
+    python simulate.py -n 1000000
+    python simulate.py -n 50000 --player 0 1 2 --cpu 2 3 4 --seed 7 --workers 4
+    python simulate.py -n 10000000 --vectorized      # NumPy lockstep engine (vecengine.py)
+    python simulate.py -n 200 --cpu-policy mcts      # search AI (mcts.py) against the built-in one
+    python simulate.py -n 100 --team-size 300        # raid-sized random teams (prototypes repeat)
+    python simulate.py -n 1000000 --record battles.rpl   # also stream every battle to a replay file
+    python simulate.py -n 1000000 --store results/       # append per-battle rows to a result store
+"""
+import argparse
+import json
+import time
+from multiprocessing import Pool, cpu_count
+
+from characters import create_all_character_prototypes
+from engine import DEFAULT_MAX_ROUNDS, BattleEngine, random_team_indices
+from metrics import Metrics
+from policies import POLICIES
+from replay import Replay, ReplayWriter, encode
+from rng import SeedSequence, make_rng
+
+TEAM_SIZE = 3
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def play_battle(engine, player_indices, cpu_indices, player_policy="cpu", cpu_policy="cpu",
+                max_rounds=DEFAULT_MAX_ROUNDS, record=None):
+    """
+    Plays one complete battle on engine and returns (winner, rounds).
+    winner is "player", "cpu" or "draw" (both teams wiped the same round, or max_rounds reached).
+    record: optional list receiving each round's actions (see BattleEngine.play_until_end).
+    """
+    engine.start_battle(player_indices, cpu_indices)
+    winner = engine.play_until_end(player_policy, cpu_policy, max_rounds, record=record)
+    return winner or "draw", engine.round_number - 1
+
+
+class BatchResult:
+    """Aggregated outcome counts of many battles; results from different workers are merged."""
+
+    def __init__(self):
+        self.battles = 0
+        self.wins = {"player": 0, "cpu": 0, "draw": 0}
+        self.rounds = 0
+        self.char_battles = {}   # shortname -> battles fought (per team slot)
+        self.char_wins = {}      # shortname -> battles won (per team slot)
+        self.elapsed = 0.0
+        self.metrics = None      # merged engine Metrics when the batch ran with metrics=True
+        self.replays = None      # a chunk's encoded replays (replay.encode) on their way to the writer; not merged
+        self.rows = None         # a chunk's result store rows (resultstore.battle_rows) on their way; not merged
+
+    def record(self, winner, rounds, player_team, cpu_team):
+        self.battles += 1
+        self.wins[winner] += 1
+        self.rounds += rounds
+        for side, team in (("player", player_team), ("cpu", cpu_team)):
+            for c in team:
+                self.char_battles[c.shortname] = self.char_battles.get(c.shortname, 0) + 1
+                if winner == side:
+                    self.char_wins[c.shortname] = self.char_wins.get(c.shortname, 0) + 1
+
+    def merge(self, other):
+        self.battles += other.battles
+        for k, v in other.wins.items():
+            self.wins[k] += v
+        self.rounds += other.rounds
+        for k, v in other.char_battles.items():
+            self.char_battles[k] = self.char_battles.get(k, 0) + v
+        for k, v in other.char_wins.items():
+            self.char_wins[k] = self.char_wins.get(k, 0) + v
+        if other.metrics is not None:
+            self.metrics = (self.metrics or Metrics()).merge(other.metrics)
+        return self
+
+    def win_rate(self, side):
+        return self.wins[side] / self.battles if self.battles else 0.0
+
+    def char_win_rates(self):
+        return {k: self.char_wins.get(k, 0) / n for k, n in sorted(self.char_battles.items())}
+
+    def battles_per_sec(self):
+        return self.battles / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        lines = [
+            f"battles: {self.battles}  ({self.battles_per_sec():,.0f} battles/sec over {self.elapsed:.2f}s)",
+            f"player wins: {self.win_rate('player'):.2%}  cpu wins: {self.win_rate('cpu'):.2%}  "
+            f"draws: {self.win_rate('draw'):.2%}",
+            f"avg rounds: {self.rounds / self.battles if self.battles else 0:.2f}",
+            "per-character win rate:",
+        ]
+        for name, rate in self.char_win_rates().items():
+            lines.append(f"  {name}: {rate:.2%}  ({self.char_battles[name]} slots)")
+        return "\n".join(lines)
+
+
+def play_chunk(n, chunk_seed, player_indices=None, cpu_indices=None, player_policy="cpu", cpu_policy="cpu",
+               max_rounds=DEFAULT_MAX_ROUNDS, buffered_rng=False, metrics=False, team_size=TEAM_SIZE,
+               record_replays=False, store_rows=False):
+    """
+    Plays n battles on a private engine with its own streams spawned from chunk_seed and returns their
+    BatchResult (run_batch's unit of work; matchups.py plays one pairing with it). Options as in run_batch.
+    """
+    engine_seed, comp_seed, replay_seed = chunk_seed.spawn(3)
+    comp_rng = make_rng(comp_seed)
+    replay_rng = make_rng(replay_seed)
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=engine_seed, buffered_rng=buffered_rng, log_mode="off",
+                          metrics=metrics, tally=store_rows)
+    result = BatchResult()
+    if record_replays:
+        result.replays = []
+    stored = [] if store_rows else None
+    for _ in range(n):
+        p_idx = player_indices if player_indices is not None else random_team_indices(comp_rng, len(protos), team_size)
+        c_idx = cpu_indices if cpu_indices is not None else random_team_indices(comp_rng, len(protos), team_size)
+        if record_replays:
+            # a replay stores one seed per battle, so recorded battles reseed the engine first
+            battle_seed = replay_rng.getrandbits(64)
+            engine.reseed(battle_seed)
+            rounds_played = []
+            winner, rounds = play_battle(engine, p_idx, c_idx, player_policy, cpu_policy, max_rounds, rounds_played)
+            result.replays.append(encode(Replay(battle_seed, buffered_rng, p_idx, c_idx, rounds_played, winner)))
+        else:
+            winner, rounds = play_battle(engine, p_idx, c_idx, player_policy, cpu_policy, max_rounds)
+        result.record(winner, rounds, engine.player_team, engine.cpu_team)
+        if store_rows:
+            tally = engine.tally
+            stored.append((p_idx, c_idx, winner, rounds,
+                           {side: list(slots) for side, slots in tally.damage.items()},
+                           {side: list(uses) for side, uses in tally.moves.items()}))
+    result.metrics = engine.metrics
+    if store_rows:
+        from resultstore import battle_rows
+        result.rows = battle_rows(stored, team_size)
+    return result
+
+
+def _run_chunk(kwargs):
+    # worker entry point: one play_chunk call (keyword arguments, so new options keep their defaults)
+    return play_chunk(**kwargs)
+
+
+def run_batch(n_battles, player_indices=None, cpu_indices=None, player_policy="cpu", cpu_policy="cpu",
+              workers=None, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, max_rounds=DEFAULT_MAX_ROUNDS,
+              buffered_rng=False, metrics=False, team_size=TEAM_SIZE, replay_path=None, store_path=None):
+    """
+    Plays n_battles complete battles across a process pool and returns a merged BatchResult.
+    Teams left as None are drawn at random (team_size of the prototypes, repeating once team_size
+    exceeds the roster) for every battle.
+    Every chunk gets an independent stream spawned from seed (int, None or rng.SeedSequence), so with
+    a fixed seed results depend only on (seed, chunk_size), not on the number of workers.
+    With metrics=True every engine is instrumented and result.metrics holds the merged metrics.Metrics.
+    With replay_path every battle is appended to that replay file (replay.py) as its chunk completes, in
+    chunk order; recorded battles are seeded one by one, so their outcomes differ from an unrecorded
+    batch with the same seed (team draws do not).
+    With store_path every battle's row (teams, winner, rounds, damage per slot, move uses) is appended
+    to that result store (resultstore.py, created if missing) as its chunk completes; both teams must
+    have the same size. Needs numpy.
+    """
+    workers = workers or cpu_count()
+    store = None
+    if store_path is not None:
+        from resultstore import ResultStore
+        sizes = {len(t) if t is not None else team_size for t in (player_indices, cpu_indices)}
+        if len(sizes) != 1:
+            raise ValueError("a result store needs teams of equal size")
+        size = sizes.pop()
+        store = ResultStore(store_path, size)
+        if store.team_size != size:
+            raise ValueError(f"{store_path} holds teams of {store.team_size}, not {size}")
+    starts = range(0, n_battles, chunk_size)
+    root = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+    tasks = [dict(n=min(chunk_size, n_battles - start), chunk_seed=chunk_seed, player_indices=player_indices,
+                  cpu_indices=cpu_indices, player_policy=player_policy, cpu_policy=cpu_policy,
+                  max_rounds=max_rounds, buffered_rng=buffered_rng, metrics=metrics, team_size=team_size,
+                  record_replays=replay_path is not None, store_rows=store is not None)
+             for start, chunk_seed in zip(starts, root.spawn(len(starts)))]
+
+    result = BatchResult()
+    writer = ReplayWriter(replay_path) if replay_path is not None else None
+    t0 = time.perf_counter()
+
+    def collect(part):
+        if writer is not None:
+            writer.write_all(part.replays)
+            part.replays = None
+        if store is not None:
+            store.append(part.rows)
+            part.rows = None
+        result.merge(part)
+
+    try:
+        if workers == 1:
+            for task in tasks:
+                collect(_run_chunk(task))
+        else:
+            with Pool(workers) as pool:
+                # ordered when recording, so the files do not depend on worker scheduling
+                ordered = writer is not None or store is not None
+                parts = pool.imap(_run_chunk, tasks) if ordered else pool.imap_unordered(_run_chunk, tasks)
+                for part in parts:
+                    collect(part)
+    finally:
+        if writer is not None:
+            writer.close()
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play complete battles headlessly and report win rates.")
+    parser.add_argument("-n", "--battles", type=int, default=10000)
+    parser.add_argument("--player", type=int, nargs="+", metavar="IDX",
+                        help="player prototype indices (default: random per battle)")
+    parser.add_argument("--cpu", type=int, nargs="+", metavar="IDX",
+                        help="cpu prototype indices (default: random per battle)")
+    parser.add_argument("--team-size", type=int, default=TEAM_SIZE,
+                        help=f"size of the random teams (default: {TEAM_SIZE})")
+    parser.add_argument("--player-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--cpu-policy", default="cpu", choices=sorted(POLICIES))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    parser.add_argument("--buffered-rng", action="store_true", help="draw rolls from pre-drawn blocks")
+    parser.add_argument("--record", metavar="PATH", help="append every battle to a replay file (see replay.py)")
+    parser.add_argument("--store", metavar="DIR", help="append every battle's row to a result store (resultstore.py)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="instrument the engines and write phase timings and counters as JSON")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="use the NumPy lockstep engine (cpu policy on both sides only)")
+    args = parser.parse_args(argv)
+
+    if args.vectorized:
+        if args.player_policy != "cpu" or args.cpu_policy != "cpu":
+            parser.error("--vectorized only supports the cpu policy")
+        if args.team_size != TEAM_SIZE or any(len(t) != TEAM_SIZE for t in (args.player, args.cpu) if t):
+            parser.error(f"--vectorized only supports teams of {TEAM_SIZE}")
+        if args.record or args.store:
+            parser.error("--vectorized cannot record replays or store rows")
+        from vecengine import run_vectorized
+        result = run_vectorized(args.battles, args.player, args.cpu, workers=args.workers or cpu_count(),
+                                seed=args.seed, max_rounds=args.max_rounds)
+        print(result.summary())
+        return
+
+    result = run_batch(args.battles, args.player, args.cpu, args.player_policy, args.cpu_policy,
+                       workers=args.workers, chunk_size=args.chunk_size, seed=args.seed,
+                       max_rounds=args.max_rounds, buffered_rng=args.buffered_rng,
+                       metrics=bool(args.metrics), team_size=args.team_size, replay_path=args.record,
+                       store_path=args.store)
+    print(result.summary())
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            json.dump(result.metrics.snapshot(), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
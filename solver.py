@@ -0,0 +1,492 @@
+# solver.py
+"""
+Exact battle outcomes by memoized recursion over battle states.
+
+Instead of sampling battles, the solver enumerates every outcome of a round. It runs the real
+BattleEngine a step at a time (each side's policy, begin_round, resolve_action per queued entry,
+end_round) under a branching RNG that replays a path of choices and walks all of them depth first:
+  - randint / choice draws branch once per value;
+  - random() returns a symbolic uniform that branches only when it is compared (crit checks, AI
+    weight tables), with the exact interval probabilities;
+  - the d100 speed tie rolls are placed by rank among the rolls they are compared with, since only
+    their order matters.
+Partial states are merged after every step, keyed together with the queue left and the distribution
+of the actions not yet revealed (a character's action is only drawn when it acts), and so are the
+round outcomes leading to the same state. Each state's value (win/loss/draw probability,
+expected rounds) is memoized in a transposition table keyed by HP, timers, flags, last status moves,
+stuns, heal rings and the remaining turns of timed effects.
+
+The rules come from the engine itself, so where a battle is small enough to finish it is an exact
+reference for the engine (and vecengine) to be checked against. Policies must draw only from the
+engine's streams (cpu and random do; mcts does not).
+
+Scope: 1v1 battles and reduced-HP team battles. A round branches per acting character over its move
+choice, damage roll and crit, so the work grows with HP and with the team size. Two approximations
+shrink it, also between the actions of a round:
+  - hp_bucket merges states whose HP agrees to within the bucket;
+  - rolls=k replaces each damage roll with k equally likely quantiles of its range.
+Measured on one core: stock RW vs TB at --rolls 2 --hp-bucket 100 is 2.1k states (~2.5 s), at --rolls 3
+3.3k states (~5 s); RW vs EA at --rolls 3 --hp-bucket 50 is 75k states (~3 min). With every HP set to
+40, RW+EA vs TB+CA solves exactly in ~1 s; with every HP set to 30, the 3v3 RW+EA+TB vs TB+CA+QK
+solves exactly (5.4k states, ~6 min) to a player win probability of 0.50468, where vecengine gives
+0.50499 +- 0.00020 over 6M battles. The stock 3v3 is out of reach: even at --rolls 1 --hp-bucket 500
+it solves 320k states in 10 minutes without resolving any of the probability. 3v3 matchups are for
+Monte Carlo (simulate.py, abtest.py, matchups.py). --max-states / --time-limit stop a run early; the
+result is then partial, with everything not explored reported as `unresolved`. Progress goes to stderr.
+
+States reached again while their own value is still being computed (multi-round cycles, which need
+rounds in which nobody deals damage) are not followed. Their probability is reported as
+`unresolved` too; a state that can repeat itself in one round is solved exactly (geometric series).
+
+    python solver.py --player 0 --cpu 2 --rolls 2 --hp-bucket 100             # RW vs TB, ~2.5 s
+    python solver.py --player 0 --cpu 2 --rolls 3 --hp-bucket 100             # ~5 s
+    python solver.py --player 0 --cpu 4 --rolls 3 --hp-bucket 50 --time-limit 60   # RW vs QK: partial after 60 s
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from collections import namedtuple
+
+from characters import create_all_character_prototypes
+from engine import PASS, BattleEngine
+from moves import HEAL_MOVES
+from policies import get_policy
+
+TIE_RANGE = (1, 100)    # the engine's speed tie roll, diceroll(1, 100)
+PROGRESS_INTERVAL = 5.0     # seconds between progress reports
+
+# probabilities of each ending, expected rounds, and mass lost to cycles
+Outcome = namedtuple("Outcome", ["player", "cpu", "draw", "rounds", "unresolved"])
+_UNRESOLVED = Outcome(0.0, 0.0, 0.0, 0.0, 1.0)
+_ENDINGS = {
+    "player": Outcome(1.0, 0.0, 0.0, 0.0, 0.0),
+    "cpu": Outcome(0.0, 1.0, 0.0, 0.0, 0.0),
+    "draw": Outcome(0.0, 0.0, 1.0, 0.0, 0.0),
+}
+
+
+class _Uniform:
+    """A random() draw that stays symbolic: comparing it with a number branches on the interval left."""
+    __slots__ = ("rng", "lo", "hi")
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.lo = 0.0
+        self.hi = 1.0
+
+    def _below(self, t):
+        # the draw is < t
+        if t <= self.lo:
+            return False
+        if t >= self.hi:
+            return True
+        width = self.hi - self.lo
+        if self.rng.branch(((t - self.lo) / width, (self.hi - t) / width)) == 0:
+            self.hi = t
+            return True
+        self.lo = t
+        return False
+
+    # continuous: < and <= agree with probability 1
+    def __lt__(self, t):
+        return self._below(t)
+
+    __le__ = __lt__
+
+    def __gt__(self, t):
+        return not self._below(t)
+
+    __ge__ = __gt__
+
+
+class _TieRoll:
+    """A tie roll that is only placed (equal to, or between, the rolls placed so far) when compared."""
+    __slots__ = ("rng", "level")
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.level = None
+
+    def _place(self):
+        # with c distinct levels placed out of R values, a new roll equals each with probability 1/R and
+        # falls into each of the c + 1 gaps with probability (R - c) / (R (c + 1)) (the gaps are exchangeable)
+        rng = self.rng
+        levels = rng.levels
+        size = TIE_RANGE[1] - TIE_RANGE[0] + 1
+        c = len(levels)
+        weights = (1 / size,) * c + ((size - c) / (size * (c + 1)),) * (c + 1)
+        k = rng.branch(weights)
+        if k < c:
+            self.level = levels[k]
+        else:
+            g = k - c
+            low = levels[g - 1] if g > 0 else (levels[0] - 2 if levels else 0.0)
+            high = levels[g] if g < c else (levels[-1] + 2 if levels else 2.0)
+            self.level = (low + high) / 2
+            levels.insert(g, self.level)
+
+    def _levels(self, other):
+        if self.level is None:
+            self._place()
+        if other.level is None:
+            other._place()
+        return self.level, other.level
+
+    def __eq__(self, other):
+        a, b = self._levels(other)
+        return a == b
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        a, b = self._levels(other)
+        return a < b
+
+    def __gt__(self, other):
+        a, b = self._levels(other)
+        return a > b
+
+    __hash__ = None
+
+
+PROB_DIGITS = 12   # hidden-action probabilities are rounded to this many decimals, so equal ones merge
+
+
+class _OutOfBudget(Exception):
+    pass
+
+
+def _normalized(weights):
+    # {profile: weight} -> hashable distribution
+    total = sum(weights.values())
+    return frozenset((profile, round(w / total, PROB_DIGITS)) for profile, w in weights.items())
+
+
+def _split_heals(dist):
+    """
+    {heal actions: (probability, distribution of the rest)} for one side's hidden actions: the heals
+    are revealed (they all run first, in the heal phase), every other action stays hidden.
+    """
+    groups = {}
+    for profile, p in dist:
+        heals = tuple(a if a is not None and a[0] in HEAL_MOVES else None for a in profile)
+        rest = tuple(None if h is not None else a for a, h in zip(profile, heals))
+        weights = groups.setdefault(heals, {})
+        weights[rest] = weights.get(rest, 0.0) + p
+    return {heals: (sum(w.values()), _normalized(w)) for heals, w in groups.items()}
+
+
+def _reveal(dist, slot):
+    # {action of slot: (probability, distribution of the other hidden actions given it)}
+    groups = {}
+    for profile, p in dist:
+        rest = profile[:slot] + (None,) + profile[slot + 1:]
+        weights = groups.setdefault(profile[slot], {})
+        weights[rest] = weights.get(rest, 0.0) + p
+    return {action: (sum(w.values()), _normalized(w)) for action, w in groups.items()}
+
+
+def _keep(dist, slots):
+    # dist with only the actions of slots still hidden (the others will never be used)
+    weights = {}
+    for profile, p in dist:
+        kept = tuple(a if i in slots else None for i, a in enumerate(profile))
+        weights[kept] = weights.get(kept, 0.0) + p
+    return _normalized(weights)
+
+
+class BranchingRandom(random.Random):
+    """
+    random.Random stand-in that follows `path` (one choice index per branch point) and extends it with
+    first choices; next_path() then steps to the next unexplored path, depth first. prob is the
+    probability of the path taken. rolls=k draws randint ranges wider than k from k quantiles.
+    """
+
+    def __init__(self, rolls=None):
+        super().__init__(0)
+        self.rolls = rolls
+        self.path = []
+        self.arity = []
+
+    def start(self, path):
+        self.path = path
+        self.arity = []
+        self.pos = 0
+        self.prob = 1.0
+        self.levels = []
+
+    def branch(self, weights):
+        # choice index among the positive weights, recorded so next_path can enumerate the others
+        choices = [k for k, w in enumerate(weights) if w > 0]
+        if self.pos < len(self.path):
+            i = self.path[self.pos]
+        else:
+            i = 0
+            self.path.append(0)
+        self.arity.append(len(choices))
+        self.pos += 1
+        k = choices[i]
+        self.prob *= weights[k]
+        return k
+
+    def next_path(self):
+        path, arity = self.path[:self.pos], self.arity
+        while path:
+            if path[-1] + 1 < arity[len(path) - 1]:
+                path[-1] += 1
+                return path
+            path.pop()
+        return None
+
+    def random(self):
+        return _Uniform(self)
+
+    def _randbelow(self, n):
+        return self.branch((1 / n,) * n)
+
+    def randint(self, a, b):
+        if (a, b) == TIE_RANGE:
+            return _TieRoll(self)
+        n = b - a + 1
+        if self.rolls is not None and n > self.rolls:
+            k = self.branch((1 / self.rolls,) * self.rolls)
+            return a + (2 * k + 1) * n // (2 * self.rolls)
+        return a + self._randbelow(n)
+
+
+class Solver:
+    """
+    Solves battles between fixed teams on `engine` for a pair of policies (names or callables).
+    The transposition table is kept across solve() calls with the same settings.
+
+    max_states (table size) and time_limit (seconds per solve) bound the work: once either is reached
+    the solver stops expanding, solve() returns the partial result with every unexplored branch counted
+    as `unresolved`, and `stopped` is set. Values computed after the stop are not memoized, so the table
+    only ever holds finished states. progress, if given, is called with the solver every
+    PROGRESS_INTERVAL seconds.
+    """
+
+    def __init__(self, engine, player_policy="cpu", cpu_policy="cpu", hp_bucket=None, rolls=None,
+                 max_states=None, time_limit=None, progress=None):
+        self.engine = engine
+        self.player_policy = get_policy(player_policy)
+        self.cpu_policy = get_policy(cpu_policy)
+        self.hp_bucket = hp_bucket
+        self.rng = BranchingRandom(rolls)
+        self.table = {}
+        self._open = set()
+        self.branches = 0   # policy calls, round starts and actions enumerated
+        self.max_states = max_states
+        self.time_limit = time_limit
+        self.progress = progress
+        self.stopped = False
+        self._deadline = math.inf
+        self._next_report = math.inf
+
+    def _out_of_budget(self):
+        # checked once per enumerated branch; also where progress is reported
+        if self.stopped:
+            return True
+        now = time.perf_counter()
+        if now >= self._next_report:
+            self._next_report = now + PROGRESS_INTERVAL
+            self.progress(self)
+        if now >= self._deadline:
+            self.stopped = True
+        return self.stopped
+
+    def key(self):
+        # everything the rest of the battle depends on; the team line-ups are fixed per solver. The
+        # acted flags are left out: begin_round clears them and each queued actor acts once anyway
+        e = self.engine
+        bucket = self.hp_bucket
+        teams = tuple(
+            tuple(((c.hp + bucket - 1) // bucket if bucket else c.hp,) + c.get_state()[7:16] + c.get_state()[17:]
+                  for c in team)
+            for team in (e.player_team, e.cpu_team))
+        effects = tuple(sorted((side, slot, field, until - e.round_number)
+                               for side, slot, field, until in e.effects.get_state(e.player_index)))
+        return teams, e.player_heal_left, e.cpu_heal_left, effects
+
+    def _paths(self):
+        # yields the branching RNG once per path of the work done between yields, depth first
+        rng = self.rng
+        path = []
+        while path is not None:
+            if self._out_of_budget():
+                raise _OutOfBudget
+            rng.start(path)
+            yield rng
+            self.branches += 1
+            path = rng.next_path()
+
+    def _add(self, frontier, queue, hidden, p):
+        # merges the engine's current mid-round state into frontier (by queue length, then key)
+        key = (self.key(), queue, hidden)
+        entries = frontier.setdefault(len(queue), {})
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = [p, self.engine.snapshot(include_rng=False)]
+        else:
+            entry[0] += p
+
+    def _outcomes(self, snap):
+        """
+        {state key or winner: [probability, snapshot or None]} over every outcome of the next round.
+        The round is walked a step at a time: each side's policy (enumerated on its own), the heal phase
+        and speed order, then one queued action after another. Between steps equal partial states are
+        merged, keyed with the queue left and the distribution of the actions not yet revealed, so an
+        action is only drawn when its actor acts.
+        """
+        e = self.engine
+        hidden = []
+        for side, policy in (("player", self.player_policy), ("cpu", self.cpu_policy)):
+            weights = {}
+            for rng in self._paths():
+                e.restore(snap)
+                profile = tuple(policy(e, side))
+                weights[profile] = weights.get(profile, 0.0) + rng.prob
+            hidden.append(_normalized(weights))
+
+        frontier = {}
+        for player_heals, (p_player, player_rest) in _split_heals(hidden[0]).items():
+            for cpu_heals, (p_cpu, cpu_rest) in _split_heals(hidden[1]).items():
+                for rng in self._paths():
+                    e.restore(snap)
+                    e.submit_actions("player", [a or PASS for a in player_heals])
+                    e.submit_actions("cpu", [a or PASS for a in cpu_heals])
+                    queue = tuple((side, slot) for _, side, _, _, _, slot in e.begin_round())
+                    rest = (_keep(player_rest, {slot for side, slot in queue if side == "player"}),
+                            _keep(cpu_rest, {slot for side, slot in queue if side == "cpu"}))
+                    self._add(frontier, queue, rest, p_player * p_cpu * rng.prob)
+
+        outcomes = {}
+        # longest queues first: every entry is complete before it is stepped
+        for n in range(max(frontier, default=-1), -1, -1):
+            for (_, queue, rest), (p, step_snap) in frontier.pop(n, {}).items():
+                e.restore(step_snap)
+                if not queue:
+                    e.end_round()
+                    winner = e.winner()
+                    key = winner if winner is not None else self.key()
+                    entry = outcomes.get(key)
+                    if entry is None:
+                        outcomes[key] = [p, None if winner is not None else e.snapshot(include_rng=False)]
+                    else:
+                        entry[0] += p
+                    continue
+                side, slot = queue[0]
+                i = 0 if side == "player" else 1
+                actor = e.team_for(side)[0][slot]
+                if not actor.is_alive() or actor.acted_this_round or actor.stunned:
+                    # the action is never used: skipped or spent on the stun
+                    e.resolve_action((actor, side, PASS, None, None, slot))
+                    after = _keep(rest[i], {s for sd, s in queue[1:] if sd == side})
+                    self._add(frontier, queue[1:], (after, rest[1]) if i == 0 else (rest[0], after), p)
+                    continue
+                for action, (q, after) in _reveal(rest[i], slot).items():
+                    after = (after, rest[1]) if i == 0 else (rest[0], after)
+                    for rng in self._paths():
+                        e.restore(step_snap)
+                        e.resolve_action((e.team_for(side)[0][slot], side, action, None, None, slot))
+                        self._add(frontier, queue[1:], after, p * q * rng.prob)
+        return outcomes
+
+    def _value(self, key, snap):
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        if key in self._open or self._out_of_budget():
+            return _UNRESOLVED
+        self._open.add(key)
+        try:
+            outcomes = self._outcomes(snap)
+        except _OutOfBudget:
+            self._open.discard(key)
+            return _UNRESOLVED
+        acc = [0.0] * 5
+        p_self = 0.0
+        for child, (p, child_snap) in outcomes.items():
+            if child == key:
+                p_self += p
+                continue
+            v = _ENDINGS[child] if child_snap is None else self._value(child, child_snap)
+            for i in range(5):
+                acc[i] += p * v[i]
+        self._open.discard(key)
+        if p_self >= 1.0:
+            value = _UNRESOLVED     # the round can only repeat itself
+        else:
+            scale = 1.0 / (1.0 - p_self)
+            value = Outcome(acc[0] * scale, acc[1] * scale, acc[2] * scale, (1.0 + acc[3]) * scale, acc[4] * scale)
+        if not self.stopped:    # a value computed past the budget is partial
+            self.table[key] = value
+            if self.max_states is not None and len(self.table) >= self.max_states:
+                self.stopped = True
+        return value
+
+    def solve(self, player_indices, cpu_indices):
+        """Outcome of a battle between the given teams, from its first round (partial if `stopped`)."""
+        e = self.engine
+        saved = e.rng, e.ai_rng
+        now = time.perf_counter()
+        self.stopped = self.max_states is not None and len(self.table) >= self.max_states
+        self._deadline = now + self.time_limit if self.time_limit is not None else math.inf
+        self._next_report = now + PROGRESS_INTERVAL if self.progress is not None else math.inf
+        e.start_battle(player_indices, cpu_indices)
+        e.rng = e.ai_rng = self.rng
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 20000))
+        try:
+            return self._value(self.key(), e.snapshot(include_rng=False))
+        finally:
+            sys.setrecursionlimit(limit)
+            e.rng, e.ai_rng = saved
+
+
+def solve(player_indices, cpu_indices, player_policy="cpu", cpu_policy="cpu", hp_bucket=None, rolls=None,
+          prototypes=None, max_states=None, time_limit=None):
+    """Outcome of one matchup on a fresh engine (stock characters unless prototypes are given)."""
+    protos = prototypes if prototypes is not None else create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, log_mode="off")
+    solver = Solver(engine, player_policy, cpu_policy, hp_bucket, rolls, max_states, time_limit)
+    return solver.solve(player_indices, cpu_indices)
+
+
+def report_progress(solver):
+    print(f"  ... {len(solver.table)} states solved, {len(solver._open)} open, "
+          f"{solver.branches} branches enumerated", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact win probabilities of one small (1v1) matchup.")
+    parser.add_argument("--player", type=int, nargs="+", required=True, metavar="IDX")
+    parser.add_argument("--cpu", type=int, nargs="+", required=True, metavar="IDX")
+    parser.add_argument("--player-policy", default="cpu")
+    parser.add_argument("--cpu-policy", default="cpu")
+    parser.add_argument("--hp-bucket", type=int, default=None, help="merge states whose HP agrees to this many points")
+    parser.add_argument("--rolls", type=int, default=None, help="quantiles per damage roll (default: every value)")
+    parser.add_argument("--max-states", type=int, default=None, help="stop after solving this many states")
+    parser.add_argument("--time-limit", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--quiet", action="store_true", help="no progress reports on stderr")
+    args = parser.parse_args(argv)
+
+    protos = create_all_character_prototypes()
+    solver = Solver(BattleEngine(protos, protos, log_mode="off"), args.player_policy, args.cpu_policy,
+                    args.hp_bucket, args.rolls, args.max_states, args.time_limit,
+                    None if args.quiet else report_progress)
+    t0 = time.perf_counter()
+    out = solver.solve(args.player, args.cpu)
+    print(f"player {out.player:.4%}  cpu {out.cpu:.4%}  draw {out.draw:.4%}  "
+          f"expected rounds {out.rounds:.3f}  unresolved {out.unresolved:.2e}")
+    print(f"{len(solver.table)} states, {solver.branches} branches enumerated "
+          f"in {time.perf_counter() - t0:.2f}s")
+    if solver.stopped:
+        print(f"stopped at the state/time limit: {out.unresolved:.2%} of the probability was not resolved")
+
+
+if __name__ == "__main__":
+    main()
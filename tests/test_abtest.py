@@ -0,0 +1,55 @@
+# tests/test_abtest.py
+import pytest
+
+from abtest import PairedStats, Variant, compare, parse_variant
+
+
+def test_paired_stats():
+    stats = PairedStats()
+    stats.add_unit([1.0], [0.0])
+    stats.add_unit([1.0], [1.0])
+    stats.add_unit([0.0], [0.0])
+    other = PairedStats()
+    other.add_unit([1.0], [0.0])
+    stats.merge(other)
+    assert (stats.units, stats.battles) == (4, 4)
+    assert stats.rate_a() == 0.75 and stats.rate_b() == 0.25
+    assert stats.difference() == 0.5
+    assert stats.stderr() == pytest.approx((1 / 3) ** 0.5 / 2)
+
+
+def test_crn_makes_identical_variants_identical():
+    stock = Variant()
+    paired = compare(stock, stock, 200, seed=1, workers=1)
+    assert paired.difference() == 0.0 and paired.stderr() == 0.0
+    independent = compare(stock, stock, 200, seed=1, crn=False, workers=1)
+    assert independent.stderr() > 0.0
+
+
+def test_crn_gains_effective_sample_size_on_a_stat_tweak():
+    tweak = parse_variant(None, None, ["RW.max_hp=1400"])
+    stats = compare(Variant(), tweak, 400, seed=2, workers=1)
+    assert stats.ess_gain() > 2.0
+
+
+def test_antithetic_plays_mirrored_pairs():
+    stats = compare(Variant(), Variant(), 50, seed=3, antithetic=True, workers=1)
+    assert stats.units == 50 and stats.battles == 100
+    assert stats.difference() == 0.0
+
+
+def test_results_ignore_the_worker_count():
+    tweak = parse_variant([0, 1, 2], None, ["TB.attack=350,400"])
+    a = compare(Variant(), tweak, 60, seed=4, workers=1, chunk_size=20)
+    b = compare(Variant(), tweak, 60, seed=4, workers=2, chunk_size=20)
+    assert (a.diff, a.a, a.b) == (b.diff, b.a, b.b)
+
+
+def test_parse_variant():
+    variant = parse_variant([0, 1, 2], None, ["RW.max_hp=1400", "EA.attack=90,140"])
+    rw = next(p for p in variant.prototypes if p.shortname == "RW")
+    assert rw.max_hp == rw.hp == 1400
+    assert variant.attack_ranges["EA"] == (90, 140) and variant.player == [0, 1, 2]
+    for bad in (["RW.luck=3"], ["XX.max_hp=3"], ["RW-max_hp"]):
+        with pytest.raises(ValueError):
+            parse_variant(None, None, bad)
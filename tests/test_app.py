@@ -0,0 +1,45 @@
+# tests/test_app.py
+import os
+
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label.startswith(label))
+
+
+def test_quick_battle_confirm_and_undo():
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    assert not at.exception
+    button(at, "Start Quick").click().run()
+    assert not at.exception
+    engine = at.session_state.engine
+    assert engine.round_number == 1
+
+    button(at, "Confirm").click().run()
+    assert not at.exception and not at.error
+    assert at.session_state.engine.round_number == 2
+    assert len(at.session_state.history) == 1
+
+    button(at, "Undo").click().run()
+    assert not at.exception
+    assert at.session_state.engine.round_number == 1
+    assert not at.session_state.history
+
+
+def test_fast_forward_then_undo():
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    button(at, "Start Quick").click().run()
+    button(at, "Fast-forward").click().run()
+    assert not at.exception
+    engine = at.session_state.engine
+    assert engine.is_over()
+    assert len(at.session_state.history) == engine.round_number - 1
+    rounds = engine.round_number
+    button(at, "Undo").click().run()
+    assert not at.exception
+    assert at.session_state.engine.round_number == rounds - 1
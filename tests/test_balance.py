@@ -0,0 +1,77 @@
+# tests/test_balance.py
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import balance
+from balance import PARAM_SPACE, build, deviation, evaluate, propose, stock_params, tune
+from characters import ATTACK_RANGES, create_all_character_prototypes
+from simulate import BatchResult
+
+STAGES = (256, 512)
+
+
+def result_with(rates, n=1000):
+    result = BatchResult()
+    for sn, p in rates.items():
+        result.char_battles[sn] = n
+        result.char_wins[sn] = round(p * n)
+    return result
+
+
+def test_deviation_and_its_lower_bound():
+    result = result_with({"RW": 0.5, "EA": 0.42, "TB": 0.55})
+    assert deviation(result) == pytest.approx(0.08)
+    assert deviation(result, z=1.0) == pytest.approx(0.08 - (0.42 * 0.58 / 1000) ** 0.5)
+    assert deviation(result, z=100.0) == 0.0
+
+
+def test_stock_params_build_the_stock_characters():
+    protos, ranges = build(stock_params())
+    for built, stock in zip(protos, create_all_character_prototypes()):
+        assert built.get_state() == stock.get_state()
+    assert ranges == {sn: ATTACK_RANGES[sn] for sn in ranges}
+
+
+def test_propose_nudges_one_stat_toward_fifty_percent():
+    params = stock_params()
+    rates = {"RW": 0.5, "EA": 0.40, "TB": 0.65, "CA": 0.45, "QK": 0.5}
+    rng = random.Random(0)
+    for _ in range(50):
+        candidate, _ = propose(params, rates, rng, 0.03)
+        changed = [(sn, stat) for sn in params for stat in params[sn] if candidate[sn][stat] != params[sn][stat]]
+        assert len(changed) == 1
+        sn, stat = changed[0]
+        low, high, _ = PARAM_SPACE[stat]
+        assert low <= candidate[sn][stat] <= high
+        up = candidate[sn][stat] > params[sn][stat]
+        assert up == (rates[sn] < 0.5)
+
+
+def test_racing_drops_a_hopeless_candidate_after_one_stage():
+    result, finished = evaluate(stock_params(), STAGES, (0, 1), best=0.0)
+    assert not finished and result.battles == STAGES[0]
+    result, finished = evaluate(stock_params(), STAGES, (0, 1))
+    assert finished and result.battles == sum(STAGES)
+
+
+def test_tune_returns_the_best_set_it_found(tmp_path):
+    out = tmp_path / "tuned.json"
+    lines = []
+    params, result = tune(stages=STAGES, max_candidates=4, seed=1, out=str(out), log=lines.append)
+    assert result.battles >= sum(STAGES)
+    assert lines[0].startswith("start") and lines[-1].startswith("4 candidates")
+    assert set(params) == set(stock_params())
+
+
+def test_failed_challenge_re_runs_the_incumbent(monkeypatch):
+    # a no-op candidate ties the incumbent on common seeds, so it never replaces it; the incumbent's
+    # re-run on those seeds is merged into its result instead
+    monkeypatch.setattr(balance, "propose", lambda params, rates, rng, tolerance: (params, "no-op"))
+    lines = []
+    params, result = tune(stages=STAGES, max_candidates=2, seed=1, log=lines.append)
+    assert params == stock_params()
+    assert result.battles == 3 * sum(STAGES)
+    assert not any(line.startswith("#") for line in lines)
@@ -0,0 +1,70 @@
+# tests/test_battlelog.py
+import pytest
+
+from battlelog import ATTACK, ROUND, BattleLog, NullLog, RingLog, make_log, render
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+
+
+def fill(log, start, stop):
+    for i in range(start, stop):
+        log.add(ROUND, amount=i)
+
+
+def test_events_render_on_read():
+    assert render((ATTACK, "[YOU]", "RW", "TB", 250, " (CRIT)")) == "[YOU] RW attacks TB for 250 (CRIT)."
+    log = BattleLog()
+    fill(log, 1, 4)
+    assert log.tail(2) == ["--- Round 2 ---", "--- Round 3 ---"]
+    assert list(log) == ["--- Round 1 ---", "--- Round 2 ---", "--- Round 3 ---"]
+
+
+def test_ring_keeps_the_last_events():
+    log = RingLog(size=5)
+    fill(log, 0, 12)
+    assert len(log) == 5
+    assert log.tail(10) == [f"--- Round {i} ---" for i in range(7, 12)]
+    log.clear()
+    assert len(log) == 0
+
+
+def test_off_mode_drops_everything():
+    log = make_log("off")
+    assert isinstance(log, NullLog)
+    fill(log, 0, 3)
+    assert len(log) == 0 and log.tail(5) == []
+    log.rewind(log.mark())
+
+
+@pytest.mark.parametrize("mode", ["full", "ring"])
+def test_mark_and_rewind(mode):
+    log = make_log(mode, size=8)
+    fill(log, 0, 20)
+    mark = log.mark()
+    before = log.tail(100)
+    fill(log, 20, 25)
+    log.rewind(mark)
+    assert log.tail(100) == before
+    fill(log, 30, 32)
+    assert log.tail(2) == ["--- Round 30 ---", "--- Round 31 ---"]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        make_log("verbose")
+
+
+def test_engine_log_modes_agree():
+    protos = create_all_character_prototypes()
+    logs = {}
+    for mode in ("full", "ring", "off"):
+        engine = BattleEngine(protos, protos, seed=4, log_mode=mode, log_size=10)
+        engine.start_battle([0, 1, 2], [2, 3, 4])
+        for _ in range(4):
+            engine.submit_actions("player", engine.choose_ai_actions("player"))
+            engine.submit_actions("cpu", engine.choose_ai_actions("cpu"))
+            engine.resolve_round()
+        logs[mode] = engine.get_log(10 ** 6)
+    assert len(logs["full"]) > 10
+    assert logs["ring"] == logs["full"][-10:]
+    assert logs["off"] == []
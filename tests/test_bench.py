@@ -0,0 +1,27 @@
+# tests/test_bench.py
+from bench import BASELINE_CHARACTER_FIELDS, compare, direction
+from characters import create_all_character_prototypes
+
+
+def test_metric_directions():
+    assert direction("resolve_round_us") == direction("clone_instance_bytes") == -1
+    assert direction("battles_per_sec") == direction("clone_speedup") == 1
+    assert direction("rounds") == 0
+
+
+def test_compare_flags_only_wrong_way_moves_past_the_threshold():
+    baseline = {"engine": {"resolve_round_us": 100.0, "battles_per_sec": 1000.0, "rounds": 5}}
+    results = {"engine": {"resolve_round_us": 115.0, "battles_per_sec": 1200.0, "rounds": 9},
+               "new": {"x_us": 1.0}}
+    rows = {metric: (change, regressed) for _, metric, _, _, change, regressed in
+            compare(results, baseline, 0.10)}
+    assert set(rows) == {"resolve_round_us", "battles_per_sec"}
+    assert rows["resolve_round_us"][1] and not rows["battles_per_sec"][1]
+    assert not any(r for _, _, _, _, _, r in compare(results, baseline, 0.20))
+
+
+def test_clone_baseline_uses_the_original_character_fields():
+    # the dict-based baseline must not pick up slots added with __slots__ and the team indexes
+    proto = create_all_character_prototypes()[0]
+    assert all(hasattr(proto, name) for name in BASELINE_CHARACTER_FIELDS)
+    assert not {"team_index", "team_slot", "_stunned"} & set(BASELINE_CHARACTER_FIELDS)
@@ -0,0 +1,73 @@
+# tests/test_characters.py
+import pytest
+
+from characters import Character, TeamIndex, create_all_character_prototypes
+from engine import clone_character
+
+
+def test_characters_have_no_instance_dict():
+    proto = create_all_character_prototypes()[0]
+    assert not hasattr(proto, "__dict__")
+    with pytest.raises(AttributeError):
+        proto.not_a_field = 1
+
+
+def test_clone_copies_every_field_and_is_independent():
+    proto = create_all_character_prototypes()[4]
+    proto.hp = 123
+    proto.stunned = True
+    proto.last_status_move = "kings_command"
+    proto.team_speed_buff_turns = 2
+    clone = clone_character(proto)
+    assert type(clone) is Character and clone is not proto
+    for name in Character.__slots__:
+        assert getattr(clone, name) == getattr(proto, name), name
+    clone.hp = 1
+    clone.stunned = False
+    assert proto.hp == 123 and proto.stunned
+
+
+def indexed_team():
+    team = [clone_character(p) for p in create_all_character_prototypes()[:3]]
+    return team, TeamIndex(team)
+
+
+def test_team_index_follows_deaths_and_revivals():
+    team, index = indexed_team()
+    assert index.alive == (0, 1, 2)
+    team[1].take_damage(10 ** 6)
+    assert index.alive == (0, 2)
+    team[1].heal_amount(50)
+    assert index.alive == (0, 1, 2)
+    assert index.lowest() is team[1]
+
+
+def test_team_index_unstunned_and_lowest():
+    team, index = indexed_team()
+    assert index.lowest() is team[1]          # EA has the least HP
+    team[0].take_damage(team[0].hp - 5)
+    assert index.lowest() is team[0]
+    team[2].stunned = True
+    assert index.unstunned() == (0, 1)
+    team[2].stunned = False
+    assert index.unstunned() == (0, 1, 2)
+
+
+def test_engine_indexes_match_a_rescan():
+    from engine import BattleEngine
+
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=5)
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    snap = engine.snapshot()
+    while not engine.is_over():
+        engine.submit_actions("player", engine.choose_ai_actions("player"))
+        engine.submit_actions("cpu", engine.choose_ai_actions("cpu"))
+        engine.resolve_round()
+        for side in ("player", "cpu"):
+            team = engine.team_for(side)[0]
+            index = engine.index_for(side)
+            assert index.alive == tuple(i for i, c in enumerate(team) if c.is_alive())
+            assert index.unstunned() == tuple(i for i, c in enumerate(team) if c.is_alive() and not c.stunned)
+    engine.restore(snap)
+    assert engine.player_index.alive == engine.cpu_index.alive == (0, 1, 2)
@@ -0,0 +1,61 @@
+# tests/test_effects.py
+from characters import TeamIndex, create_all_character_prototypes
+from effects import EffectScheduler, turns_left_in
+
+
+def team():
+    members = [p.clone() for p in create_all_character_prototypes()[:3]]
+    TeamIndex(members)
+    return members
+
+
+def test_effect_runs_for_its_turns_then_expires():
+    rw, ea, _ = team()
+    effects = EffectScheduler()
+    effects.add(rw, "crit_immune_turns", 2)
+    assert effects.active(rw) == {"crit_immune_turns": 2}
+    effects.end_round()
+    assert rw.crit_immune_turns > 0 and effects.turns_left(rw, "crit_immune_turns") == 1
+    effects.end_round()
+    assert rw.crit_immune_turns == 0 and effects.active(rw) == {} and len(effects) == 0
+    assert ea.crit_immune_turns == 0
+
+
+def test_linked_fields_expire_together():
+    _, _, tb = team()
+    effects = EffectScheduler()
+    tb.team_speed_bonus = 10
+    effects.add(tb, "team_speed_buff_turns", 1)
+    effects.end_round()
+    assert tb.team_speed_buff_turns == 0 and tb.team_speed_bonus == 0
+
+
+def test_reapplying_restarts_and_skips_the_stale_entry():
+    rw, _, _ = team()
+    effects = EffectScheduler()
+    effects.add(rw, "damage_buff_turns", 2)
+    effects.end_round()
+    effects.add(rw, "damage_buff_turns", 2)      # the first application would end this round
+    effects.end_round()
+    assert rw.damage_buff_turns > 0 and effects.turns_left(rw, "damage_buff_turns") == 1
+    effects.end_round()
+    assert rw.damage_buff_turns == 0
+
+
+def test_state_round_trip_by_side_and_slot():
+    players, cpus = team(), team()
+    effects = EffectScheduler(round_number=4)
+    effects.add(players[1], "team_crit_buff_turns", 3)
+    effects.add(cpus[2], "resist_buff_turns", 2)
+    state = effects.get_state(players[0].team_index)
+    assert turns_left_in(state, 4, "cpu", 2) == {"resist_buff_turns": 2}
+    assert turns_left_in(state, 5, "player", 1) == {"team_crit_buff_turns": 2}
+
+    restored = EffectScheduler()
+    new_players, new_cpus = team(), team()
+    restored.set_state(state, 4, new_players, new_cpus)
+    assert restored.active(new_players[1]) == {"team_crit_buff_turns": 3}
+    new_cpus[2].resist_buff_turns = 2
+    restored.end_round()
+    restored.end_round()
+    assert new_cpus[2].resist_buff_turns == 0
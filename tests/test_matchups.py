@@ -0,0 +1,35 @@
+# tests/test_matchups.py
+from characters import create_all_character_prototypes
+from matchups import compositions, format_matrix, format_rankings, pairing_key, run_matrix, wilson_interval
+
+
+def test_compositions_and_wilson_interval():
+    comps = compositions(5)
+    assert len(comps) == 10 and comps[0] == (0, 1, 2)
+    low, high = wilson_interval(50, 100)
+    assert low < 0.5 < high and abs((low + high) / 2 - 0.5) < 1e-9
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_pairing_key_follows_the_characters_involved():
+    protos = create_all_character_prototypes()
+    settings = (10, 0, "cpu", "cpu", 500)
+    key = pairing_key(protos, (0, 1, 2), (2, 3, 4), settings)
+    assert key == pairing_key(protos, (0, 1, 2), (2, 3, 4), settings)
+    assert key != pairing_key(protos, (0, 1, 2), (2, 3, 4), (11,) + settings[1:])
+    protos[3].max_hp += 1
+    assert key != pairing_key(protos, (0, 1, 2), (2, 3, 4), settings)
+    assert pairing_key(protos, (0, 1, 2), (0, 1, 2), settings) == pairing_key(
+        create_all_character_prototypes(), (0, 1, 2), (0, 1, 2), settings)
+
+
+def test_run_matrix_plays_and_caches(tmp_path):
+    cache = str(tmp_path / "cache.json")
+    comps, cells, computed = run_matrix(2, workers=1, seed=1, cache_path=cache)
+    assert computed == len(comps) ** 2
+    assert all(cell["battles"] == 2 for row in cells for cell in row)
+    protos = create_all_character_prototypes()
+    assert format_matrix(protos, comps, cells) and format_rankings(protos, comps, cells)
+
+    again = run_matrix(2, workers=1, seed=1, cache_path=cache)
+    assert again[2] == 0 and again[1] == cells
@@ -0,0 +1,94 @@
+# tests/test_mcts.py
+import gc
+import time
+
+import pytest
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from mcts import MCTSPlayer, legal_actions
+
+
+def mid_battle(seed=3, **kwargs):
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=seed, **kwargs)
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    for _ in range(2):
+        engine.submit_actions("player", engine.choose_ai_actions("player"))
+        engine.submit_actions("cpu", engine.choose_ai_actions("cpu"))
+        engine.resolve_round()
+    return engine
+
+
+def test_decision_stays_within_budget():
+    engine = mid_battle()
+    player = MCTSPlayer(time_budget=0.05, seed=1)
+    for _ in range(3):
+        t0 = time.perf_counter()
+        player.choose_actions(engine, "cpu")
+        assert time.perf_counter() - t0 < 0.05 + 0.05
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_parallel_decisions_stay_within_budget(workers):
+    # the worker pool starts with the player, not on the clock of its first decision, and the pool
+    # round trip comes out of the budget rather than on top of it
+    engine = mid_battle()
+    with MCTSPlayer(time_budget=0.05, workers=workers, seed=1) as player:
+        for _ in range(10):
+            t0 = time.perf_counter()
+            actions = player.choose_actions(engine, "cpu")
+            assert time.perf_counter() - t0 <= 0.05
+            for idx, action in enumerate(actions):
+                assert action in legal_actions(engine, "cpu", idx)
+
+
+def test_pool_is_shut_down_on_exit_and_when_discarded():
+    with MCTSPlayer(workers=2) as player:
+        procs = list(player._pool._pool)
+    assert player._pool is None and not any(p.is_alive() for p in procs)
+
+    player = MCTSPlayer(workers=2)
+    procs = list(player._pool._pool)
+    del player
+    gc.collect()
+    assert not any(p.is_alive() for p in procs)
+
+
+def test_search_leaves_the_engine_as_found():
+    engine = mid_battle()
+    before = engine.snapshot()
+    log = engine.get_log(10 ** 6)
+    teams = engine.player_team, engine.cpu_team
+    actions = MCTSPlayer(time_budget=0.05, seed=1).choose_actions(engine, "cpu")
+    after = engine.snapshot()
+    assert after._replace(log_mark=None) == before._replace(log_mark=None)
+    assert engine.get_log(10 ** 6) == log
+    assert (engine.player_team, engine.cpu_team) == teams
+    assert gc.isenabled()
+    for idx, action in enumerate(actions):
+        assert action in legal_actions(engine, "cpu", idx)
+
+
+def test_seeded_iteration_capped_search_is_reproducible():
+    picks = [MCTSPlayer(time_budget=5.0, iterations=60, seed=7).choose_actions(mid_battle(), "player")
+             for _ in range(2)]
+    assert picks[0] == picks[1]
+
+
+def test_difficulty_selects_the_opponent():
+    protos = create_all_character_prototypes()
+    assert BattleEngine(protos, protos, difficulty="normal").cpu_ai is None
+    assert isinstance(BattleEngine(protos, protos, difficulty="hard").cpu_ai, MCTSPlayer)
+    with pytest.raises(ValueError):
+        BattleEngine(protos, protos, difficulty="impossible")
+
+
+def test_hard_battles_finish():
+    engine = mid_battle(difficulty="hard")
+    engine.cpu_ai.time_budget = 0.01
+    while not engine.is_over() and engine.round_number < 60:
+        engine.submit_actions("player", engine.choose_ai_actions("player"))
+        engine._choose_cpu_actions()
+        engine.resolve_round()
+    assert engine.round_number > 3
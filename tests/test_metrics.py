@@ -0,0 +1,45 @@
+# tests/test_metrics.py
+import json
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from metrics import Metrics
+from simulate import play_battle, run_batch
+
+
+def test_lap_count_merge_and_export():
+    a = Metrics()
+    t = a.lap("phase", a.clock())
+    a.lap("phase", t)
+    a.count("events")
+    a.count("events", 2)
+    b = Metrics()
+    b.count("events")
+    b.lap("other", b.clock())
+    a.merge(b)
+    snap = a.snapshot()
+    assert snap["counters"] == {"events": 4}
+    assert snap["timers"]["phase"]["calls"] == 2 and snap["timers"]["other"]["calls"] == 1
+    assert json.loads(a.to_json()) == snap
+    a.reset()
+    assert a.snapshot() == {"timers": {}, "counters": {}}
+
+
+def test_engine_metrics_count_rounds_and_leave_battles_unchanged():
+    protos = create_all_character_prototypes()
+    plain = BattleEngine(protos, protos, seed=6)
+    timed = BattleEngine(protos, protos, seed=6, metrics=True)
+    assert plain.metrics is None
+    results = [play_battle(e, [0, 1, 2], [2, 3, 4]) for e in (plain, timed)]
+    assert results[0] == results[1]
+    assert plain.get_log(10 ** 6) == timed.get_log(10 ** 6)
+    counters = timed.metrics.snapshot()["counters"]
+    assert counters["rounds"] == results[1][1]
+    assert counters["ai_decisions"] >= 2 * 3
+    assert "actions" in timed.metrics.timers and "choose_ai_actions" in timed.metrics.timers
+
+
+def test_batch_metrics_merge_across_chunks():
+    result = run_batch(60, workers=1, chunk_size=20, seed=2, metrics=True)
+    assert result.metrics.counters["rounds"] == result.rounds
+    assert run_batch(20, workers=1, seed=2).metrics is None
@@ -0,0 +1,92 @@
+# tests/test_moves.py
+import pytest
+
+from characters import ATTACK_RANGES, create_all_character_prototypes
+import moves
+from moves import DEFAULT_KIT, ENEMY, MOVE_IDS, MOVE_LIST, MOVES, MOVES_BY_ID, ai_table, kit_actions, kit_for
+
+
+def test_move_ids_are_dense_and_stable():
+    assert [m.move_id for m in MOVE_LIST] == list(range(len(MOVE_LIST)))
+    assert MOVES_BY_ID[MOVE_IDS["attack"]] == "attack"
+    # replays and the NumPy engine store these ids
+    assert (MOVE_IDS["attack"], MOVE_IDS["heal_single"], MOVE_IDS["heal_all"], MOVE_IDS["none"]) == (0, 11, 12, 13)
+
+
+def test_every_character_has_a_consistent_kit():
+    for proto in create_all_character_prototypes():
+        kit = kit_for(proto.shortname)
+        assert kit is not DEFAULT_KIT and proto.shortname in ATTACK_RANGES
+        assert len(kit.specials) == 2
+        for name in kit.specials:
+            assert MOVES[name].status and not MOVES[name].heal
+        for table in (kit.ai_weights, kit.ai_weights_no_heal):
+            assert sum(p for _, p in table) < 1
+            assert all(name in kit.specials for name, _ in table)
+
+
+def test_unknown_characters_only_attack():
+    kit = kit_for("??")
+    assert kit.specials == () and kit.ai_weights == ()
+
+
+def test_status_moves_cannot_repeat():
+    from engine import BattleEngine
+
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=1)
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    engine.player_team[0].last_status_move = "ruby_shield"
+    ok, msg = engine.set_player_actions([("ruby_shield", None), ("attack", 0), ("attack", 0)])
+    assert not ok and "twice in a row" in msg
+    assert engine.set_player_actions([("heroic_raise", None), ("attack", 0), ("attack", 0)]) == (True, "ok")
+
+
+def test_ai_table_drops_the_last_status_move_and_renormalizes():
+    kit = kit_for("EA")
+    names, thresholds = ai_table(kit, True)
+    assert names == ("arrow_shower", "sharp_aim") and thresholds == pytest.approx((0.25, 0.45))
+    names, thresholds = ai_table(kit, True, "arrow_shower")
+    # P(sharp_aim | not arrow_shower) = 0.20 / 0.75
+    assert names == ("sharp_aim",) and thresholds == pytest.approx((0.20 / 0.75,))
+    assert ai_table(kit, True, "arrow_shower") is ai_table(kit, True, "arrow_shower")
+
+
+def test_cpu_ai_never_repeats_a_status_move():
+    from engine import BattleEngine
+
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=2)
+    engine.start_battle([0, 1, 3], [2, 3, 4])
+    for actor in engine.cpu_team:
+        actor.last_status_move = kit_for(actor.shortname).specials[0]
+    for _ in range(300):
+        for actor, (name, _) in zip(engine.cpu_team, engine.choose_ai_actions("cpu")):
+            assert name != actor.last_status_move
+
+
+@pytest.mark.parametrize("shortname, last, heal", [("EA", None, True), ("TB", "shiny_flex", True),
+                                                   ("CA", "heal_single", True), ("QK", None, False)])
+def test_kit_actions_spell_out_moves_per_target(shortname, last, heal):
+    kit = kit_for(shortname)
+    targets = (0, 2, 5)
+    expected = [("attack", t) for t in targets]
+    for name in kit.specials:
+        if name != last:
+            expected += [(name, t) for t in targets] if MOVES[name].targeting == ENEMY else [(name, None)]
+    if heal:
+        expected += [("heal_all", None)] * (last != "heal_all")
+        expected += [("heal_single", i) for i in range(3)] * (last != "heal_single")
+    actions = kit_actions(kit, last, targets, heal, 3)
+    assert list(actions) == expected and len(actions) == len(expected)
+    candidates = {(m.name, p) for m in MOVE_LIST for p in (None, 0, 1, 2, 3, 5, 6)}
+    assert {a for a in candidates if a in actions} == set(expected)
+
+
+def test_kit_actions_are_not_memoized_per_target_list():
+    kit = kit_for("TB")
+    kit_actions(kit, None, (0, 1), True, 3)
+    size = len(moves._KIT_MOVES)
+    for n in range(2, 50):
+        kit_actions(kit, None, tuple(range(n)), True, 3)
+    assert len(moves._KIT_MOVES) == size
@@ -0,0 +1,63 @@
+# tests/test_policies.py
+import pytest
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from policies import POLICIES, random_policy, register_policy
+
+
+def test_random_policy_obeys_the_status_repeat_rule():
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=4)
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    while not engine.is_over():
+        actions = random_policy(engine, "player")
+        ok, msg = engine.set_player_actions(list(actions))
+        assert ok, msg
+        engine._choose_cpu_actions()
+        engine.resolve_round()
+
+
+def test_random_policy_replays_from_the_seed():
+    protos = create_all_character_prototypes()
+    winners = []
+    for _ in range(2):
+        engine = BattleEngine(protos, protos, seed=5)
+        engine.start_battle([0, 1, 2], [2, 3, 4])
+        winners.append((engine.play_until_end("random", "cpu"), engine.get_log(10 ** 6)))
+    assert winners[0] == winners[1]
+
+
+def test_register_policy():
+    def always_cpu(engine, side):
+        return engine.choose_ai_actions(side)
+
+    try:
+        assert register_policy("always_cpu", always_cpu) is always_cpu
+        register_policy("always_cpu", always_cpu)
+        with pytest.raises(ValueError):
+            register_policy("always_cpu", lambda engine, side: None)
+    finally:
+        POLICIES.pop("always_cpu", None)
+
+
+def test_mcts_policy_is_seeded_from_the_engine(monkeypatch):
+    import mcts
+    import policies
+    from policies import mcts_policy
+
+    # a fixed iteration count instead of the time budget, so only the seed decides the search
+    monkeypatch.setitem(mcts.DIFFICULTIES, "hard", {"time_budget": 60, "iterations": 40})
+    protos = create_all_character_prototypes()
+    picks = []
+    for _ in range(2):
+        engine = BattleEngine(protos, protos, seed=6)
+        engine.start_battle([0, 1, 2], [2, 3, 4])
+        picks.append([mcts_policy(engine, "player") for _ in range(3)])
+    assert picks[0] == picks[1]
+
+    # a search CPU is reused rather than shadowed by a second player
+    engine = BattleEngine(protos, protos, seed=6, difficulty="hard")
+    engine.start_battle([0, 1, 2], [2, 3, 4])
+    mcts_policy(engine, "player")
+    assert engine not in policies._mcts_players
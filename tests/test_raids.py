@@ -0,0 +1,83 @@
+# tests/test_raids.py
+import random
+
+import pytest
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine, random_team_indices
+from simulate import run_batch
+
+
+def raid(n_player, n_cpu, seed=0):
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=seed)
+    engine.start_battle([i % 5 for i in range(n_player)], [(i + 2) % 5 for i in range(n_cpu)])
+    return engine
+
+
+def check_indexes(engine):
+    for side in ("player", "cpu"):
+        team = engine.team_for(side)[0]
+        index = engine.index_for(side)
+        assert index.alive == tuple(i for i, c in enumerate(team) if c.is_alive())
+        assert index.protectors() == [i for i, c in enumerate(team) if c.is_alive() and c.take_hit_for_qk]
+        low = index.lowest()
+        assert low is None or low.hp == min(c.hp for c in team if c.is_alive())
+
+
+def test_uneven_raid_plays_to_the_end_with_consistent_indexes():
+    engine = raid(7, 4)
+    assert (len(engine.player_team), len(engine.cpu_team)) == (7, 4)
+    while not engine.is_over() and engine.round_number < 300:
+        engine.submit_actions("player", engine.choose_ai_actions("player"))
+        engine.submit_actions("cpu", engine.choose_ai_actions("cpu"))
+        engine.resolve_round()
+        check_indexes(engine)
+    assert engine.is_over()
+
+
+def test_raid_snapshot_restore_replays_identically():
+    engine = raid(20, 20, seed=3)
+    engine.play_until_end(max_rounds=3)
+    snap = engine.snapshot()
+    first = engine.play_until_end()
+    log = engine.get_log(10 ** 6)
+    engine.restore(snap)
+    check_indexes(engine)
+    assert engine.play_until_end() == first
+    assert engine.get_log(10 ** 6) == log
+
+
+def test_random_team_indices_repeat_only_past_the_roster():
+    rng = random.Random(1)
+    assert sorted(random_team_indices(rng, 5, 5)) == [0, 1, 2, 3, 4]
+    big = random_team_indices(rng, 5, 40)
+    assert len(big) == 40 and set(big) <= set(range(5))
+
+
+def test_random_cpu_team_matches_the_player_team_size():
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=2)
+    engine.start_battle([0, 0, 1, 1, 2, 2, 3, 3])
+    assert len(engine.cpu_team) == 8
+
+
+def test_batch_with_larger_teams():
+    result = run_batch(40, workers=1, seed=5, team_size=6)
+    assert result.battles == 40
+    assert sum(result.char_battles.values()) == 40 * 12
+
+
+def test_random_policy_on_a_raid_does_not_enumerate_targets(monkeypatch):
+    from moves import ActorActions
+    from policies import random_policy
+
+    engine = raid(1000, 1000, seed=4)
+    monkeypatch.setattr(ActorActions, "__iter__", lambda self: pytest.fail("enumerated a raid actor's actions"))
+    for _ in range(3):
+        actions = random_policy(engine, "player")
+        legal = engine.legal_actions("player")
+        assert all(a in actions_i for a, actions_i in zip(actions, legal))
+        engine.submit_actions("player", actions)
+        engine.submit_actions("cpu", engine.choose_ai_actions("cpu"))
+        engine.resolve_round()
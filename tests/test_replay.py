@@ -0,0 +1,63 @@
+# tests/test_replay.py
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from replay import Replay, ReplayReader, ReplayWriter, decode, decode_action, encode, encode_action, replay
+from simulate import play_battle, run_batch
+
+
+def recorded_battle(seed, policy="cpu"):
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, seed=seed)
+    rounds = []
+    winner, _ = play_battle(engine, [0, 1, 2], [2, 3, 4], policy, "cpu", record=rounds)
+    return Replay(seed, False, (0, 1, 2), (2, 3, 4), tuple(rounds), winner), engine
+
+
+def test_action_codes_round_trip():
+    for action in (None, ("none", None), ("attack", 0), ("heal_single", 2), ("heroic_raise", None),
+                   ("attack", 200)):
+        assert decode_action(encode_action(action)) == action
+
+
+def test_encode_decode_round_trip():
+    rec, _ = recorded_battle(3)
+    decoded = decode(encode(rec))
+    assert decoded.seed == rec.seed
+    assert decoded.player == rec.player and decoded.cpu == rec.cpu
+    assert decoded.winner == rec.winner
+    assert [tuple(map(tuple, r)) for r in decoded.rounds] == [tuple(map(tuple, r)) for r in rec.rounds]
+
+
+def test_replay_reproduces_log():
+    for seed, policy in ((5, "cpu"), (6, "random")):
+        rec, engine = recorded_battle(seed, policy)
+        again = replay(decode(encode(rec)))
+        assert again.get_log(10 ** 6) == engine.get_log(10 ** 6)
+        assert again.winner() == engine.winner()
+
+
+def test_writer_reader_and_torn_record(tmp_path):
+    path = str(tmp_path / "battles.rpl")
+    recs = [recorded_battle(seed)[0] for seed in range(4)]
+    with ReplayWriter(path) as writer:
+        for rec in recs:
+            writer.write(rec)
+    with open(path, "ab") as f:
+        f.write(b"\x40\x01\x02")       # a record cut short by a crash
+    with ReplayWriter(path) as writer:
+        writer.write(recs[0])
+    with ReplayReader(path) as reader:
+        assert len(reader) == 5
+        assert [r.seed for r in reader] == [0, 1, 2, 3, 0]
+        assert reader[-1].winner == recs[0].winner
+
+
+def test_batch_recording_replays_every_battle(tmp_path):
+    path = str(tmp_path / "batch.rpl")
+    result = run_batch(30, workers=1, chunk_size=10, seed=8, replay_path=path)
+    with ReplayReader(path) as reader:
+        assert len(reader) == 30
+        winners = [rec.winner for rec in reader]
+        assert sum(w == "player" for w in winners) == result.wins["player"]
+        engine = replay(reader[17], log_mode="off")
+        assert (engine.winner() or "draw") == winners[17]
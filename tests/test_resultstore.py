@@ -0,0 +1,57 @@
+# tests/test_resultstore.py
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from resultstore import ResultStore
+from simulate import run_batch
+
+
+def test_store_matches_batch_result(tmp_path):
+    path = str(tmp_path / "store")
+    result = run_batch(600, workers=1, chunk_size=200, seed=11, store_path=path)
+    store = ResultStore(path, mode="r")
+    assert len(store) == 600
+    assert {sn: w / n for sn, (w, n) in store.win_rates().items()} == result.char_win_rates()
+    assert int((store.column("winner") == 0).sum()) == result.wins["player"]
+    assert int(store.totals("rounds")) == result.rounds
+
+
+def test_stored_tallies_are_per_battle(tmp_path):
+    # each row keeps its own battle's damage, not the engine's latest tally
+    path = str(tmp_path / "store")
+    run_batch(50, workers=1, seed=3, store_path=path)
+    damage = np.asarray(ResultStore(path, mode="r").column("damage"))
+    assert len({row.tobytes() for row in damage}) > 1
+
+
+def test_append_reopen_and_truncate_uncommitted(tmp_path):
+    path = str(tmp_path / "store")
+    run_batch(100, workers=1, seed=1, store_path=path)
+    store = ResultStore(path)
+    committed = {name: np.array(store.column(name)) for name in store.columns}
+    rows_bytes = {name: os.path.getsize(store._file(name)) for name in store.columns}
+
+    # an append that wrote some column bytes but crashed before committing meta.json
+    for name in store.columns:
+        with open(store._file(name), "ab") as f:
+            f.write(b"\x01" * 7)
+    reopened = ResultStore(path)
+    assert len(reopened) == 100
+    for name in store.columns:
+        assert os.path.getsize(reopened._file(name)) == rows_bytes[name]
+        assert np.array_equal(reopened.column(name), committed[name])
+
+    run_batch(40, workers=1, seed=2, store_path=path)
+    assert len(ResultStore(path, mode="r")) == 140
+
+
+def test_read_only_and_bad_batches(tmp_path):
+    path = str(tmp_path / "store")
+    with pytest.raises(FileNotFoundError):
+        ResultStore(path, mode="r")
+    store = ResultStore(path)
+    with pytest.raises(ValueError):
+        store.append({"winner": np.zeros(3)})
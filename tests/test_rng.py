@@ -0,0 +1,66 @@
+# tests/test_rng.py
+import random
+
+import pytest
+
+from rng import AntitheticBufferedRandom, AntitheticRandom, BufferedRandom, SeedSequence, make_rng
+
+
+def test_seed_sequence_spawn_is_deterministic_and_distinct():
+    a = [c.seed() for c in SeedSequence(5).spawn(4)]
+    b = [c.seed() for c in SeedSequence(5).spawn(4)]
+    assert a == b and len(set(a)) == 4
+    root = SeedSequence(5)
+    first, second = root.spawn(2), root.spawn(2)
+    assert {c.seed() for c in first}.isdisjoint(c.seed() for c in second)
+    assert SeedSequence(6).seed() != SeedSequence(5).seed()
+
+
+def test_buffered_random_dice_stay_in_range():
+    rng = BufferedRandom(1, block_size=16)
+    rolls = [rng.randint(3, 7) for _ in range(500)]
+    assert min(rolls) == 3 and max(rolls) == 7
+
+
+def test_buffered_random_state_round_trip():
+    rng = BufferedRandom(2, block_size=16)
+    for _ in range(5):
+        rng.randint(1, 100)
+    state = rng.getstate()
+    first = [rng.randint(1, 100) for _ in range(40)] + [rng.random()]
+    rng.setstate(state)
+    assert [rng.randint(1, 100) for _ in range(40)] + [rng.random()] == first
+
+
+@pytest.mark.parametrize("buffered", [False, True])
+def test_make_rng_is_reproducible(buffered):
+    seed = SeedSequence(9)
+    a, b = make_rng(seed, buffered), make_rng(seed, buffered)
+    assert [a.randint(1, 6) for _ in range(20)] == [b.randint(1, 6) for _ in range(20)]
+    assert isinstance(a, BufferedRandom) == buffered
+
+
+def test_antithetic_streams_mirror_the_plain_ones():
+    plain, mirror = random.Random(3), AntitheticRandom(3)
+    for _ in range(50):
+        assert mirror.random() == pytest.approx(1.0 - plain.random())
+    plain, mirror = random.Random(4), AntitheticRandom(4)
+    assert [mirror.randint(1, 100) for _ in range(50)] == [101 - plain.randint(1, 100) for _ in range(50)]
+    assert isinstance(make_rng(5, True, True), AntitheticBufferedRandom)
+    rolls = [make_rng(5, True, True).randint(1, 6) for _ in range(3)]
+    assert all(1 <= r <= 6 for r in rolls)
+
+
+def test_antithetic_reseed_changes_the_battle():
+    from characters import create_all_character_prototypes
+    from engine import BattleEngine
+
+    protos = create_all_character_prototypes()
+    logs = []
+    for flip in (False, True, False):
+        engine = BattleEngine(protos, protos)
+        engine.reseed(11, antithetic=flip)
+        engine.start_battle([0, 1, 2], [2, 3, 4])
+        engine.play_until_end()
+        logs.append(engine.get_log(10 ** 6))
+    assert logs[0] == logs[2] != logs[1]
@@ -0,0 +1,46 @@
+# tests/test_simulate.py
+import pytest
+
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from policies import get_policy
+from simulate import BatchResult, play_battle, run_batch
+
+
+def test_batch_counts_add_up():
+    result = run_batch(300, workers=1, chunk_size=100, seed=1)
+    assert result.battles == 300
+    assert sum(result.wins.values()) == 300
+    assert sum(result.char_battles.values()) == 300 * 6
+    assert all(result.char_wins.get(sn, 0) <= n for sn, n in result.char_battles.items())
+
+
+def test_seeded_batch_ignores_worker_count():
+    a = run_batch(400, workers=1, chunk_size=100, seed=7)
+    b = run_batch(400, workers=2, chunk_size=100, seed=7)
+    assert a.wins == b.wins
+    assert a.char_wins == b.char_wins and a.char_battles == b.char_battles
+    assert a.rounds == b.rounds
+
+
+def test_fixed_teams_and_merge():
+    result = run_batch(50, player_indices=[0, 1, 2], cpu_indices=[2, 3, 4], workers=1, seed=3)
+    assert result.char_battles == {"RW": 50, "EA": 50, "TB": 100, "CA": 50, "QK": 50}
+    merged = BatchResult().merge(result).merge(result)
+    assert merged.battles == 100 and merged.wins["player"] == 2 * result.wins["player"]
+
+
+def test_play_battle_ends_within_the_round_cap():
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos)
+    winner, rounds = play_battle(engine, [0, 1, 2], [2, 3, 4], "cpu", "cpu", max_rounds=5)
+    assert winner in ("player", "cpu", "draw")
+    assert rounds <= 5
+    if winner != "draw":
+        assert engine.is_over()
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        get_policy("nobody")
+    assert get_policy(print) is print
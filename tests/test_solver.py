@@ -0,0 +1,72 @@
+# tests/test_solver.py
+from characters import create_all_character_prototypes
+from engine import BattleEngine
+from solver import Solver, solve
+
+
+def short_protos(hp):
+    protos = create_all_character_prototypes()
+    for p in protos:
+        p.max_hp = p.hp = hp
+    return protos
+
+
+def test_exact_solve_matches_monte_carlo():
+    protos = short_protos(150)
+    out = solve([0], [2], prototypes=protos)
+    assert abs(out.player + out.cpu + out.draw + out.unresolved - 1.0) < 1e-9
+    assert out.unresolved == 0.0 and out.rounds >= 1.0
+
+    engine = BattleEngine(protos, protos, log_mode="off", seed=1)
+    n, wins = 20000, 0
+    for _ in range(n):
+        engine.start_battle([0], [2])
+        engine.play_until_end()
+        wins += engine.winner() == "player"
+    stderr = (out.player * (1 - out.player) / n) ** 0.5
+    assert abs(wins / n - out.player) < 4 * stderr
+
+
+def test_exact_team_solve_matches_monte_carlo():
+    # 2v2: several queued actions per round, so the per-action merging is exercised
+    protos = short_protos(40)
+    out = solve([0, 1], [2, 3], prototypes=protos)
+    assert out.unresolved == 0.0 and abs(out.player + out.cpu + out.draw - 1.0) < 1e-9
+
+    engine = BattleEngine(protos, protos, log_mode="off", seed=6)
+    n, wins = 20000, 0
+    for _ in range(n):
+        engine.start_battle([0, 1], [2, 3])
+        engine.play_until_end()
+        wins += engine.winner() == "player"
+    stderr = (out.player * (1 - out.player) / n) ** 0.5
+    assert abs(wins / n - out.player) < 4 * stderr
+
+
+def test_solver_keeps_its_table_and_restores_the_engine_rng():
+    protos = short_protos(200)
+    engine = BattleEngine(protos, protos, log_mode="off", seed=3)
+    rngs = engine.rng, engine.ai_rng
+    solver = Solver(engine, rolls=2, hp_bucket=25)
+    first = solver.solve([0], [1])
+    states = len(solver.table)
+    assert (engine.rng, engine.ai_rng) == rngs
+    assert solver.solve([0], [1]) == first and len(solver.table) == states
+    assert abs(first.player + first.cpu + first.draw + first.unresolved - 1.0) < 1e-9
+
+
+def test_state_limit_returns_a_partial_result(monkeypatch):
+    import solver as solver_module
+
+    monkeypatch.setattr(solver_module, "PROGRESS_INTERVAL", 0.0)
+    protos = short_protos(200)
+    reports = []
+    solver = Solver(BattleEngine(protos, protos, log_mode="off"), rolls=2, hp_bucket=25, max_states=20,
+                    progress=lambda s: reports.append(s.branches))
+    partial = solver.solve([0], [1])
+    assert solver.stopped and 0.0 < partial.unresolved <= 1.0 and len(solver.table) <= 20
+    assert abs(partial.player + partial.cpu + partial.draw + partial.unresolved - 1.0) < 1e-9
+    assert reports and reports == sorted(reports)
+
+    full = solve([0], [1], rolls=2, hp_bucket=25, prototypes=protos)
+    assert full.unresolved == 0.0 and partial.player <= full.player + 1e-9
@@ -0,0 +1,68 @@
+# tests/test_tournament.py
+import pytest
+
+from rng import SeedSequence
+from tournament import (
+    ELO_K, GLICKO_RD, INITIAL_RATING, Elo, Glicko, Pairing, _play_block, run_tournament, swiss_round,
+)
+
+
+def test_elo_update_is_zero_sum():
+    elo = Elo(["a", "b"])
+    assert elo.expected("a", "b") == 0.5
+    elo.update("a", "b", 1.0)
+    assert elo.rating["a"] == INITIAL_RATING + ELO_K / 2
+    assert elo.rating["a"] + elo.rating["b"] == 2 * INITIAL_RATING
+    elo.update("a", "b", 0.5)
+    assert elo.rating["a"] < INITIAL_RATING + ELO_K / 2     # a draw costs the favourite
+
+
+def test_glicko_moves_ratings_and_shrinks_deviation():
+    glicko = Glicko(["a", "b"], min_rd=100.0)
+    glicko.update("a", "b", 1.0)
+    assert glicko.rating["a"] > INITIAL_RATING > glicko.rating["b"]
+    assert glicko.rating["a"] - INITIAL_RATING == pytest.approx(INITIAL_RATING - glicko.rating["b"])
+    assert glicko.rd["a"] < GLICKO_RD
+    for _ in range(200):
+        glicko.update("a", "b", 0.5)
+    assert glicko.rd["a"] == glicko.rd["b"] == 100.0
+
+
+def test_pairing_stops_on_the_wilson_interval():
+    p = Pairing("a", "b")
+    p.games, p.score = 40, 40.0
+    assert not p.check(min_games=100, max_games=1000, precision=0.01)
+    p.games, p.score = 100, 80.0
+    assert p.check(100, 1000, 0.01) and p.status == "decided"
+    even = Pairing("a", "b")
+    even.games, even.score = 4000, 2000.0
+    assert even.check(100, 10000, 0.03) and even.status == "even"
+    capped = Pairing("a", "b")
+    capped.games, capped.score = 200, 100.0
+    assert capped.check(100, 200, 0.01) and capped.status == "max_games"
+
+
+def test_blocks_are_mirrored_and_reproducible():
+    scores = _play_block(("cpu", "random", 3, SeedSequence(1), 500))
+    assert len(scores) == 6 and set(scores) <= {0.0, 0.5, 1.0}
+    assert scores == _play_block(("cpu", "random", 3, SeedSequence(1), 500))
+
+
+def test_swiss_round_avoids_rematches_and_gives_a_bye():
+    names = ["a", "b", "c"]
+    glicko = Glicko(names)
+    pairs, bye = swiss_round(names, {"a": 1, "b": 1, "c": 0}, glicko, {frozenset(("a", "b"))})
+    assert pairs == [("a", "c")] and bye == "b"
+
+
+def test_small_round_robin():
+    elo, glicko, pairings, points = run_tournament(["cpu", "random"], block_pairs=10, min_games=20,
+                                                   max_games=60, workers=1, seed=3)
+    (p,) = pairings
+    assert p.status != "running" and 20 <= p.games <= 60
+    assert elo.rating["cpu"] > elo.rating["random"]
+    assert sum(points.values()) == 1.0
+    with pytest.raises(ValueError):
+        run_tournament(["cpu", "cpu"])
+    with pytest.raises(ValueError):
+        run_tournament(["cpu", "nobody"])
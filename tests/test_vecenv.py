@@ -0,0 +1,86 @@
+# tests/test_vecenv.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from moves import MOVE_IDS
+from vecenv import N_MOVES, VecBattleEnv
+
+
+def random_legal(env, rng):
+    return (rng.random(env.action_masks().shape) * env.action_masks()).argmax(axis=2)
+
+
+def test_env_steps_with_legal_actions():
+    env = VecBattleEnv(64, seed=0)
+    obs = env.reset()
+    assert obs.shape == (64, env.obs_size)
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(200):
+        mask = env.action_masks()
+        assert mask.any(axis=2).all()      # every slot has a legal action, "none" for the fallen
+        obs, reward, terminated, truncated, info = env.step(random_legal(env, rng))
+        assert np.all(reward[~info["done"]] == 0)
+        finished += int(info["done"].sum())
+    assert finished > 0
+
+
+def test_masks_follow_the_rules():
+    env = VecBattleEnv(32, seed=1)
+    env.reset()
+    rng = np.random.default_rng(1)
+    eng, T = env.engine, env.T
+    for _ in range(60):
+        moves = env.action_masks().reshape(32, T, N_MOVES, T)
+        alive = eng.hp[:, :T] > 0
+        fallen = moves[~alive]
+        assert fallen[:, MOVE_IDS["none"], 0].all() and fallen.sum() == len(fallen)
+        last = eng.last_status_move[:, :T]
+        rows, slots = np.nonzero(alive & (last > 0))
+        assert not moves[rows, slots, last[rows, slots]].any()
+        attack = moves[:, :, MOVE_IDS["attack"], :]
+        assert np.array_equal(attack, alive[:, :, None] & (eng.hp[:, None, T:] > 0))
+        env.step(random_legal(env, rng))
+
+
+def test_finished_battles_restart_with_their_outcome_in_info():
+    env = VecBattleEnv(64, seed=2)
+    env.reset()
+    rng = np.random.default_rng(2)
+    seen = 0
+    for _ in range(100):
+        obs, reward, terminated, truncated, info = env.step(random_legal(env, rng))
+        done = info["done"]
+        if done.any():
+            seen += 1
+            assert np.all(env.engine.round_number[done] == 1)
+            assert np.all(reward[done & (info["winner"] == 0)] == 1)
+            assert np.all(reward[done & (info["winner"] == 1)] == -1)
+            assert np.all(info["rounds"][done] >= 1)
+    assert seen
+
+
+def test_seeded_envs_are_reproducible():
+    runs = []
+    for _ in range(2):
+        env = VecBattleEnv(16, seed=3)
+        env.reset()
+        rng = np.random.default_rng(3)
+        total = 0.0
+        for _ in range(50):
+            total += float(env.step(random_legal(env, rng))[1].sum())
+        runs.append((total, env.obs.copy()))
+    assert runs[0][0] == runs[1][0] and np.array_equal(runs[0][1], runs[1][1])
+
+
+def test_bad_actions_raise():
+    env = VecBattleEnv(4, seed=4)
+    env.reset()
+    with pytest.raises(ValueError):
+        env.step(np.zeros((4, env.T + 1), dtype=np.int64))
+    with pytest.raises(ValueError):
+        env.step(np.full((4, env.T), env.n_actions))
+    illegal = (~env.action_masks()).argmax(axis=2)
+    with pytest.raises(ValueError):
+        env.step(illegal)
@@ -0,0 +1,268 @@
+# tournament.py
+"""
+Policy tournament: rates AI policies (policies.py) against each other.
+
+A pairing is played in blocks of game pairs on random compositions. In each pair the two policies
+swap teams and sides on the same dice (one reseed per pair), so luck of the draw and the player/CPU
+asymmetry cancel out of the pair's score. Every finished game updates Elo and Glicko ratings
+incrementally, in a fixed order, so a seeded tournament gives the same table whatever the worker count.
+A pairing stops as soon as it is settled, meaning one of:
+  - its score interval (Wilson, z = 2.576 by default, wide enough for the repeated looks) excludes 50%;
+  - the interval is narrower than +-precision;
+  - it has played max_games games.
+
+Round-robin plays every pairing once. Swiss plays `rounds` rounds; each round pairs policies with
+equal match points (ties by Glicko rating) that have not met yet, and gives a bye to the odd one out.
+
+    python tournament.py cpu random
+    python tournament.py cpu random mcts --format swiss --max-games 400 --workers 4
+"""
+import argparse
+import math
+import time
+from itertools import combinations
+from multiprocessing import Pool, cpu_count
+
+from characters import create_all_character_prototypes
+from engine import DEFAULT_MAX_ROUNDS, BattleEngine, random_team_indices
+from matchups import wilson_interval
+from policies import POLICIES
+from rng import SeedSequence, make_rng
+from simulate import TEAM_SIZE, play_battle
+
+DEFAULT_BLOCK_PAIRS = 25        # game pairs per pairing per wave
+DEFAULT_MIN_GAMES = 100
+DEFAULT_MAX_GAMES = 2000
+DEFAULT_PRECISION = 0.03        # stop once the score is known to +-3 points
+Z_SEQUENTIAL = 2.576
+INITIAL_RATING = 1500.0
+ELO_K = 16.0
+GLICKO_RD = 350.0
+GLICKO_MIN_RD = 30.0
+_Q = math.log(10) / 400
+
+
+class Elo:
+    def __init__(self, names, k=ELO_K):
+        self.k = k
+        self.rating = {name: INITIAL_RATING for name in names}
+
+    def expected(self, a, b):
+        return 1 / (1 + 10 ** ((self.rating[b] - self.rating[a]) / 400))
+
+    def update(self, a, b, score_a):
+        delta = self.k * (score_a - self.expected(a, b))
+        self.rating[a] += delta
+        self.rating[b] -= delta
+
+
+class Glicko:
+    """Glicko-1 with every game its own rating period; RD is floored so late games still move ratings."""
+
+    def __init__(self, names, min_rd=GLICKO_MIN_RD):
+        self.min_rd = min_rd
+        self.rating = {name: INITIAL_RATING for name in names}
+        self.rd = {name: GLICKO_RD for name in names}
+
+    @staticmethod
+    def _g(rd):
+        return 1 / math.sqrt(1 + 3 * _Q * _Q * rd * rd / (math.pi * math.pi))
+
+    def _step(self, r, rd, r_opp, rd_opp, score):
+        g = self._g(rd_opp)
+        e = 1 / (1 + 10 ** (-g * (r - r_opp) / 400))
+        inv_d2 = _Q * _Q * g * g * e * (1 - e)
+        precision = 1 / (rd * rd) + inv_d2
+        return r + _Q / precision * g * (score - e), max(math.sqrt(1 / precision), self.min_rd)
+
+    def update(self, a, b, score_a):
+        ra, rda, rb, rdb = self.rating[a], self.rd[a], self.rating[b], self.rd[b]
+        self.rating[a], self.rd[a] = self._step(ra, rda, rb, rdb, score_a)
+        self.rating[b], self.rd[b] = self._step(rb, rdb, ra, rda, 1 - score_a)
+
+
+class Pairing:
+    """Running result of one pairing; score is a's points (win 1, draw 0.5)."""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.games = 0
+        self.score = 0.0
+        self.blocks = 0
+        self.status = "running"
+
+    def interval(self, z=Z_SEQUENTIAL):
+        return wilson_interval(self.score, self.games, z)
+
+    def check(self, min_games, max_games, precision, z=Z_SEQUENTIAL):
+        if self.games < min(min_games, max_games):
+            return False
+        lo, hi = self.interval(z)
+        if lo > 0.5 or hi < 0.5:
+            self.status = "decided"
+        elif (hi - lo) / 2 < precision:
+            self.status = "even"
+        elif self.games >= max_games:
+            self.status = "max_games"
+        return self.status != "running"
+
+
+def _play_block(args):
+    # worker entry point: `pairs` game pairs between policies a and b; returns a's score per game, in order
+    a, b, pairs, seed, max_rounds = args
+    comp_seed, battle_seed = seed.spawn(2)
+    comp_rng, battle_rng = make_rng(comp_seed), make_rng(battle_seed)
+    protos = create_all_character_prototypes()
+    engine = BattleEngine(protos, protos, log_mode="off")
+    scores = []
+    for _ in range(pairs):
+        teams = (random_team_indices(comp_rng, len(protos), TEAM_SIZE),
+                 random_team_indices(comp_rng, len(protos), TEAM_SIZE))
+        game_seed = battle_rng.getrandbits(64)
+        for a_side in ("player", "cpu"):
+            engine.reseed(game_seed)
+            policies = (a, b) if a_side == "player" else (b, a)
+            winner, _ = play_battle(engine, teams[0], teams[1], policies[0], policies[1], max_rounds)
+            scores.append(0.5 if winner == "draw" else 1.0 if winner == a_side else 0.0)
+    return scores
+
+
+def round_robin(names):
+    return [list(combinations(names, 2))]
+
+
+def swiss_round(names, points, glicko, met):
+    # greedy pairing down the standings, skipping rematches where possible; last one out gets a bye
+    order = sorted(names, key=lambda n: (-points[n], -glicko.rating[n], names.index(n)))
+    pairs, bye = [], None
+    while order:
+        a = order.pop(0)
+        if not order:
+            bye = a
+            break
+        b = next((n for n in order if frozenset((a, n)) not in met), order[0])
+        order.remove(b)
+        pairs.append((a, b))
+    return pairs, bye
+
+
+def run_tournament(names, fmt="round-robin", rounds=None, block_pairs=DEFAULT_BLOCK_PAIRS,
+                   min_games=DEFAULT_MIN_GAMES, max_games=DEFAULT_MAX_GAMES, precision=DEFAULT_PRECISION,
+                   z=Z_SEQUENTIAL, workers=None, seed=0, max_rounds=DEFAULT_MAX_ROUNDS):
+    """
+    Returns (elo, glicko, pairings, points). pairings lists the Pairing of every match played, in play
+    order; points are match points (pairing won 1, even 0.5, bye 1). The games of one pairing depend
+    only on (seed, round, the two policies' positions in names, block number).
+    """
+    names = list(names)
+    if len(set(names)) != len(names) or len(names) < 2:
+        raise ValueError("a tournament needs at least two distinct policies")
+    for name in names:
+        if name not in POLICIES:
+            raise ValueError(f"unknown policy {name!r} (choose from {', '.join(sorted(POLICIES))})")
+    if fmt not in ("round-robin", "swiss"):
+        raise ValueError(f"unknown format {fmt!r}")
+    elo, glicko = Elo(names), Glicko(names)
+    points = {name: 0.0 for name in names}
+    pairings, met = [], set()
+    workers = workers or cpu_count()
+    pool = Pool(workers) if workers > 1 else None
+
+    def play(round_no, round_pairs):
+        active = [Pairing(a, b) for a, b in round_pairs]
+        pairings.extend(active)
+        while active:
+            tasks = [(p.a, p.b, block_pairs,
+                      SeedSequence(seed, spawn_key=(round_no, names.index(p.a), names.index(p.b), p.blocks)), max_rounds)
+                     for p in active]
+            blocks = pool.map(_play_block, tasks) if pool is not None else list(map(_play_block, tasks))
+            for p, scores in zip(active, blocks):
+                p.blocks += 1
+                for s in scores:
+                    p.games += 1
+                    p.score += s
+                    elo.update(p.a, p.b, s)
+                    glicko.update(p.a, p.b, s)
+            active = [p for p in active if not p.check(min_games, max_games, precision, z)]
+        for a, b in round_pairs:
+            met.add(frozenset((a, b)))
+        for p in pairings[len(pairings) - len(round_pairs):]:
+            if p.status != "decided":
+                points[p.a] += 0.5
+                points[p.b] += 0.5
+            else:
+                points[p.a if p.score * 2 > p.games else p.b] += 1.0
+
+    try:
+        if fmt == "round-robin":
+            for round_no, round_pairs in enumerate(round_robin(names)):
+                play(round_no, round_pairs)
+        else:
+            for round_no in range(rounds or math.ceil(math.log2(len(names)))):
+                round_pairs, bye = swiss_round(names, points, glicko, met)
+                if bye is not None:
+                    points[bye] += 1.0
+                play(round_no, round_pairs)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return elo, glicko, pairings, points
+
+
+def format_standings(elo, glicko, pairings, points):
+    games = {name: 0 for name in elo.rating}
+    score = {name: 0.0 for name in elo.rating}
+    for p in pairings:
+        games[p.a] += p.games
+        games[p.b] += p.games
+        score[p.a] += p.score
+        score[p.b] += p.games - p.score
+    lines = [f"{'policy':<12}{'glicko':>15}{'elo':>8}{'points':>8}{'games':>8}{'score':>8}"]
+    for name in sorted(elo.rating, key=lambda n: -glicko.rating[n]):
+        share = score[name] / games[name] if games[name] else 0.0
+        lines.append(f"{name:<12}{glicko.rating[name]:>8.0f}  +-{2 * glicko.rd[name]:<5.0f}{elo.rating[name]:>8.0f}"
+                     f"{points[name]:>8.1f}{games[name]:>8}{share:>8.1%}")
+    return "\n".join(lines)
+
+
+def format_pairings(pairings, z=Z_SEQUENTIAL):
+    lines = []
+    for p in pairings:
+        lo, hi = p.interval(z)
+        lines.append(f"{p.a:>10} vs {p.b:<10} {p.score / p.games:6.1%}  [{lo:.1%}, {hi:.1%}]  "
+                     f"{p.games:>6} games  {p.status}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Round-robin or Swiss tournament between AI policies.")
+    parser.add_argument("policies", nargs="*", default=["cpu", "random"],
+                        help=f"entrants (default: cpu random; registered: {', '.join(sorted(POLICIES))})")
+    parser.add_argument("--format", default="round-robin", choices=("round-robin", "swiss"))
+    parser.add_argument("--rounds", type=int, default=None, help="Swiss rounds (default: log2 of the entrants)")
+    parser.add_argument("--block", type=int, default=DEFAULT_BLOCK_PAIRS, help="game pairs per pairing per wave")
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES)
+    parser.add_argument("--max-games", type=int, default=DEFAULT_MAX_GAMES)
+    parser.add_argument("--precision", type=float, default=DEFAULT_PRECISION,
+                        help="stop a pairing once its score is known to +- this")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rounds", type=int, default=DEFAULT_MAX_ROUNDS)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    elo, glicko, pairings, points = run_tournament(
+        args.policies, args.format, args.rounds, args.block, args.min_games, args.max_games, args.precision,
+        workers=args.workers, seed=args.seed, max_rounds=args.max_rounds)
+    print(format_pairings(pairings))
+    print()
+    print(format_standings(elo, glicko, pairings, points))
+    played = sum(p.games for p in pairings)
+    print(f"{played} games ({len(pairings) * args.max_games - played} saved by early stopping) "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# vecengine.py
+"""
+Struct-of-arrays battle engine: K battles held in NumPy arrays and resolved in lockstep.
+
+Every per-unit field of Character (hp, timers, flags, last status move) is a (K, U) array where
+U = 2 * team_size; columns [0, T) are the player team and [T, U) the CPU team. A round is resolved
+with one pass over the U speed-order positions, each pass vectorized across all K battles, so the
+Python overhead is per round rather than per battle. Rules (including the CPU AI, the CPU heal
+reservation and the revive-by-heal quirk) mirror engine.BattleEngine, so win rates and round counts
+are statistically identical to the object engine; the random streams themselves differ.
+
+numpy is only needed by this module.
+"""
+import numpy as np
+
+from characters import ATTACK_RANGES, DEFAULT_ATTACK_RANGE, create_all_character_prototypes
+from moves import CHARACTER_KITS, ENEMY, MOVE_IDS, MOVES, UNSTUNNED
+
+# move codes (moves.MOVE_IDS)
+MOVE_CODES = MOVE_IDS
+ATTACK, HEROIC_RAISE, RUBY_SHIELD, ARROW_SHOWER, SHARP_AIM, SHINY_FLEX, STUN_PUNCH, VITAL_STAB, \
+    SNEAK_BOOST, DIE_FOR_ME, KINGS_COMMAND, HEAL_SINGLE, HEAL_ALL, NONE = (
+        MOVE_IDS[name] for name in (
+            "attack", "heroic_raise", "ruby_shield", "arrow_shower", "sharp_aim", "shiny_flex",
+            "stun_punch", "vital_stab", "sneak_boost", "die_for_me", "kings_command",
+            "heal_single", "heal_all", "none"))
+NO_STATUS = -1   # last_status_move is None
+
+# character kinds: one code per registered kit, OTHER for characters without one
+KIND_CODES = {shortname: i for i, shortname in enumerate(CHARACTER_KITS)}
+KITS = list(CHARACTER_KITS.values())
+OTHER = len(KITS)
+QK = KIND_CODES["QK"]
+
+
+def attack_tables(attack_ranges):
+    # (low, high) arrays indexed by character kind, from a shortname -> (low, high) mapping
+    ranges = [attack_ranges.get(sn, DEFAULT_ATTACK_RANGE) for sn in CHARACTER_KITS] + [DEFAULT_ATTACK_RANGE]
+    return np.array([r[0] for r in ranges]), np.array([r[1] for r in ranges])
+
+
+ATTACK_LOW, ATTACK_HIGH = attack_tables(ATTACK_RANGES)
+
+TEAM_SIZE = 3
+DEFAULT_BATCH_SIZE = 8192
+DEFAULT_MAX_ROUNDS = 500
+
+# per-battle state arrays (first axis = battle), sliced together when finished battles are dropped
+BATTLE_FIELDS = (
+    "kind", "max_hp", "hp", "base_speed", "base_crit", "crit_amp",
+    "crit_immune_turns", "damage_resist_turns", "guaranteed_crit_turn", "stunned",
+    "team_crit_buff_turns", "team_speed_buff_turns", "team_speed_bonus",
+    "damage_buff_turns", "resist_buff_turns", "last_status_move", "take_hit_for_qk",
+    "heal_left", "moves", "targets", "round_number", "active",
+)
+BOOL_FIELDS = ("guaranteed_crit_turn", "stunned", "take_hit_for_qk", "active")
+# per-unit timers and flags that every battle starts at zero / False
+STATE_FIELDS = (
+    "crit_immune_turns", "damage_resist_turns", "guaranteed_crit_turn", "stunned",
+    "team_crit_buff_turns", "team_speed_buff_turns", "team_speed_bonus",
+    "damage_buff_turns", "resist_buff_turns", "take_hit_for_qk",
+)
+
+
+class VecBattleEngine:
+    def __init__(self, prototypes, n_battles, team_size=TEAM_SIZE, seed=None, attack_ranges=None):
+        self.prototypes = prototypes
+        self.K = n_battles
+        self.T = team_size
+        self.U = 2 * team_size
+        self.rng = np.random.default_rng(seed)
+        self.ar = np.arange(n_battles)
+        self.unit_side = np.repeat([0, 1], team_size)   # (U,) 0 = player, 1 = cpu
+
+        # prototype tables, indexed by prototype index
+        self.proto_kind = np.array([KIND_CODES.get(p.shortname, OTHER) for p in prototypes])
+        self.proto_max_hp = np.array([p.max_hp for p in prototypes])
+        self.proto_speed = np.array([p.base_speed for p in prototypes])
+        self.proto_crit = np.array([p.base_crit for p in prototypes])
+        self.proto_crit_amp = np.array([p.crit_amp for p in prototypes])
+        # attack rolls by kind; attack_ranges overrides characters.ATTACK_RANGES (balance.py tunes them)
+        if attack_ranges is None:
+            self.attack_low, self.attack_high = ATTACK_LOW, ATTACK_HIGH
+        else:
+            self.attack_low, self.attack_high = attack_tables(attack_ranges)
+
+    def start_battles(self, player_indices, cpu_indices):
+        """player_indices / cpu_indices: (K, T) arrays of prototype indices (or one row for all battles)."""
+        shape = (self.K, self.U)
+        for name in BATTLE_FIELDS:
+            if name in ("heal_left", "round_number", "active"):
+                continue
+            dtype = bool if name in BOOL_FIELDS else np.int64
+            setattr(self, name, np.zeros(shape, dtype=dtype))
+        self.comp = np.zeros(shape, dtype=np.int64)
+        self.heal_left = np.zeros((self.K, 2), dtype=np.int64)
+        self.round_number = np.zeros(self.K, dtype=np.int64)
+        self.active = np.zeros(self.K, dtype=bool)
+        self.restart_battles(self.ar, player_indices, cpu_indices)
+
+    def restart_battles(self, rows, player_indices, cpu_indices):
+        """
+        Starts new battles in place in `rows` (an index array), as start_battles does for all of them;
+        the other battles keep running. player_indices / cpu_indices: (len(rows), T) arrays or one row.
+        """
+        n = len(rows)
+        comp = np.concatenate([
+            np.broadcast_to(player_indices, (n, self.T)),
+            np.broadcast_to(cpu_indices, (n, self.T)),
+        ], axis=1)
+        self.comp[rows] = comp
+        self.kind[rows] = self.proto_kind[comp]
+        self.max_hp[rows] = self.proto_max_hp[comp]
+        self.hp[rows] = self.max_hp[rows]
+        self.base_speed[rows] = self.proto_speed[comp]
+        self.base_crit[rows] = self.proto_crit[comp]
+        self.crit_amp[rows] = self.proto_crit_amp[comp]
+        for name in STATE_FIELDS:
+            getattr(self, name)[rows] = 0
+        self.last_status_move[rows] = NO_STATUS
+        self.heal_left[rows] = 3
+        self.moves[rows] = NONE
+        self.targets[rows] = -1     # team-relative target index, -1 = None
+        self.round_number[rows] = 1
+        self.active[rows] = True
+
+    # --- helpers ---
+    def _side_alive(self, side):
+        s = slice(side * self.T, (side + 1) * self.T)
+        return self.hp[:, s] > 0
+
+    def _pick(self, mask):
+        # uniform random True column of each row of mask, -1 where a row has none
+        counts = mask.sum(axis=1)
+        j = (self.rng.random(len(mask)) * counts).astype(np.int64)
+        idx = np.argmax(np.cumsum(mask, axis=1) > j[:, None], axis=1)
+        return np.where(counts > 0, idx, -1)
+
+    def all_dead(self, side):
+        return ~self._side_alive(side).any(axis=1)
+
+    # --- CPU AI (BattleEngine.choose_ai_actions) ---
+    def _ai_draw(self, side, slot, heal_left, rows):
+        # one attempt of the CPU AI for unit `slot` of `side`, restricted to battles `rows`
+        T = self.T
+        n = len(rows)
+        u = side * T + slot
+        kind = self.kind[rows, u]
+        hp_al = self.hp[rows, side * T:(side + 1) * T]
+        opp_alive = self.hp[rows, (1 - side) * T:(2 - side) * T] > 0
+        opp_stunned = self.stunned[rows, (1 - side) * T:(2 - side) * T]
+
+        r = self.rng.random(n)
+        attack_t = self._pick(opp_alive)
+        stun_t = self._pick(opp_alive & ~opp_stunned)
+
+        move = np.where(attack_t >= 0, ATTACK, NONE)
+        target = attack_t.copy()
+        has_heal = heal_left[rows] > 0
+
+        # kit AI tables: consecutive [lo, hi) bands of one uniform draw, leftover -> attack
+        for code, kit in enumerate(KITS):
+            is_kind = kind == code
+            for table, mode in ((kit.ai_weights, has_heal), (kit.ai_weights_no_heal, ~has_heal)):
+                sel = is_kind & mode
+                if not table or not sel.any():
+                    continue
+                cum = 0.0
+                for name, weight in table:
+                    lo = cum
+                    cum += weight
+                    m = sel & (r >= lo) & (r < cum)
+                    spec = MOVES[name]
+                    if spec.targeting == ENEMY:
+                        t = stun_t if spec.ai_target == UNSTUNNED else attack_t
+                        m &= t >= 0
+                        target[m] = t[m]
+                    move[m] = spec.move_id
+
+        # heal the lowest-HP living ally if it is under 35%
+        hp_al = np.where(hp_al > 0, hp_al, np.iinfo(np.int64).max)
+        low = np.argmin(hp_al, axis=1)
+        sub = np.arange(n)
+        heal_now = has_heal & (hp_al[sub, low] < self.max_hp[rows, side * T + low] * 0.35)
+        move[heal_now] = HEAL_SINGLE
+        target[heal_now] = low[heal_now]
+        return move, target
+
+    def choose_ai_actions(self, side):
+        """Returns (moves, targets), each (K, T), for one side; mirrors BattleEngine.choose_ai_actions."""
+        T = self.T
+        moves = np.full((self.K, T), NONE, dtype=np.int64)
+        targets = np.full((self.K, T), -1, dtype=np.int64)
+        heal_left = self.heal_left[:, side].copy()
+
+        for slot in range(T):
+            u = side * T + slot
+            rows = np.flatnonzero(self.active & (self.hp[:, u] > 0))
+            # re-roll only the battles that drew the status move used last time (up to 21 draws)
+            for _ in range(21):
+                if not len(rows):
+                    break
+                move, target = self._ai_draw(side, slot, heal_left, rows)
+                repeat = (move != ATTACK) & (move == self.last_status_move[rows, u])
+                moves[rows[~repeat], slot] = move[~repeat]
+                targets[rows[~repeat], slot] = target[~repeat]
+                rows = rows[repeat]
+            if len(rows):
+                # forced attack after the last re-roll
+                attack_t = self._pick(self.hp[rows, (1 - side) * T:(2 - side) * T] > 0)
+                moves[rows, slot] = np.where(attack_t >= 0, ATTACK, NONE)
+                targets[rows, slot] = attack_t
+            heal_left -= (moves[:, slot] == HEAL_SINGLE) & (heal_left > 0)
+        return moves, targets
+
+    def set_actions(self, side, moves, targets):
+        s = slice(side * self.T, (side + 1) * self.T)
+        self.moves[:, s] = moves
+        self.targets[:, s] = targets
+        if side == 1:
+            # CPU heal reservation (BattleEngine.set_cpu_actions)
+            for slot in range(self.T):
+                is_heal = (moves[:, slot] == HEAL_SINGLE) | (moves[:, slot] == HEAL_ALL)
+                self.heal_left[:, 1] -= self.active & is_heal & (self.heal_left[:, 1] > 0)
+
+    # --- round resolution (BattleEngine.resolve_round) ---
+    def _damage(self, mask, cols, amount):
+        rows = self.ar[mask]
+        c = cols[mask]
+        self.hp[rows, c] = np.clip(self.hp[rows, c] - amount[mask], 0, self.max_hp[rows, c])
+
+    def _heal(self, mask, cols, amount):
+        rows = self.ar[mask]
+        c = cols[mask]
+        self.hp[rows, c] = np.clip(self.hp[rows, c] + amount[mask], 0, self.max_hp[rows, c])
+
+    def _resolve_target(self, go, a_side, target):
+        # team-relative param -> absolute column of a living opponent, random fallback; -1 if none left
+        T = self.T
+        opp_base = (1 - a_side) * T
+        opp_alive = np.where(a_side[:, None] == 0, self.hp[:, T:] > 0, self.hp[:, :T] > 0)
+        col = opp_base + np.clip(target, 0, T - 1)
+        valid = (target >= 0) & (target < T) & (self.hp[self.ar, col] > 0)
+        fallback = self._pick(opp_alive)
+        rel = np.where(valid, target, fallback)
+        return np.where(go & (rel >= 0), opp_base + rel, -1)
+
+    def _reduce(self, dmg, cols):
+        # Shiny Flex (30%) then King's Command resist (20%), as in tb_stun_punch / ca_vital_stab
+        dmg = np.where(self.damage_resist_turns[self.ar, cols] > 0, (dmg * 0.7).astype(np.int64), dmg)
+        return np.where(self.resist_buff_turns[self.ar, cols] > 0, (dmg * 0.8).astype(np.int64), dmg)
+
+    def resolve_round(self):
+        K, T, U, ar = self.K, self.T, self.U, self.ar
+        active = self.active
+
+        # 1) heal phase, player slots then CPU slots
+        for u in range(U):
+            side = u // T
+            allies = slice(side * T, (side + 1) * T)
+            can = active & (self.hp[:, u] > 0) & (self.heal_left[:, side] > 0)
+            m = can & (self.moves[:, u] == HEAL_ALL)
+            if m.any():
+                team_hp = self.hp[:, allies]
+                gain = (self.max_hp[:, allies] * 0.30).astype(np.int64)
+                healed = np.minimum(team_hp + gain, self.max_hp[:, allies])
+                self.hp[:, allies] = np.where(m[:, None] & (team_hp > 0), healed, team_hp)
+                self.heal_left[m, side] -= 1
+                self.last_status_move[m, u] = HEAL_ALL
+            t = self.targets[:, u]
+            m = can & (self.moves[:, u] == HEAL_SINGLE) & (t >= 0) & (t < T)
+            if m.any():
+                cols = side * T + np.clip(t, 0, T - 1)
+                self._heal(m, cols, (self.max_hp[ar, cols] * 0.75).astype(np.int64))
+                self.heal_left[m, side] -= 1
+                self.last_status_move[m, u] = HEAL_SINGLE
+
+        # 2) collect non-heal actions and order by (speed, d100 tie roll) desc, stable
+        acting = active[:, None] & (self.hp > 0) & (self.moves != HEAL_SINGLE) & (self.moves != HEAL_ALL)
+        speed = self.base_speed + np.where(self.team_speed_buff_turns > 0, self.team_speed_bonus, 0)
+        tie = self.rng.integers(1, 101, size=(K, U))
+        key = np.where(acting, speed * 128 + tie, -1)
+        order = np.argsort(-key, axis=1, kind="stable")
+
+        for p in range(U):
+            a = order[:, p]
+            go = acting[ar, a] & (self.hp[ar, a] > 0)
+            stunned = go & self.stunned[ar, a]
+            self.stunned[ar[stunned], a[stunned]] = False
+            go &= ~stunned
+            if not go.any():
+                continue
+
+            move = self.moves[ar, a]
+            a_side = a // T
+            status = go & (move != ATTACK)
+            self.last_status_move[ar[status], a[status]] = move[status]
+            ally_mask = self.unit_side[None, :] == a_side[:, None]
+            opp_mask = ~ally_mask
+
+            # attack / stun punch / vital stab: target with random fallback
+            targeted = go & ((move == ATTACK) | (move == STUN_PUNCH) | (move == VITAL_STAB))
+            if targeted.any():
+                tgt = self._resolve_target(targeted, a_side, self.targets[ar, a])
+                hit = targeted & (tgt >= 0)
+                tcol = np.where(hit, tgt, 0)
+
+                atk = hit & (move == ATTACK)
+                if atk.any():
+                    # Die For Me redirection
+                    protectors = opp_mask & self.take_hit_for_qk & (self.hp > 0) & (self.kind != QK)
+                    redirect = atk & (self.kind[ar, tcol] == QK) & protectors.any(axis=1)
+                    prot = np.argmax(protectors, axis=1)
+                    self.take_hit_for_qk[ar[redirect], prot[redirect]] = False
+                    tcol = np.where(redirect, prot, tcol)
+
+                    akind = self.kind[ar, a]
+                    dmg = self.rng.integers(self.attack_low[akind], self.attack_high[akind] + 1)
+                    guaranteed = self.guaranteed_crit_turn[ar, a]
+                    eff_crit = np.where(self.team_crit_buff_turns[ar, a] > 0, 30, self.base_crit[ar, a])
+                    crit = guaranteed | (self.rng.random(K) < eff_crit / 100.0)
+                    crit &= ~(self.crit_immune_turns[ar, tcol] > 0)
+                    dmg = np.where(crit, (dmg * (1 + self.crit_amp[ar, a] / 100.0)).astype(np.int64), dmg)
+                    dmg = np.where(self.damage_buff_turns[ar, a] > 0, (dmg * 1.20).astype(np.int64), dmg)
+                    dmg = np.where(self.resist_buff_turns[ar, tcol] > 0, (dmg * 0.80).astype(np.int64), dmg)
+                    dmg = np.where(self.damage_resist_turns[ar, tcol] > 0, (dmg * 0.7).astype(np.int64), dmg)
+                    self.guaranteed_crit_turn[ar[atk], a[atk]] = False
+                    self._damage(atk, tcol, dmg)
+
+                m = hit & (move == STUN_PUNCH)
+                if m.any():
+                    self._damage(m, tcol, self._reduce(np.full(K, 90), tcol))
+                    self.stunned[ar[m], tcol[m]] = True
+
+                m = hit & (move == VITAL_STAB)
+                if m.any():
+                    self._damage(m, tcol, self._reduce(np.full(K, 60), tcol))
+                    self._heal(m, a, (self.max_hp[ar, a] * 0.10).astype(np.int64))
+
+            m = go & (move == ARROW_SHOWER)
+            if m.any():
+                hit = m[:, None] & opp_mask & (self.hp > 0)
+                dmg = self.rng.integers(50, 71, size=(K, U))
+                dmg = np.where(self.damage_resist_turns > 0, (dmg * 0.7).astype(np.int64), dmg)
+                dmg = np.where(self.resist_buff_turns > 0, (dmg * 0.8).astype(np.int64), dmg)
+                self.hp = np.where(hit, np.clip(self.hp - dmg, 0, self.max_hp), self.hp)
+
+            m = go & (move == HEROIC_RAISE)
+            if m.any():
+                self.team_crit_buff_turns[m[:, None] & ally_mask & (self.hp > 0)] = 3
+
+            m = go & (move == SNEAK_BOOST)
+            if m.any():
+                boosted = m[:, None] & ally_mask & (self.hp > 0)
+                self.team_speed_buff_turns[boosted] = 3
+                self.team_speed_bonus[boosted] = 20
+
+            m = go & (move == RUBY_SHIELD)
+            self.crit_immune_turns[ar[m], a[m]] = 5
+            m = go & (move == SHARP_AIM)
+            self.guaranteed_crit_turn[ar[m], a[m]] = True
+            m = go & (move == SHINY_FLEX)
+            self.damage_resist_turns[ar[m], a[m]] = 2
+
+            m = go & (move == DIE_FOR_ME)
+            if m.any():
+                candidates = ally_mask & (self.hp > 0) & (self.kind != QK)
+                prot = np.argmax(np.where(candidates, self.hp, -1), axis=1)
+                m &= candidates.any(axis=1)
+                self.take_hit_for_qk[ar[m], prot[m]] = True
+
+            m = go & (move == KINGS_COMMAND)
+            m &= (self.damage_buff_turns[ar, a] == 0) & (self.resist_buff_turns[ar, a] == 0)
+            self.damage_buff_turns[ar[m], a[m]] = 2
+            self.resist_buff_turns[ar[m], a[m]] = 2
+
+        # end of round: decrement durations
+        tick = active[:, None]
+        for timer in (self.team_crit_buff_turns, self.crit_immune_turns, self.damage_resist_turns,
+                      self.damage_buff_turns, self.resist_buff_turns):
+            timer -= tick & (timer > 0)
+        speed_on = tick & (self.team_speed_buff_turns > 0)
+        self.team_speed_buff_turns -= speed_on
+        self.team_speed_bonus[speed_on & (self.team_speed_buff_turns == 0)] = 0
+
+        self.round_number += active
+
+    def _compact(self, keep):
+        # drop finished battles so later rounds only pay for the ones still running
+        for name in BATTLE_FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.ids = self.ids[keep]
+        self.K = len(self.ids)
+        self.ar = np.arange(self.K)
+
+    def run(self, max_rounds=DEFAULT_MAX_ROUNDS):
+        """
+        Plays every battle to completion with the CPU AI on both sides.
+        Returns (winner, rounds) indexed like the started battles: winner is 0 = player, 1 = cpu, 2 = draw.
+        """
+        winner = np.full(self.K, 2, dtype=np.int64)
+        rounds = np.zeros(self.K, dtype=np.int64)
+        self.ids = np.arange(self.K)
+        while True:
+            player_dead = self.all_dead(0)
+            cpu_dead = self.all_dead(1)
+            self.active &= ~(player_dead | cpu_dead) & (self.round_number <= max_rounds)
+            done = ~self.active
+            if done.any():
+                ids = self.ids[done]
+                winner[ids] = np.where(cpu_dead & ~player_dead, 0, np.where(player_dead & ~cpu_dead, 1, 2))[done]
+                rounds[ids] = self.round_number[done] - 1
+                if done.all():
+                    break
+                self._compact(self.active)
+            self.set_actions(0, *self.choose_ai_actions(0))
+            self.set_actions(1, *self.choose_ai_actions(1))
+            self.resolve_round()
+        return winner, rounds
+
+
+def _run_vec_batch(args):
+    # worker entry point: one lockstep batch, folded into a simulate.BatchResult
+    from simulate import BatchResult
+
+    k, seed_seq, player_indices, cpu_indices, max_rounds, protos, attack_ranges = args
+    eng = VecBattleEngine(protos, k, seed=seed_seq, attack_ranges=attack_ranges)
+    teams = []
+    for fixed in (player_indices, cpu_indices):
+        if fixed is not None:
+            teams.append(np.asarray(fixed)[None, :])
+        else:
+            teams.append(np.argsort(eng.rng.random((k, len(protos))), axis=1)[:, :TEAM_SIZE])
+    eng.start_battles(*teams)
+    winner, rounds = eng.run(max_rounds)
+
+    result = BatchResult()
+    result.battles = k
+    result.rounds = int(rounds.sum())
+    for code, side in enumerate(("player", "cpu", "draw")):
+        result.wins[side] = int((winner == code).sum())
+    for side in (0, 1):
+        comp = eng.comp[:, side * TEAM_SIZE:(side + 1) * TEAM_SIZE]
+        fought = np.bincount(comp.ravel(), minlength=len(protos))
+        won = np.bincount(comp[winner == side].ravel(), minlength=len(protos))
+        for i, p in enumerate(protos):
+            if not fought[i]:
+                continue
+            result.char_battles[p.shortname] = result.char_battles.get(p.shortname, 0) + int(fought[i])
+            result.char_wins[p.shortname] = result.char_wins.get(p.shortname, 0) + int(won[i])
+    return result
+
+
+def run_vectorized(n_battles, player_indices=None, cpu_indices=None, workers=1, batch_size=DEFAULT_BATCH_SIZE,
+                   seed=None, max_rounds=DEFAULT_MAX_ROUNDS, prototypes=None, attack_ranges=None, pool=None):
+    """
+    Vectorized counterpart of simulate.run_batch (CPU AI on both sides); batches of batch_size battles
+    run in lockstep, optionally spread over a process pool (an existing one may be passed in). Teams left
+    as None are drawn at random per battle. prototypes and attack_ranges replace the stock characters
+    and characters.ATTACK_RANGES. Returns a simulate.BatchResult.
+    """
+    import time
+    from multiprocessing import Pool
+    from simulate import BatchResult
+
+    protos = prototypes or create_all_character_prototypes()
+    seeds = np.random.SeedSequence(seed).spawn((n_battles + batch_size - 1) // batch_size)
+    tasks = [(min(batch_size, n_battles - start), ss, player_indices, cpu_indices, max_rounds, protos, attack_ranges)
+             for start, ss in zip(range(0, n_battles, batch_size), seeds)]
+
+    result = BatchResult()
+    t0 = time.perf_counter()
+    if pool is not None:
+        for part in pool.imap_unordered(_run_vec_batch, tasks):
+            result.merge(part)
+    elif workers == 1:
+        for task in tasks:
+            result.merge(_run_vec_batch(task))
+    else:
+        with Pool(workers) as pool:
+            for part in pool.imap_unordered(_run_vec_batch, tasks):
+                result.merge(part)
+    result.elapsed = time.perf_counter() - t0
+    return result
@@ -0,0 +1,198 @@
+# vecenv.py
+"""
+Gym-style vectorized environment for training agents: B battles stepped per call, the agent playing
+the player team against the CPU AI.
+
+The battles live in a VecBattleEngine (vecengine.py), so a step is one lockstep round for all B
+battles with no Character objects or per-battle Python lists. Observations, rewards, done flags and
+action masks are preallocated arrays filled in place and returned as the same objects on every step;
+copy them if you keep them across steps. A finished battle restarts at once with new random teams,
+so the observation returned for it already belongs to the next battle (gymnasium's "same step"
+auto-reset); its outcome is in info.
+
+Actions are (B, T) integers, one per player slot: move_id * T + target, with move ids from
+moves.MOVE_IDS and target the team-relative slot (enemy for attack / stun_punch / vital_stab, ally
+for heal_single, 0 for everything else). action_masks() gives the (B, T, N_ACTIONS) legal actions:
+  - the actor's kit specials, attack and the two heals while heal rings remain;
+  - not the actor's last status move;
+  - attacks and targeted specials on living enemies, Heal One on any ally slot (healing a fallen ally
+    revives it, as in the engine);
+  - "none" (target 0) only, for a fallen actor.
+
+Observation row: per unit (player slots first, then CPU), OBS_UNIT_FEATURES then a one-hot of its
+character kind; then the heal rings left on each side (/3) and round_number / max_rounds.
+Timers are raw turn counts. Reward is +1 for a win, -1 for a loss and 0 otherwise (draws included).
+
+    env = VecBattleEnv(1024, seed=0)
+    obs = env.reset()
+    obs, reward, terminated, truncated, info = env.step(actions)
+
+numpy is only needed by this module and vecengine.
+"""
+import numpy as np
+
+from characters import create_all_character_prototypes
+from moves import ALLY, ENEMY, MOVE_IDS, MOVE_LIST, kit_for
+from vecengine import (
+    ATTACK, DEFAULT_MAX_ROUNDS, HEAL_ALL, HEAL_SINGLE, KIND_CODES, NONE, OTHER, TEAM_SIZE, VecBattleEngine,
+)
+
+N_MOVES = len(MOVE_LIST)
+ENEMY_MOVES = [m.move_id for m in MOVE_LIST if m.targeting == ENEMY]
+ALLY_MOVES = [m.move_id for m in MOVE_LIST if m.targeting == ALLY]
+UNTARGETED_MOVES = [m.move_id for m in MOVE_LIST if m.targeting not in (ENEMY, ALLY) and m.move_id != NONE]
+
+# engine arrays copied into every unit's observation, after hp fraction and alive
+OBS_UNIT_FEATURES = (
+    "hp_fraction", "alive", "crit_immune_turns", "damage_resist_turns", "team_crit_buff_turns",
+    "team_speed_buff_turns", "damage_buff_turns", "resist_buff_turns", "guaranteed_crit_turn", "stunned",
+    "take_hit_for_qk",
+)
+N_KINDS = OTHER + 1
+
+
+def _kind_moves():
+    # (N_KINDS, N_MOVES) moves a living actor of each kind may pick, before the status-repeat and heal rules
+    table = np.zeros((N_KINDS, N_MOVES), dtype=bool)
+    table[:, [ATTACK, HEAL_SINGLE, HEAL_ALL]] = True
+    for shortname, code in KIND_CODES.items():
+        for name in kit_for(shortname).specials:
+            table[code, MOVE_IDS[name]] = True
+    return table
+
+
+KIND_MOVES = _kind_moves()
+
+
+class VecBattleEnv:
+    """
+    B player-vs-CPU battles. Teams left as None are drawn at random for every battle (and restart);
+    prototypes and attack_ranges replace the stock characters, as in vecengine.
+    """
+
+    def __init__(self, n_envs, prototypes=None, player_indices=None, cpu_indices=None, team_size=TEAM_SIZE,
+                 seed=None, max_rounds=DEFAULT_MAX_ROUNDS, attack_ranges=None):
+        self.prototypes = prototypes or create_all_character_prototypes()
+        self.num_envs = n_envs
+        self.T = team_size
+        self.player_indices = player_indices
+        self.cpu_indices = cpu_indices
+        self.max_rounds = max_rounds
+        self.engine = VecBattleEngine(self.prototypes, n_envs, team_size, seed, attack_ranges)
+        self.n_actions = N_MOVES * team_size
+
+        B, T, U = n_envs, team_size, 2 * team_size
+        self.n_unit_obs = len(OBS_UNIT_FEATURES) + N_KINDS
+        self.obs_size = U * self.n_unit_obs + 3
+        self.obs = np.zeros((B, self.obs_size), dtype=np.float32)
+        self._unit_obs = self.obs[:, :U * self.n_unit_obs].reshape(B, U, self.n_unit_obs)   # a view
+        self.reward = np.zeros(B, dtype=np.float32)
+        self.terminated = np.zeros(B, dtype=bool)
+        self.truncated = np.zeros(B, dtype=bool)
+        self.mask = np.zeros((B, T, self.n_actions), dtype=bool)
+        self._mask_moves = self.mask.reshape(B, T, N_MOVES, T)                            # a view
+        # winner (0 player, 1 cpu, 2 draw) and rounds of the battles that ended on the last step
+        self.info = {"done": np.zeros(B, dtype=bool), "winner": np.zeros(B, dtype=np.int64),
+                     "rounds": np.zeros(B, dtype=np.int64)}
+        self._moves = np.zeros((B, T), dtype=np.int64)
+        self._targets = np.zeros((B, T), dtype=np.int64)
+        self._slot = np.arange(T)
+
+    def _teams(self, n):
+        # (player, cpu) prototype indices for n new battles
+        rng = self.engine.rng
+        teams = []
+        for fixed in (self.player_indices, self.cpu_indices):
+            if fixed is not None:
+                teams.append(np.asarray(fixed)[None, :])
+            else:
+                teams.append(np.argsort(rng.random((n, len(self.prototypes))), axis=1)[:, :self.T])
+        return teams
+
+    def reset(self, seed=None):
+        """Starts all B battles (reseeding the engine when seed is given); returns the observations."""
+        eng = self.engine
+        if seed is not None:
+            eng.rng = np.random.default_rng(seed)
+        eng.start_battles(*self._teams(self.num_envs))
+        self._started(eng.ar)
+        self._observe()
+        return self.obs
+
+    def _started(self, rows):
+        # refresh the observation columns that only change with the teams
+        kinds = self._unit_obs[:, :, len(OBS_UNIT_FEATURES):]
+        kinds[rows] = 0
+        units = np.arange(2 * self.T)
+        kinds[rows[:, None], units, self.engine.kind[rows]] = 1.0
+
+    def _observe(self):
+        eng, unit = self.engine, self._unit_obs
+        np.divide(eng.hp, eng.max_hp, out=unit[:, :, 0], casting="unsafe")
+        np.greater(eng.hp, 0, out=unit[:, :, 1], casting="unsafe")
+        for k, name in enumerate(OBS_UNIT_FEATURES[2:], 2):
+            np.copyto(unit[:, :, k], getattr(eng, name), casting="unsafe")
+        tail = self.obs[:, -3:]
+        np.multiply(eng.heal_left, 1 / 3, out=tail[:, :2], casting="unsafe")
+        np.multiply(eng.round_number, 1 / self.max_rounds, out=tail[:, 2], casting="unsafe")
+        self._update_mask()
+
+    def _update_mask(self):
+        eng, T, mask = self.engine, self.T, self._mask_moves
+        alive = eng.hp[:, :T] > 0
+        enemy_alive = eng.hp[:, T:] > 0
+        avail = KIND_MOVES[eng.kind[:, :T]]
+        avail[eng.last_status_move[:, :T, None] == np.arange(N_MOVES)] = False
+        avail[:, :, [HEAL_SINGLE, HEAL_ALL]] &= eng.heal_left[:, 0, None, None] > 0
+        avail &= alive[:, :, None]
+        self.mask.fill(False)
+        mask[:, :, ENEMY_MOVES, :] = avail[:, :, ENEMY_MOVES, None] & enemy_alive[:, None, None, :]
+        mask[:, :, ALLY_MOVES, :] = avail[:, :, ALLY_MOVES, None]
+        mask[:, :, UNTARGETED_MOVES, 0] = avail[:, :, UNTARGETED_MOVES]
+        mask[:, :, NONE, 0] = ~alive
+
+    def action_masks(self):
+        """(B, T, N_ACTIONS) legal actions of every player slot for the next step."""
+        return self.mask
+
+    def step(self, actions):
+        """
+        Plays one round of every battle: actions (B, T) for the player, the CPU AI for the CPU. Returns
+        (obs, reward, terminated, truncated, info); truncated marks battles that hit max_rounds.
+        Raises ValueError on an illegal action.
+        """
+        eng, T = self.engine, self.T
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs, T):
+            raise ValueError(f"expected actions of shape {(self.num_envs, T)}, got {actions.shape}")
+        if actions.min() < 0 or actions.max() >= self.n_actions:
+            raise ValueError(f"actions must be in [0, {self.n_actions})")
+        legal = self.mask[eng.ar[:, None], self._slot, actions]
+        if not legal.all():
+            row, slot = np.argwhere(~legal)[0]
+            raise ValueError(f"illegal action {actions[row, slot]} for battle {row} slot {slot}")
+        np.floor_divide(actions, T, out=self._moves)
+        np.remainder(actions, T, out=self._targets)
+        eng.set_actions(0, self._moves, self._targets)
+        eng.set_actions(1, *eng.choose_ai_actions(1))
+        eng.resolve_round()
+
+        player_dead, cpu_dead = eng.all_dead(0), eng.all_dead(1)
+        np.logical_or(player_dead, cpu_dead, out=self.terminated)
+        np.greater(eng.round_number, self.max_rounds, out=self.truncated)
+        self.truncated &= ~self.terminated
+        np.subtract(cpu_dead, player_dead, out=self.reward, dtype=np.float32)
+        done = self.info["done"]
+        np.logical_or(self.terminated, self.truncated, out=done)
+        winner = self.info["winner"]
+        winner.fill(2)
+        winner[cpu_dead & ~player_dead] = 0
+        winner[player_dead & ~cpu_dead] = 1
+        np.subtract(eng.round_number, 1, out=self.info["rounds"])
+
+        if done.any():
+            rows = np.flatnonzero(done)
+            eng.restart_battles(rows, *self._teams(len(rows)))
+            self._started(rows)
+        self._observe()
+        return self.obs, self.reward, self.terminated, self.truncated, self.info